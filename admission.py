@@ -0,0 +1,127 @@
+# admission.py
+"""
+Admission control for the small search connection pool.
+
+Each lane admits at most `concurrency` queries at once and lets at most
+`queue_depth` more wait up to `max_wait` seconds; anything beyond that is
+rejected at once with Overloaded (app.py answers 503 + Retry-After) instead
+of queueing for the pool and timing out later. app.py sends expensive
+queries (scans, stopword substring matches, deep pages, batches) to a
+separate, smaller lane so a burst of them can't starve the cheap ones.
+"""
+import math
+import select
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+class Overloaded(Exception):
+    def __init__(self, lane, retry_after):
+        super().__init__(f"{lane} lane is full")
+        self.lane = lane
+        self.retry_after = retry_after
+
+class AdmissionLane:
+    def __init__(self, name, concurrency, queue_depth, max_wait):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.queue_depth = max(0, queue_depth)
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.avg_service = 0.05  # seconds, EWMA of time spent holding a slot
+        self._cond = threading.Condition()
+
+    def retry_after(self):
+        """
+        Rough seconds until the current backlog drains (at least 1).
+        """
+        backlog = self.active + self.waiting
+        return max(1, math.ceil(backlog * self.avg_service / self.concurrency))
+
+    @contextmanager
+    def slot(self):
+        """
+        Holds one of the lane's slots for the duration of the block.
+        Raises:
+            Overloaded: The queue is full, or no slot freed up within max_wait.
+        """
+        with self._cond:
+            if self.active >= self.concurrency:
+                if self.waiting >= self.queue_depth:
+                    self.rejected += 1
+                    raise Overloaded(self.name, self.retry_after())
+                self.waiting += 1
+                deadline = time.monotonic() + self.max_wait
+                try:
+                    while self.active >= self.concurrency:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.timed_out += 1
+                            raise Overloaded(self.name, self.retry_after())
+                        self._cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            self.active += 1
+            self.admitted += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._cond:
+                self.active -= 1
+                self.avg_service += 0.1 * (elapsed - self.avg_service)
+                self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {"concurrency": self.concurrency, "queue_depth": self.queue_depth,
+                    "active": self.active, "waiting": self.waiting,
+                    "admitted": self.admitted, "rejected": self.rejected,
+                    "timed_out": self.timed_out,
+                    "avg_service_ms": round(self.avg_service * 1000, 2)}
+
+def client_gone(sock):
+    """
+    True if the peer closed its side of the connection. Only EOF counts;
+    pipelined bytes from a keep-alive client do not.
+    """
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        if not readable:
+            return False
+        return sock.recv(1, socket.MSG_PEEK) == b""
+    except (OSError, ValueError):
+        return True
+
+@contextmanager
+def cancel_on_disconnect(sock, conn, interval=0.25):
+    """
+    While the block runs, polls the client socket and cancels the running
+    statement on `conn` if the client goes away. Yields a dict whose
+    "cancelled" key tells the caller why its query failed.
+    """
+    state = {"cancelled": False}
+    if sock is None:
+        yield state
+        return
+    done = threading.Event()
+
+    def watch():
+        while not done.wait(interval):
+            if client_gone(sock):
+                state["cancelled"] = True
+                conn.cancel_safe()
+                return
+
+    watcher = threading.Thread(target=watch, name="disconnect-watch", daemon=True)
+    watcher.start()
+    try:
+        yield state
+    finally:
+        done.set()
@@ -1,19 +1,504 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, g, Response, abort
 from flask_cors import CORS
 import os
-from psycopg_pool import ConnectionPool
+import sys
+import json
+import base64
+import random
+import time
+import threading
+import psycopg
+from psycopg_pool import ConnectionPool, PoolTimeout
+from psycopg.types.numeric import Int8Dumper
+import metrics
+from search_cache import QueryCache, normalize_query
+from query_plan import PLANS, like_pattern, plan_query
+from inverted_index import PhraseIndex
+from suggest import SuggestIndex
+from admission import AdmissionLane, Overloaded, cancel_on_disconnect
+from http_cache import StaticAssets, choose_encoding, compress, make_etag
+from snapshot import SearchSnapshot
 
 # --- App & CORS ---
 app = Flask(__name__, static_folder="static")
 frontend_origin = os.getenv("FRONTEND_ORIGIN", "*")
 CORS(app, resources={r"/*": {"origins": frontend_origin}})
 
+# --- Search backend: "postgres" (default) or "index" (inverted_index.py file) ---
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "postgres")
+phrase_index = None
+if SEARCH_BACKEND == "index":
+    # mmap-backed; opening only reads the header, so worker start stays instant
+    SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", "captions.idx")
+    phrase_index = PhraseIndex(SEARCH_INDEX_PATH)
+
 # --- DB Pool (create ONCE, after DSN is set) ---
 DSN = os.getenv("DATABASE_URL")
-if not DSN:
+if not DSN and phrase_index is None:
     raise RuntimeError("DATABASE_URL is not set")
-# keep pool small on free tiers; short wait to borrow connections
-pool = ConnectionPool(conninfo=DSN, min_size=0, max_size=3, timeout=10)
+WORKER_START = time.perf_counter()
+# Keep the pool small on free tiers, but never cold: POOL_MIN_SIZE connections
+# are opened in the background when the worker starts (see the end of this
+# file), so the first /search doesn't pay TCP + TLS + auth. TCP keepalives and
+# a periodic pool.check() catch connections the network silently dropped.
+POOL_MIN_SIZE = int(os.getenv("POOL_MIN_SIZE", 1))
+POOL_MAX_SIZE = max(POOL_MIN_SIZE, int(os.getenv("POOL_MAX_SIZE", 3)))
+POOL_CHECK_SECONDS = float(os.getenv("POOL_CHECK_SECONDS", 60))  # 0 disables
+# admission control keeps the pool from queueing, so a long wait means trouble
+POOL_TIMEOUT = float(os.getenv("POOL_TIMEOUT_SECONDS", 3))
+# Server-side prepared search statements, created once per connection. Turn
+# off for poolers that can't track named prepared statements.
+SEARCH_PREPARE = os.getenv("SEARCH_PREPARE", "1") != "0"
+SEARCH_TIMEOUT_MS = 5000
+# /search/export holds a connection for the whole stream, so exports get
+# connections of their own on top of POOL_MAX_SIZE. 0 disables exports.
+EXPORT_CONCURRENCY = max(0, int(os.getenv("EXPORT_CONCURRENCY", 1)))
+# Probes and background reads (/readyz, /healthz, the generation check, the
+# suggest load) get two more, so they never take a search's connection.
+INTERNAL_CONNECTIONS = 2
+
+def configure_connection(conn):
+    """
+    Runs once per new pooled connection, off the request path: sets the
+    search statement timeout and prepares every search statement variant.
+    A variant that fails to prepare (e.g. a relation not migrated yet) is
+    logged and skipped, so it fails on its own when used instead of taking
+    every connection, and so every endpoint, down with it.
+    """
+    conn.execute(f"SET statement_timeout = {SEARCH_TIMEOUT_MS}")
+    # psycopg picks int2/int4/int8 by value; one fixed type keeps it to a
+    # single prepared statement per variant
+    conn.adapters.register_dumper(int, Int8Dumper)
+    if SEARCH_PREPARE:
+        # LIMIT 0 plans and prepares without reading any rows
+        search_params = {"q": "warmup", "pat": "%warmup%", "limit": 0, "offset": 0,
+                         "after_rank": 0.0, "after_ts": 0, "after_id": 0,
+                         "per_video": 0, "after_hits": 0, "after_video": ""}
+        statements = [(f"search {plan}{' seek' if seek else ''}", sql, search_params)
+                      for (plan, seek), sql in SEARCH_SQL.items()]
+        statements += [(f"grouped {plan}{' seek' if seek else ''}", sql, search_params)
+                       for (plan, seek), sql in GROUPED_SQL.items()]
+        statements.append(("batch", BATCH_SQL, {"phrases": ["warmup"], "limits": [0],
+                                                "fts": [True], "pats": ["%warmup%"]}))
+        for name, sql, params in statements:
+            try:
+                with conn.transaction():  # a savepoint: a failure undoes only this one
+                    conn.execute(sql, params, prepare=True)
+            except psycopg.Error as e:
+                app.logger.warning("preparing the %s statement failed; it will error when used: %s",
+                                   name, e)
+    conn.commit()
+
+pool = ConnectionPool(
+    conninfo=DSN, min_size=POOL_MIN_SIZE, timeout=10,
+    max_size=POOL_MAX_SIZE + EXPORT_CONCURRENCY + INTERNAL_CONNECTIONS,
+    kwargs={"keepalives": 1, "keepalives_idle": 30, "keepalives_interval": 10,
+            "keepalives_count": 3},
+    configure=configure_connection, open=False,
+) if DSN else None
+pool_ready_ms = None  # time from worker start until min_size connections were up
+
+# --- Admission control (see admission.py) ---
+# Every pool.connection() runs inside a lane slot, and the lanes together
+# never admit more than the pool's max_size, so nothing queues inside the
+# pool. Searches share POOL_MAX_SIZE between two lanes: scans, stopword
+# substring matches, deep offsets and batches go to the smaller heavy lane.
+# Exports and the internal callers have lanes sized to the connections
+# reserved for them.
+HEAVY_CONCURRENCY = max(1, int(os.getenv("ADMIT_HEAVY_CONCURRENCY", 1)))
+cheap_lane = AdmissionLane(
+    "cheap",
+    concurrency=int(os.getenv("ADMIT_CHEAP_CONCURRENCY", max(1, POOL_MAX_SIZE - HEAVY_CONCURRENCY))),
+    queue_depth=int(os.getenv("ADMIT_CHEAP_QUEUE", 16)),
+    max_wait=float(os.getenv("ADMIT_MAX_WAIT_SECONDS", 2)),
+)
+heavy_lane = AdmissionLane(
+    "heavy",
+    concurrency=HEAVY_CONCURRENCY,
+    queue_depth=int(os.getenv("ADMIT_HEAVY_QUEUE", 4)),
+    max_wait=float(os.getenv("ADMIT_MAX_WAIT_SECONDS", 2)),
+)
+# Exports never queue: one more than EXPORT_CONCURRENCY gets a 503 at once.
+export_lane = AdmissionLane("export", concurrency=EXPORT_CONCURRENCY, queue_depth=0, max_wait=0)
+internal_lane = AdmissionLane("internal", concurrency=INTERNAL_CONNECTIONS, queue_depth=8,
+                              max_wait=5)
+LANES = (cheap_lane, heavy_lane, export_lane, internal_lane)
+HEAVY_OFFSET = int(os.getenv("ADMIT_HEAVY_OFFSET", 500))
+
+def lane_for(plan, offset=0):
+    if plan != "fts" or offset >= HEAVY_OFFSET:
+        return heavy_lane
+    return cheap_lane
+
+class ClientGone(Exception):
+    pass
+
+def run_query(lane, sql, params, plan, timeout_ms=None):
+    """
+    Admits the query through `lane`, borrows a connection and runs it. The
+    statement is cancelled if the client disconnects meanwhile (gunicorn only).
+    Raises:
+        Overloaded, PoolTimeout, ClientGone, psycopg.Error.
+    """
+    with lane.slot():
+        wait_start = time.perf_counter()
+        with pool.connection(timeout=POOL_TIMEOUT) as conn, conn.cursor() as cur:
+            POOL_WAIT_SECONDS.observe(time.perf_counter() - wait_start)
+            if timeout_ms:
+                cur.execute(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+            with cancel_on_disconnect(request.environ.get("gunicorn.socket"), conn) as watch:
+                try:
+                    return timed_query(cur, sql, params, plan)
+                except psycopg.errors.QueryCanceled:
+                    if watch["cancelled"]:
+                        raise ClientGone()
+                    raise
+
+def db_error_response(e, what):
+    """
+    Maps run_query failures to responses; only unexpected errors are 500s.
+    Always a Response (never a tuple), so callers can post-process it.
+    """
+    if isinstance(e, Overloaded):
+        resp = jsonify({"error": "Server busy, please retry", "lane": e.lane})
+        resp.status_code = 503
+        resp.headers["Retry-After"] = str(e.retry_after)
+        return resp
+    if isinstance(e, PoolTimeout):
+        resp = jsonify({"error": "Server busy, please retry"})
+        resp.status_code = 503
+        resp.headers["Retry-After"] = "2"
+        return resp
+    if isinstance(e, ClientGone):
+        resp = jsonify({"error": "client closed request"})
+        resp.status_code = 499
+        return resp
+    if isinstance(e, psycopg.errors.QueryCanceled):
+        resp = jsonify({"error": "Search timed out; try a more specific phrase"})
+        resp.status_code = 504
+        return resp
+    if isinstance(e, psycopg.OperationalError):
+        app.logger.warning("%s failed: database unreachable: %s", what, e)
+        resp = jsonify({"error": "Database unavailable, please retry"})
+        resp.status_code = 503
+        resp.headers["Retry-After"] = "5"
+        return resp
+    app.logger.exception("%s failed", what)
+    resp = jsonify({"error": "server_error"})
+    resp.status_code = 500
+    return resp
+
+# Relation the search SQL reads: the captions table, or the caption_search view
+# over the compact layout (data_insert_pg.py, STORAGE_LAYOUT=compact). Both
+# expose video_id, timestamp, caption_text, caption_tsv and a unique bigint id.
+CAPTIONS_TABLE = os.getenv("CAPTIONS_TABLE", "captions")
+if not CAPTIONS_TABLE.replace("_", "").isalnum():
+    raise RuntimeError(f"CAPTIONS_TABLE must be a plain table or view name, not {CAPTIONS_TABLE!r}")
+
+# Caption boundary joins (data_insert_pg.py, CAPTION_JOINS=1 there too): FTS
+# also searches one short join row per pair of consecutive captions, so a
+# phrase cut in two by the parser still matches. A join hit is reported as the
+# first caption (its id and timestamp, with both captions' text), and is
+# dropped when either caption matches on its own, so no hit is reported twice.
+# One-word queries can't straddle a cut and skip the join rows entirely.
+# Substring plans (trigram/ilike) search caption rows only.
+CAPTION_JOINS = os.getenv("CAPTION_JOINS", "0") == "1"
+BOUNDARY_TABLE = "caption_boundaries" if CAPTIONS_TABLE == "captions" else f"{CAPTIONS_TABLE}_boundaries"
+FTS_CAPTIONS = f"""LATERAL (
+        SELECT video_id, "timestamp", caption_text, caption_tsv, id FROM {CAPTIONS_TABLE}
+        UNION ALL
+        SELECT video_id, "timestamp", caption_text, boundary_tsv, id FROM {BOUNDARY_TABLE}
+        WHERE numnode(query) > 1 AND NOT (caption_tsv @@ query OR next_tsv @@ query)
+    )""" if CAPTION_JOINS else CAPTIONS_TABLE
+
+# --- Query result cache (per worker, see search_cache.py) ---
+# Popular phrases are answered from memory; entries die on TTL, LRU pressure,
+# or when the loader bumps ingest_state.generation.
+cache = QueryCache(
+    max_entries=int(os.getenv("SEARCH_CACHE_ENTRIES", 512)),
+    max_bytes=int(float(os.getenv("SEARCH_CACHE_MB", 16)) * 1024 * 1024),
+    ttl=float(os.getenv("SEARCH_CACHE_TTL", 300)),
+)
+GENERATION_CHECK_SECONDS = float(os.getenv("CACHE_GENERATION_CHECK_SECONDS", 5))
+_generation_checked_at = 0.0
+_generation_lock = threading.Lock()
+
+def read_generation(conn):
+    """
+    Returns:
+        int: The ingest generation; 0 for a database that was never loaded
+            through data_insert_pg.ensure_schema (no ingest_state table).
+    """
+    try:
+        row = conn.execute("SELECT generation FROM ingest_state WHERE id = 1").fetchone()
+    except psycopg.errors.UndefinedTable:
+        conn.rollback()
+        return 0
+    return row[0] if row else 0
+
+def refresh_generation():
+    """
+    Re-reads the ingest generation at most once per GENERATION_CHECK_SECONDS,
+    so a cache hit normally costs no database round-trip at all.
+    """
+    global _generation_checked_at
+    if time.monotonic() - _generation_checked_at < GENERATION_CHECK_SECONDS:
+        return
+    if not _generation_lock.acquire(blocking=False):
+        return  # another request is already checking
+    try:
+        _generation_checked_at = time.monotonic()
+        with internal_lane.slot(), pool.connection(timeout=2) as conn:
+            generation = read_generation(conn)
+        cache.set_generation(generation)
+        if suggest_index.generation is not None and suggest_index.generation != generation:
+            threading.Thread(target=load_suggest, name="suggest-load", daemon=True).start()
+    except Exception:
+        app.logger.warning("ingest generation check failed", exc_info=True)
+    finally:
+        _generation_lock.release()
+
+# --- Autocomplete dictionary (per worker, see suggest.py) ---
+# The most frequent words and two-word phrases from suggest_terms, which
+# data_insert_pg updates on every load. Loaded once the pool is warm and
+# reloaded in the background when the ingest generation moves.
+suggest_index = SuggestIndex(
+    max_terms=int(os.getenv("SUGGEST_MAX_TERMS", 100_000)),
+    min_freq=int(os.getenv("SUGGEST_MIN_FREQ", 2)),
+)
+_suggest_load_lock = threading.Lock()
+
+def load_suggest():
+    if not _suggest_load_lock.acquire(blocking=False):
+        return  # already loading
+    try:
+        if phrase_index is not None:
+            suggest_index.load(phrase_index.terms(), generation=0)
+            return
+        with internal_lane.slot(), pool.connection(timeout=30) as conn:
+            generation = read_generation(conn)
+            conn.execute("SET LOCAL statement_timeout = 30000")
+            try:
+                rows = conn.execute(
+                    "SELECT term, freq FROM suggest_terms WHERE freq >= %s "
+                    "ORDER BY freq DESC LIMIT %s",
+                    (suggest_index.min_freq, suggest_index.max_terms)).fetchall()
+            except psycopg.errors.UndefinedTable:
+                rows = []  # loader predates /suggest; run data_insert_pg.py --rebuild-suggest
+        suggest_index.load(rows, generation)
+        app.logger.info("pid %s: suggest dictionary loaded, %d terms in %.0f ms",
+                        os.getpid(), len(suggest_index), suggest_index.load_ms)
+    except Exception:
+        app.logger.warning("loading the suggest dictionary failed", exc_info=True)
+    finally:
+        _suggest_load_lock.release()
+
+# --- Local snapshot fallback (see snapshot.py) ---
+# A read-only SQLite FTS5 copy of the captions, written by
+# `data_insert_pg.py --export-snapshot` and shipped with the deploy. /search
+# answers from it while the pool is still warming up after worker start, and
+# for SNAPSHOT_RETRY_SECONDS after a query failed to reach Postgres (a
+# suspended Neon compute, a network drop), instead of returning 503/500. The
+# file is re-checked every SNAPSHOT_CHECK_SECONDS and a newer one is swapped
+# in without a restart. Responses say which backend answered.
+SNAPSHOT_PATH = os.getenv("SEARCH_SNAPSHOT_PATH", "captions_snapshot.db")  # "" disables
+SNAPSHOT_CHECK_SECONDS = float(os.getenv("SNAPSHOT_CHECK_SECONDS", 30))
+SNAPSHOT_RETRY_SECONDS = float(os.getenv("SNAPSHOT_RETRY_SECONDS", 10))
+snapshot = None
+_snapshot_checked_at = 0.0
+_snapshot_lock = threading.Lock()
+_pool_warming = pool is not None
+_postgres_down_until = 0.0
+
+def refresh_snapshot():
+    """
+    Opens the snapshot file, or swaps in a newer one, at most once per
+    SNAPSHOT_CHECK_SECONDS. Readers of the old one finish undisturbed.
+    Returns:
+        SearchSnapshot | None: The current snapshot.
+    """
+    global snapshot, _snapshot_checked_at
+    if not SNAPSHOT_PATH or time.monotonic() - _snapshot_checked_at < SNAPSHOT_CHECK_SECONDS:
+        return snapshot
+    if not _snapshot_lock.acquire(blocking=False):
+        return snapshot  # another request is already checking
+    try:
+        _snapshot_checked_at = time.monotonic()
+        try:
+            mtime_ns = os.stat(SNAPSHOT_PATH).st_mtime_ns
+        except FileNotFoundError:
+            return snapshot  # keep serving the one already open, if any
+        if snapshot is None or snapshot.mtime_ns != mtime_ns:
+            snapshot = SearchSnapshot(SNAPSHOT_PATH)
+            app.logger.info("pid %s: search snapshot %s loaded (%d captions, generation %s)",
+                            os.getpid(), SNAPSHOT_PATH, snapshot.rows, snapshot.generation)
+    except Exception:
+        app.logger.warning("loading search snapshot %s failed", SNAPSHOT_PATH, exc_info=True)
+    finally:
+        _snapshot_lock.release()
+    return snapshot
+
+def postgres_unavailable():
+    return _pool_warming or time.monotonic() < _postgres_down_until
+
+_probe_lock = threading.Lock()
+
+def postgres_reachable():
+    """
+    Opens (and closes) one connection outside the pool. A PoolTimeout alone
+    can't tell an outage from every pooled connection being busy.
+    """
+    if not _probe_lock.acquire(blocking=False):
+        return True  # another request is probing; don't switch on a guess
+    try:
+        with psycopg.connect(DSN, connect_timeout=2):
+            return True
+    except psycopg.OperationalError:
+        return False
+    finally:
+        _probe_lock.release()
+
+def mark_postgres_down(e):
+    """
+    True (and Postgres is skipped for SNAPSHOT_RETRY_SECONDS) if `e` means
+    the database could not be reached and a snapshot can answer instead.
+    Statement timeouts and load shedding are not outages, and neither is a
+    PoolTimeout while a fresh connection still gets through (pool contention).
+    """
+    global _postgres_down_until
+    if refresh_snapshot() is None:
+        return False
+    if isinstance(e, PoolTimeout):
+        unreachable = not postgres_reachable()
+    else:
+        unreachable = isinstance(e, psycopg.OperationalError) and not isinstance(
+            e, psycopg.errors.QueryCanceled)
+    if not unreachable:
+        return False
+    _postgres_down_until = time.monotonic() + SNAPSHOT_RETRY_SECONDS
+    app.logger.warning("postgres unreachable (%s); serving /search from the snapshot for %.0fs",
+                       type(e).__name__, SNAPSHOT_RETRY_SECONDS)
+    return True
+
+# --- Latency metrics (per worker, Prometheus text at /metrics) ---
+# Each /search and /search/batch is split into pool wait, query and
+# serialization time; every request also gets a total.
+REQUEST_SECONDS = metrics.Histogram(
+    "http_request_duration_seconds", "Total request time by endpoint and status.")
+POOL_WAIT_SECONDS = metrics.Histogram(
+    "search_pool_wait_seconds", "Time spent waiting to borrow a pooled connection.")
+QUERY_SECONDS = metrics.Histogram(
+    "search_query_seconds", "Statement execution and fetch time by query plan.")
+SERIALIZE_SECONDS = metrics.Histogram(
+    "search_serialize_seconds", "Time to build and JSON-encode the response.")
+EXPORT_SECONDS = metrics.Histogram(
+    "search_export_seconds", "Whole-stream duration of /search/export by outcome.",
+    buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600))
+
+# Opt-in: re-run a sample of slow searches under EXPLAIN (ANALYZE, BUFFERS)
+# and log the plan. This executes the query a second time on the same
+# connection, so keep the sample rate low in production.
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 0))  # 0 disables
+EXPLAIN_SAMPLE_RATE = float(os.getenv("EXPLAIN_SAMPLE_RATE", 0.1))
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def observe_request(resp):
+    start = g.get("request_start")
+    if start is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - start,
+                                endpoint=request.endpoint or "unknown", status=resp.status_code)
+    return resp
+
+# --- HTTP caching and compression (see http_cache.py) ---
+# /search answers If-None-Match with 304 before touching the pool or the
+# result cache: its ETag covers the normalized request and the ingest
+# generation, which moves on every load. Browsers may reuse a result for
+# SEARCH_MAX_AGE seconds and revalidate after that.
+SEARCH_MAX_AGE = int(os.getenv("SEARCH_MAX_AGE", 60))
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", 86400))
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", 1024))
+COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", 6))
+COMPRESS_MIMETYPES = {"application/json", "text/plain", "text/html"}
+
+def search_etag(key, backend="postgres"):
+    """
+    Returns:
+        str | None: ETag for a /search request key; None until the data
+            generation is known (first generation check not done yet).
+    """
+    if phrase_index is not None:
+        # the index opened at startup, not whatever is at its path now
+        generation = ("index", phrase_index.mtime_ns, phrase_index.size, phrase_index.n_docs)
+    elif backend == "snapshot":
+        generation = ("snapshot", snapshot.mtime_ns)
+    else:
+        generation = cache.generation
+    if generation is None:
+        return None
+    return make_etag(generation, CAPTIONS_TABLE, CAPTION_JOINS, key)
+
+def not_modified(etag, cache_control):
+    """
+    Returns:
+        Response | None: A 304 if the request's If-None-Match has `etag`.
+    """
+    if etag is None or not request.if_none_match.contains_weak(etag):
+        return None
+    resp = Response(status=304)
+    resp.set_etag(etag, weak=True)
+    resp.headers["Cache-Control"] = cache_control
+    resp.vary.add("Accept-Encoding")
+    return resp
+
+def cacheable(resp, etag, cache_control):
+    if etag is not None and resp.status_code == 200:
+        resp.set_etag(etag, weak=True)
+        resp.headers["Cache-Control"] = cache_control
+    return resp
+
+# registered after observe_request, so it runs first and is timed with it
+@app.after_request
+def compress_response(resp):
+    """
+    Compresses buffered text responses of at least COMPRESS_MIN_BYTES.
+    Streams (/search/export) and precompressed static files pass through.
+    """
+    if (resp.status_code != 200 or resp.is_streamed or resp.direct_passthrough
+            or "Content-Encoding" in resp.headers or resp.mimetype not in COMPRESS_MIMETYPES):
+        return resp
+    data = resp.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return resp
+    resp.vary.add("Accept-Encoding")
+    encoding = choose_encoding(request)
+    if encoding:
+        resp.set_data(compress(data, encoding, COMPRESS_LEVEL))
+        resp.headers["Content-Encoding"] = encoding
+    return resp
+
+def timed_query(cur, sql, params, plan):
+    """
+    Executes and fetches one search statement, recording its latency and
+    logging a sampled EXPLAIN when it exceeds SLOW_QUERY_MS.
+    """
+    start = time.perf_counter()
+    cur.execute(sql, params, prepare=SEARCH_PREPARE)
+    rows = cur.fetchall()
+    elapsed = time.perf_counter() - start
+    QUERY_SECONDS.observe(elapsed, plan=plan)
+    if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS and random.random() < EXPLAIN_SAMPLE_RATE:
+        try:
+            cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + sql, params)
+            explain = "\n".join(r[0] for r in cur.fetchall())
+            app.logger.warning("slow query (%s, %.0f ms) params=%r\n%s",
+                               plan, elapsed * 1000, params, explain)
+        except Exception:
+            app.logger.warning("EXPLAIN of slow query failed", exc_info=True)
+    return rows
 
 # --- Liveness: no dependencies; use this for Render health check ---
 @app.route("/livez")
@@ -23,78 +508,752 @@ def livez():
 # --- Readiness: DB probe; never 5xx so the app page still loads ---
 @app.route("/readyz")
 def readyz():
+    if pool is None:
+        return {"ok": True, "backend": "index", "docs": phrase_index.n_docs}
+    ps = pool.get_stats()
+    warmth = {"warm": pool_ready_ms is not None, "ready_ms": pool_ready_ms,
+              "open": ps.get("pool_size", 0), "idle": ps.get("pool_available", 0),
+              "min_size": POOL_MIN_SIZE}
     try:
-        with pool.connection(timeout=5) as conn:
+        with internal_lane.slot(), pool.connection(timeout=5) as conn:
             conn.execute("SET LOCAL statement_timeout = 3000")  # 3s
             conn.execute("SELECT 1")
-        return {"ok": True}
+        return {"ok": True, "pool": warmth}
     except Exception as e:
-        return {"ok": False, "error": str(e)}, 200
+        # /search still answers from the snapshot, if one is loaded
+        return {"ok": False, "error": str(e), "pool": warmth,
+                "snapshot": snapshot.generation if snapshot else None}, 200
 
 # --- Optional: DB-backed health (manual use only) ---
 @app.route("/healthz")
 def healthz():
+    if pool is None:
+        return {"ok": True, "backend": "index", "docs": phrase_index.n_docs}
     try:
-        with pool.connection(timeout=5) as conn:
+        with internal_lane.slot(), pool.connection(timeout=5) as conn:
             conn.execute("SET LOCAL statement_timeout = 3000")
             conn.execute("SELECT 1")
         return {"ok": True}
     except Exception as e:
         return {"ok": False, "error": str(e)}, 500
 
+# --- Cache and query-plan counters (per worker) ---
+plan_counts = dict.fromkeys(PLANS, 0)
+_plan_lock = threading.Lock()
+
+def count_plan(plan, n=1):
+    with _plan_lock:
+        plan_counts[plan] = plan_counts.get(plan, 0) + n
+
+@app.route("/stats")
+def stats():
+    with _plan_lock:
+        plans = dict(plan_counts)
+    return {"pid": os.getpid(), "cache": cache.stats(), "plans": plans,
+            "admission": {lane.name: lane.stats() for lane in LANES},
+            "suggest": suggest_index.stats(), "static": static_assets.stats(),
+            "snapshot": dict(snapshot.stats(), serving=postgres_unavailable()) if snapshot else None}
+
+@app.route("/metrics")
+def metrics_endpoint():
+    pid = (("pid", os.getpid()),)
+    lines = []
+    for hist in (REQUEST_SECONDS, POOL_WAIT_SECONDS, QUERY_SECONDS, SERIALIZE_SECONDS, EXPORT_SECONDS):
+        lines += hist.render(pid)
+    if pool is not None:
+        ps = pool.get_stats()
+        size, available = ps.get("pool_size", 0), ps.get("pool_available", 0)
+        lines += metrics.render_samples("db_pool_connections", "gauge",
+            "Pooled connections by state.",
+            [({"state": "open"}, size), ({"state": "idle"}, available),
+             ({"state": "borrowed"}, size - available)], pid)
+        lines += metrics.render_samples("db_pool_requests_waiting", "gauge",
+            "Requests currently queued for a connection.",
+            [({}, ps.get("requests_waiting", 0))], pid)
+        lines += metrics.render_samples("db_pool_max_connections", "gauge",
+            "Configured pool max_size.", [({}, ps.get("pool_max", 0))], pid)
+        lines += metrics.render_samples("db_pool_requests_total", "counter",
+            "Connection requests served by the pool.", [({}, ps.get("requests_num", 0))], pid)
+        lines += metrics.render_samples("db_pool_requests_errors_total", "counter",
+            "Connection requests that timed out or failed.",
+            [({}, ps.get("requests_errors", 0))], pid)
+    cs = cache.stats()
+    lines += metrics.render_samples("search_cache_requests_total", "counter",
+        "Result cache lookups by outcome.",
+        [({"result": "hit"}, cs["hits"]), ({"result": "miss"}, cs["misses"])], pid)
+    with _plan_lock:
+        plans = dict(plan_counts)
+    lines += metrics.render_samples("search_plan_total", "counter",
+        "Searches executed per query plan.",
+        [({"plan": plan}, n) for plan, n in sorted(plans.items())], pid)
+    lanes = [(lane.name, lane.stats()) for lane in LANES]
+    lines += metrics.render_samples("search_admission_total", "counter",
+        "Admission decisions per lane.",
+        [({"lane": name, "outcome": outcome}, st[outcome])
+         for name, st in lanes for outcome in ("admitted", "rejected", "timed_out")], pid)
+    lines += metrics.render_samples("search_admission_queries", "gauge",
+        "Queries running or queued per lane.",
+        [({"lane": name, "state": state}, st[state])
+         for name, st in lanes for state in ("active", "waiting")], pid)
+    lines += metrics.render_samples("suggest_dictionary_terms", "gauge",
+        "Terms in the in-memory /suggest dictionary.", [({}, len(suggest_index))], pid)
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+# --- Keyset cursors ---
+# Opaque token for "the last row of the previous page": (mode, rank, timestamp, id).
+# Seeking past it replaces OFFSET, so deep pages cost the same as page one.
+def encode_cursor(mode, rank, ts, row_id):
+    raw = json.dumps([mode, rank, ts, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        mode, rank, ts, row_id = json.loads(raw)
+        # grouped pages seek by video, so their row id is the video id
+        return str(mode), float(rank), int(ts), row_id if isinstance(row_id, str) else int(row_id)
+    except Exception:
+        raise ValueError("invalid cursor")
+
+# --- Search SQL ---
+# One statement per (plan, has-cursor) pair, built once so each can be
+# prepared per connection. Unused parameters are simply ignored by psycopg.
+FTS_SEEK = """
+  AND (ts_rank(c.caption_tsv, query)::float8 < %(after_rank)s
+       OR (ts_rank(c.caption_tsv, query)::float8 = %(after_rank)s
+           AND (c."timestamp", c.id) > (%(after_ts)s, %(after_id)s)))
+"""
+LIKE_SEEK = """
+  AND (c."timestamp", c.id) > (%(after_ts)s, %(after_id)s)
+"""
+
+def fts_sql(seek):
+    return f"""
+    SELECT c.video_id, c."timestamp", c.caption_text,
+           ts_rank(c.caption_tsv, query)::float8 AS rank, c.id
+    FROM phraseto_tsquery('english'::regconfig, %(q)s) AS query,
+         {FTS_CAPTIONS} c
+    WHERE c.caption_tsv @@ query {seek}
+    ORDER BY rank DESC, c."timestamp" ASC, c.id ASC
+    LIMIT %(limit)s OFFSET %(offset)s;
+    """
+
+def like_sql(seek):
+    # trigram: the GIN trigram index prefilters, the heap recheck keeps only
+    # exact (case-insensitive) substring matches. ilike: too short for
+    # trigrams, so this is a scan.
+    return f"""
+    SELECT c.video_id, c."timestamp", c.caption_text, 0::float8 AS rank, c.id
+    FROM {CAPTIONS_TABLE} c
+    WHERE c.caption_text ILIKE %(pat)s {seek}
+    ORDER BY c."timestamp" ASC, c.id ASC
+    LIMIT %(limit)s OFFSET %(offset)s;
+    """
+
+SEARCH_SQL = {
+    ("fts", False): fts_sql(""),
+    ("fts", True): fts_sql(FTS_SEEK),
+    ("like", False): like_sql(""),
+    ("like", True): like_sql(LIKE_SEEK),
+}
+
+# --- Grouped search SQL (group=video) ---
+# One row per matching video: hit count, its first timestamps and its
+# best-ranked caption, aggregated server-side in one pass over the matches.
+# Videos are ordered by (hits DESC, video_id) and paged by seeking past that
+# pair. The matches are aggregated without their text: the best caption is
+# picked by id inside the aggregate, and only the page's snippets are read
+# back, one lookup by (video_id, id) per video on the page.
+GROUP_TIMESTAMPS = int(os.getenv("GROUP_TIMESTAMPS", 5))
+
+GROUP_SEEK = """
+    WHERE v.hits < %(after_hits)s
+       OR (v.hits = %(after_hits)s AND v.video_id > %(after_video)s)
+"""
+
+def grouped_sql(match, snippet, seek):
+    return f"""
+    WITH videos AS (
+        SELECT video_id, count(*) AS hits,
+               (array_agg("timestamp" ORDER BY "timestamp", id))[1:%(per_video)s::int] AS timestamps,
+               (array_agg(id ORDER BY rank DESC, "timestamp", id))[1] AS best_id,
+               (array_agg("timestamp" ORDER BY rank DESC, "timestamp", id))[1] AS best_ts,
+               max(rank) AS best_rank
+        FROM ({match}) hits
+        GROUP BY video_id
+    ),
+    page AS (
+        SELECT v.*, count(*) OVER () AS total_videos, sum(v.hits) OVER () AS total_hits
+        FROM videos v
+    )
+    SELECT p.video_id, p.hits, p.timestamps, p.best_ts, s.caption_text, p.best_rank,
+           p.total_videos, p.total_hits
+    FROM (SELECT * FROM page v {seek}
+          ORDER BY v.hits DESC, v.video_id
+          LIMIT %(limit)s OFFSET %(offset)s) p
+    CROSS JOIN LATERAL ({snippet} LIMIT 1) s
+    ORDER BY p.hits DESC, p.video_id;
+    """
+
+GROUP_MATCH = {
+    "fts": f"""
+        SELECT c.video_id, c."timestamp", ts_rank(c.caption_tsv, query)::float8 AS rank, c.id
+        FROM phraseto_tsquery('english'::regconfig, %(q)s) AS query,
+             {FTS_CAPTIONS} c
+        WHERE c.caption_tsv @@ query""",
+    "like": f"""
+        SELECT c.video_id, c."timestamp", 0::float8 AS rank, c.id
+        FROM {CAPTIONS_TABLE} c
+        WHERE c.caption_text ILIKE %(pat)s""",
+}
+
+# The best match's text. With caption joins a caption and its boundary row
+# share an id, but at most one of them matches (see FTS_CAPTIONS), so the
+# match condition picks the right one.
+GROUP_SNIPPET = {
+    "fts": f"""
+        SELECT c.caption_text
+        FROM phraseto_tsquery('english'::regconfig, %(q)s) AS query,
+             {FTS_CAPTIONS} c
+        WHERE c.video_id = p.video_id AND c.id = p.best_id AND c.caption_tsv @@ query""",
+    "like": f"""
+        SELECT c.caption_text
+        FROM {CAPTIONS_TABLE} c
+        WHERE c.video_id = p.video_id AND c.id = p.best_id""",
+}
+
+GROUPED_SQL = {
+    (plan, has_cursor): grouped_sql(GROUP_MATCH[plan], GROUP_SNIPPET[plan],
+                                    GROUP_SEEK if has_cursor else "")
+    for plan in GROUP_MATCH for has_cursor in (False, True)
+}
+
 # --- Search API ---
-# Uses FTS with the SAME expression as your index:
-#   to_tsvector('english'::regconfig, caption_text)
+# Matches and ranks on the stored, GIN-indexed column maintained by
+# data_insert_pg.ensure_schema:
+#   caption_tsv = to_tsvector('english'::regconfig, caption_text)
+# Rows are ordered by (rank DESC, timestamp, id) so a cursor can seek past them.
+# Stopword/punctuation-heavy phrases skip FTS (see query_plan.py) and match the
+# literal substring through the trigram index, ordered by (timestamp, id).
 @app.route("/search", methods=["GET"])
 def search():
     phrase = request.args.get("q", "").strip()
     limit = max(1, min(int(request.args.get("limit", 20)), 50))
     offset = max(0, int(request.args.get("offset", 0)))
+    cursor = request.args.get("cursor", "").strip()
+    group = request.args.get("group", "").strip()
     if not phrase:
         return jsonify({"error": "Please provide a search query"}), 400
+    if group not in ("", "video"):
+        return jsonify({"error": "group must be 'video'"}), 400
+
+    mode = "index" if phrase_index is not None else plan_query(phrase)
+    cursor_mode = f"{mode}:{group}" if group else mode
+
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+        if pool is not None and after[0] == (f"snapshot:{group}" if group else "snapshot"):
+            cursor_mode = after[0]  # a page begun on the snapshot continues there
+        if after[0] != cursor_mode:
+            return jsonify({"error": "Cursor does not match this query"}), 400
+        offset = 0  # the cursor already encodes the position
+
+    key = (normalize_query(phrase), limit, offset, cursor, group)
+    # Postgres cursors stay on Postgres (a 503 during an outage), snapshot ones on the snapshot
+    if pool is not None and (cursor_mode.startswith("snapshot") or (after is None and postgres_unavailable())):
+        if refresh_snapshot() is not None:
+            return search_snapshot(phrase, limit, offset, after, key, group)
+        if cursor_mode.startswith("snapshot"):
+            # its rank and row ids mean nothing to Postgres
+            resp = jsonify({"error": "Snapshot unavailable, please retry"})
+            resp.status_code = 503
+            resp.headers["Retry-After"] = "5"
+            return resp
+    if pool is not None:
+        refresh_generation()
+    etag = search_etag(key)
+    cache_control = f"public, max-age={SEARCH_MAX_AGE}"
+    resp = not_modified(etag, cache_control)
+    if resp is not None:
+        return resp
+
+    if phrase_index is not None:
+        if group:
+            return cacheable(search_index_grouped(phrase, limit, offset, after), etag, cache_control)
+        return cacheable(search_index(phrase, limit, offset, after), etag, cache_control)
+
+    if cache.enabled:
+        cached = cache.get(key)
+        if cached is not None:
+            resp = jsonify(cached)
+            resp.headers["X-Cache"] = "HIT"
+            return cacheable(resp, etag, cache_control)
+
+    if group:
+        return search_grouped(phrase, mode, limit, offset, after, key, etag, cache_control)
 
-    use_fts = len(phrase) >= 2 and any(ch.isalnum() for ch in phrase)
+    params = {"limit": limit + 1, "offset": offset}
+    if after:
+        params.update(after_rank=after[1], after_ts=after[2], after_id=after[3])
+
+    # statement_timeout (5s) is set per connection in configure_connection
+    if mode == "fts":
+        sql = SEARCH_SQL[("fts", after is not None)]
+        params["q"] = phrase
+    else:
+        sql = SEARCH_SQL[("like", after is not None)]
+        params["pat"] = like_pattern(phrase)
 
     try:
-        with pool.connection(timeout=8) as conn, conn.cursor() as cur:
-            cur.execute("SET LOCAL statement_timeout = 5000")  # 5s/query
-
-            if use_fts:
-                sql = """
-                SELECT c.video_id, c."timestamp", c.caption_text
-                FROM captions c
-                WHERE to_tsvector('english'::regconfig, c.caption_text)
-                      @@ phraseto_tsquery('english'::regconfig, %(q)s)
-                ORDER BY ts_rank(
-                         to_tsvector('english'::regconfig, c.caption_text),
-                         phraseto_tsquery('english'::regconfig, %(q)s)
-                       ) DESC
-                LIMIT %(limit)s OFFSET %(offset)s;
-                """
-                cur.execute(sql, {"q": phrase, "limit": limit, "offset": offset})
-            else:
-                # fallback for very short / non-alphanumeric input
-                sql = """
-                SELECT c.video_id, c."timestamp", c.caption_text
-                FROM captions c
-                WHERE c.caption_text ILIKE %(pat)s
-                ORDER BY c."timestamp" ASC
-                LIMIT %(limit)s OFFSET %(offset)s;
-                """
-                cur.execute(sql, {"pat": f"%{phrase}%", "limit": limit, "offset": offset})
-
-            rows = cur.fetchall()
+        rows = run_query(lane_for(mode, offset), sql, params, mode)
+        serialize_start = time.perf_counter()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(mode, last[3], int(last[1]), last[4])
         results = [{"video_id": r[0], "timestamp": int(r[1]), "caption_text": r[2]} for r in rows]
-        return jsonify({"results": results, "limit": limit, "offset": offset})
+        payload = {"results": results, "limit": limit, "offset": offset,
+                   "next_cursor": next_cursor, "plan": mode, "backend": "postgres"}
+        count_plan(mode)
+        cache.put(key, payload)
+        resp = jsonify(payload)
+        resp.headers["X-Cache"] = "MISS"
+        SERIALIZE_SECONDS.observe(time.perf_counter() - serialize_start)
+        return cacheable(resp, etag, cache_control)
+
+    except Exception as e:
+        if after is None and mark_postgres_down(e):
+            return search_snapshot(phrase, limit, offset, after, key, group)
+        return db_error_response(e, "search")
+
+def group_payload(rows, mode, limit, offset, totals, backend="postgres"):
+    """
+    Builds the group=video response from (video_id, hits, timestamps,
+    snippet_ts, snippet_text) rows, fetched one past `limit`.
+    """
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(f"{mode}:video", rows[-1][1], 0, rows[-1][0])
+    videos = [{"video_id": r[0], "hits": int(r[1]), "timestamps": [int(t) for t in r[2]],
+               "snippet": {"timestamp": int(r[3]), "caption_text": r[4]}} for r in rows]
+    return {"videos": videos, "total_videos": totals[0], "total_hits": totals[1],
+            "limit": limit, "offset": offset, "next_cursor": next_cursor,
+            "plan": mode, "group": "video", "backend": backend}
+
+def search_grouped(phrase, mode, limit, offset, after, key, etag, cache_control):
+    """
+    /search?group=video: one aggregate query (GROUPED_SQL) per page of videos.
+    Only a Postgres answer gets the Postgres ETag; a snapshot fallback carries
+    its own (see search_snapshot).
+    """
+    params = {"limit": limit + 1, "offset": offset, "per_video": GROUP_TIMESTAMPS}
+    if after:
+        params.update(after_hits=int(after[1]), after_video=after[3])
+    if mode == "fts":
+        sql = GROUPED_SQL[("fts", after is not None)]
+        params["q"] = phrase
+    else:
+        sql = GROUPED_SQL[("like", after is not None)]
+        params["pat"] = like_pattern(phrase)
+
+    try:
+        rows = run_query(lane_for(mode, offset), sql, params, mode)
+        serialize_start = time.perf_counter()
+        # the totals are taken before the seek, so every page reports them
+        totals = (int(rows[0][6]), int(rows[0][7])) if rows else (0, 0)
+        payload = group_payload([r[:5] for r in rows], mode, limit, offset, totals)
+        count_plan(mode)
+        cache.put(key, payload)
+        resp = jsonify(payload)
+        resp.headers["X-Cache"] = "MISS"
+        SERIALIZE_SECONDS.observe(time.perf_counter() - serialize_start)
+        return cacheable(resp, etag, cache_control)
+
+    except Exception as e:
+        if after is None and mark_postgres_down(e):
+            return search_snapshot(phrase, limit, offset, after, key, "video")
+        return db_error_response(e, "grouped search")
+
+# --- Batch search API ---
+# Many phrases, one pool checkout and one statement: the phrases are unnested
+# server-side and each one gets its own LATERAL top-k (same match and order as
+# /search page one). Everything shares a single statement timeout.
+BATCH_MAX_PHRASES = int(os.getenv("BATCH_MAX_PHRASES", 200))
+BATCH_TIMEOUT_MS = int(os.getenv("BATCH_TIMEOUT_MS", 15000))
+
+BATCH_SQL = f"""
+SELECT q.ord, r.video_id, r."timestamp", r.caption_text
+FROM unnest(%(phrases)s::text[], %(limits)s::int[], %(fts)s::bool[], %(pats)s::text[])
+     WITH ORDINALITY AS q(phrase, lim, fts, pat, ord)
+CROSS JOIN LATERAL (
+    (SELECT c.video_id, c."timestamp", c.caption_text,
+            ts_rank(c.caption_tsv, query)::float8 AS rank, c.id
+     FROM phraseto_tsquery('english'::regconfig, q.phrase) AS query,
+          {FTS_CAPTIONS} c
+     WHERE q.fts AND c.caption_tsv @@ query
+     ORDER BY rank DESC, c."timestamp" ASC, c.id ASC
+     LIMIT q.lim)
+    UNION ALL
+    (SELECT c.video_id, c."timestamp", c.caption_text, 0::float8 AS rank, c.id
+     FROM {CAPTIONS_TABLE} c
+     WHERE NOT q.fts AND c.caption_text ILIKE q.pat
+     ORDER BY c."timestamp" ASC, c.id ASC
+     LIMIT q.lim)
+) r
+ORDER BY q.ord, r.rank DESC, r."timestamp" ASC, r.id ASC;
+"""
+
+@app.route("/search/batch", methods=["POST"])
+def search_batch():
+    """
+    Body: {"queries": ["phrase", {"q": "phrase", "limit": 5}, ...], "limit": 20}
+    Returns {"results": {phrase: [hits]}, "plans": {phrase: plan}, "count": n};
+    a phrase repeated in the batch is searched once with the largest limit asked for.
+    """
+    body = request.get_json(silent=True) or {}
+    queries = body.get("queries")
+    if not isinstance(queries, list) or not queries:
+        return jsonify({"error": "Please provide a list of queries"}), 400
+    if len(queries) > BATCH_MAX_PHRASES:
+        return jsonify({"error": f"At most {BATCH_MAX_PHRASES} queries per batch"}), 400
+    try:
+        default_limit = int(body.get("limit", 20))
+        limits = {}
+        for item in queries:
+            if isinstance(item, dict):
+                phrase, limit = str(item.get("q", "")).strip(), int(item.get("limit", default_limit))
+            else:
+                phrase, limit = str(item).strip(), default_limit
+            if not phrase:
+                return jsonify({"error": "Empty query in batch"}), 400
+            limits[phrase] = max(limits.get(phrase, 0), max(1, min(limit, 50)))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid limit"}), 400
+
+    phrases = list(limits)
+    if phrase_index is not None:
+        results = {p: [hit for _, hit in phrase_index.search(p, limit=limits[p])] for p in phrases}
+        return jsonify({"results": results, "plans": dict.fromkeys(phrases, "index"),
+                        "count": len(phrases)})
+
+    plans = {p: plan_query(p) for p in phrases}
+    try:
+        rows = run_query(heavy_lane, BATCH_SQL, {
+            "phrases": phrases,
+            "limits": [limits[p] for p in phrases],
+            "fts": [plans[p] == "fts" for p in phrases],
+            "pats": [like_pattern(p) for p in phrases],
+        }, "batch", timeout_ms=BATCH_TIMEOUT_MS)
+        serialize_start = time.perf_counter()
+        results = {p: [] for p in phrases}
+        for ord_, video_id, ts, text in rows:
+            results[phrases[ord_ - 1]].append(
+                {"video_id": video_id, "timestamp": int(ts), "caption_text": text})
+        for plan in plans.values():
+            count_plan(plan)
+        resp = jsonify({"results": results, "plans": plans, "count": len(phrases)})
+        SERIALIZE_SECONDS.observe(time.perf_counter() - serialize_start)
+        return resp
+
+    except Exception as e:
+        return db_error_response(e, "batch search")
+
+# --- Autocomplete API ---
+# Served from memory (suggest_index); never touches the pool, so it stays fast
+# while searches are queued.
+@app.route("/suggest", methods=["GET"])
+def suggest():
+    """
+    GET /suggest?prefix=the%20vi[&limit=8] -> {"prefix", "suggestions": [{"text", "freq"}]}
+    """
+    prefix = request.args.get("prefix", "")[:100]
+    limit = max(1, min(int(request.args.get("limit", 8)), 10))
+    if pool is not None:
+        refresh_generation()
+    resp = jsonify({"prefix": prefix, "suggestions": suggest_index.suggest(prefix, limit)})
+    resp.headers["Cache-Control"] = "public, max-age=300"
+    return resp
+
+# --- Export API ---
+# Every match as newline-delimited JSON, read through a server-side (named)
+# cursor EXPORT_FETCH_ROWS at a time, so memory stays flat however many rows
+# match. Exports run in their own lane on their own connections (see the
+# pool). EXPORT_TIMEOUT_MS bounds each FETCH and any stall of a slow reader;
+# EXPORT_MAX_SECONDS bounds the whole stream. Rows are not sorted: an ORDER BY
+# would make Postgres find every match before sending the first one.
+EXPORT_FETCH_ROWS = int(os.getenv("EXPORT_FETCH_ROWS", 2000))
+EXPORT_TIMEOUT_MS = int(os.getenv("EXPORT_TIMEOUT_MS", 30000))
+EXPORT_MAX_SECONDS = float(os.getenv("EXPORT_MAX_SECONDS", 600))
+
+EXPORT_SQL = {
+    "fts": f"""
+    SELECT c.video_id, c."timestamp", c.caption_text
+    FROM phraseto_tsquery('english'::regconfig, %(q)s) AS query,
+         {FTS_CAPTIONS} c
+    WHERE c.caption_tsv @@ query
+    LIMIT %(limit)s
+    """,
+    "like": f"""
+    SELECT c.video_id, c."timestamp", c.caption_text
+    FROM {CAPTIONS_TABLE} c
+    WHERE c.caption_text ILIKE %(pat)s
+    LIMIT %(limit)s
+    """,
+}
+
+def ndjson_lines(hits):
+    return "".join(json.dumps(hit, separators=(",", ":")) + "\n" for hit in hits)
+
+def export_rows(sql, params, sock):
+    """
+    Generator behind /search/export. The first next() admits the export,
+    opens the cursor and fetches the first batch, yielding None, so those
+    failures still get a proper status; after that it yields NDJSON chunks.
+    A failure mid-stream ends it with a final {"error": ...} line.
+    """
+    start = time.perf_counter()
+    deadline = start + EXPORT_MAX_SECONDS
+    sent, outcome = 0, "complete"
+    with export_lane.slot():
+        wait_start = time.perf_counter()
+        with pool.connection(timeout=POOL_TIMEOUT) as conn:
+            POOL_WAIT_SECONDS.observe(time.perf_counter() - wait_start)
+            conn.execute(f"SET LOCAL statement_timeout = {EXPORT_TIMEOUT_MS}")
+            conn.execute(f"SET LOCAL idle_in_transaction_session_timeout = {EXPORT_TIMEOUT_MS}")
+            # the whole result is wanted, not a fast first page
+            conn.execute("SET LOCAL cursor_tuple_fraction = 1.0")
+            with conn.cursor(name="export") as cur, cancel_on_disconnect(sock, conn) as watch:
+                try:
+                    cur.execute(sql, params)
+                    rows = cur.fetchmany(EXPORT_FETCH_ROWS)
+                except psycopg.errors.QueryCanceled:
+                    if watch["cancelled"]:
+                        raise ClientGone()
+                    raise
+                yield None
+                try:
+                    while rows:
+                        yield ndjson_lines({"video_id": r[0], "timestamp": int(r[1]),
+                                            "caption_text": r[2]} for r in rows)
+                        sent += len(rows)
+                        if time.perf_counter() > deadline:
+                            outcome = "time_limit"
+                            yield ndjson_lines([{"error": "Export time limit reached", "rows": sent}])
+                            break
+                        rows = cur.fetchmany(EXPORT_FETCH_ROWS)
+                except psycopg.Error as e:
+                    if watch["cancelled"]:
+                        outcome = "client_gone"
+                    elif isinstance(e, (psycopg.errors.QueryCanceled,
+                                        psycopg.errors.IdleInTransactionSessionTimeout)):
+                        outcome = "timeout"
+                        yield ndjson_lines([{"error": "Export timed out", "rows": sent}])
+                    else:
+                        outcome = "error"
+                        app.logger.exception("export failed after %d rows", sent)
+                        yield ndjson_lines([{"error": "server_error", "rows": sent}])
+                except GeneratorExit:
+                    outcome = "client_gone"
+                    raise
+                finally:
+                    EXPORT_SECONDS.observe(time.perf_counter() - start, outcome=outcome)
+
+def export_index(phrase, limit):
+    """
+    /search/export served from the embedded inverted index, in doc-id order.
+    """
+    after, sent = -1, 0
+    while limit is None or sent < limit:
+        want = EXPORT_FETCH_ROWS if limit is None else min(EXPORT_FETCH_ROWS, limit - sent)
+        hits = phrase_index.search(phrase, limit=want, after_doc=after)
+        if not hits:
+            return
+        yield ndjson_lines(hit for _, hit in hits)
+        sent += len(hits)
+        after = hits[-1][0]
+
+@app.route("/search/export", methods=["GET"])
+def search_export():
+    """
+    GET /search/export?q=phrase[&limit=N] streams every match (or the first N)
+    as application/x-ndjson, one {"video_id", "timestamp", "caption_text"} per line.
+    """
+    phrase = request.args.get("q", "").strip()
+    if not phrase:
+        return jsonify({"error": "Please provide a search query"}), 400
+    try:
+        limit = request.args.get("limit")
+        limit = max(1, int(limit)) if limit else None
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+
+    headers = {"X-Accel-Buffering": "no"}  # don't let a proxy buffer the stream
+    if phrase_index is not None:
+        headers["X-Search-Plan"] = "index"
+        return Response(export_index(phrase, limit), mimetype="application/x-ndjson",
+                        headers=headers)
+    if not EXPORT_CONCURRENCY:
+        return jsonify({"error": "Export is disabled"}), 404
 
+    mode = plan_query(phrase)
+    params = {"limit": limit}
+    if mode == "fts":
+        sql, params["q"] = EXPORT_SQL["fts"], phrase
+    else:
+        sql, params["pat"] = EXPORT_SQL["like"], like_pattern(phrase)
+
+    stream = export_rows(sql, params, request.environ.get("gunicorn.socket"))
+    try:
+        next(stream)
     except Exception as e:
-        app.logger.exception("search failed")
-        return jsonify({"error": "server_error", "detail": str(e)}), 500
+        return db_error_response(e, "export")
+    count_plan(mode)
+    headers["X-Search-Plan"] = mode
+    # closing the response (finished, or the client went away) closes the
+    # generator, which releases the cursor, connection and lane slot
+    return Response(stream, mimetype="application/x-ndjson", headers=headers)
+
+def search_index(phrase, limit, offset, after):
+    """
+    /search served from the embedded inverted index. Hits come back in corpus
+    order, and the doc id doubles as the cursor's row id.
+    """
+    after_doc = after[3] if after else -1
+    hits = phrase_index.search(phrase, limit=offset + limit + 1, after_doc=after_doc)[offset:]
+    next_cursor = None
+    if len(hits) > limit:
+        hits = hits[:limit]
+        doc_id, last = hits[-1]
+        next_cursor = encode_cursor("index", 0.0, last["timestamp"], doc_id)
+    return jsonify({"results": [hit for _, hit in hits], "limit": limit, "offset": offset,
+                    "next_cursor": next_cursor, "plan": "index", "backend": "index"})
+
+def search_index_grouped(phrase, limit, offset, after):
+    """
+    group=video from the embedded inverted index (doc order is corpus order).
+    """
+    hits = (hit for _, hit in phrase_index.search(phrase, limit=sys.maxsize))
+    return jsonify(group_hits(hits, "index", limit, offset, after))
+
+def group_hits(hits, mode, limit, offset, after):
+    """
+    group=video for the file backends: every hit is read and grouped here
+    (hits come in corpus order, so timestamps come out ascending), then
+    ordered and paged like GROUPED_SQL. The snippet is a video's first hit.
+    """
+    groups = {}
+    for hit in hits:
+        group = groups.get(hit["video_id"])
+        if group is None:
+            group = groups[hit["video_id"]] = [hit["video_id"], 0, [], hit["timestamp"],
+                                               hit["caption_text"]]
+        group[1] += 1
+        if len(group[2]) < GROUP_TIMESTAMPS:
+            group[2].append(hit["timestamp"])
+    rows = sorted(groups.values(), key=lambda g: (-g[1], g[0]))
+    totals = (len(rows), sum(g[1] for g in rows))
+    if after:
+        rows = [g for g in rows if (-g[1], g[0]) > (-int(after[1]), after[3])]
+    return group_payload(rows[offset:offset + limit + 1], mode, limit, offset, totals, backend=mode)
+
+def search_snapshot(phrase, limit, offset, after, key, group):
+    """
+    /search answered from the local snapshot (see refresh_snapshot). Ranked
+    by bm25, with cursors of their own ("snapshot"), so paging stays on the
+    snapshot even after Postgres is back.
+    """
+    snap = snapshot
+    etag = search_etag(key, "snapshot")
+    # short max-age: the Postgres answer may differ once it is reachable again
+    cache_control = "public, max-age=5"
+    resp = not_modified(etag, cache_control)
+    if resp is not None:
+        return resp
+    count_plan("snapshot")
+    if group:
+        payload = group_hits(snap.iter_hits(phrase), "snapshot", limit, offset, after)
+    else:
+        rows = snap.search(phrase, limit + 1, offset, (after[1], after[3]) if after else None)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor("snapshot", last[3], int(last[1]), last[4])
+        payload = {"results": [{"video_id": r[0], "timestamp": int(r[1]), "caption_text": r[2]}
+                               for r in rows],
+                   "limit": limit, "offset": offset, "next_cursor": next_cursor,
+                   "plan": "snapshot", "backend": "snapshot"}
+    payload["snapshot_generation"] = snap.generation
+    return cacheable(jsonify(payload), etag, cache_control)
+
+# --- Static files ---
+# Read and precompressed once per worker (http_cache.StaticAssets), then served
+# from memory with an ETag. HTML is revalidated on every load (a deploy must
+# show up at once); other assets are cached for STATIC_MAX_AGE.
+static_assets = StaticAssets(app.static_folder)
+
+def static_response(filename):
+    asset = static_assets.get(filename)
+    if asset is None:
+        abort(404)
+    cache_control = "no-cache" if asset.mimetype == "text/html" else f"public, max-age={STATIC_MAX_AGE}"
+    resp = not_modified(asset.etag, cache_control)
+    if resp is not None:
+        return resp
+    encoding = choose_encoding(request, [e for e in asset.bodies if e])
+    resp = Response(asset.bodies[encoding], mimetype=asset.mimetype)
+    if encoding:
+        resp.headers["Content-Encoding"] = encoding
+    resp.vary.add("Accept-Encoding")
+    return cacheable(resp, asset.etag, cache_control)
 
-# --- Static index ---
 @app.route("/")
 def index():
-    return send_from_directory(app.static_folder, "index.html")
+    return static_response("index.html")
+
+# replaces Flask's built-in /static/<path:filename> view
+app.view_functions["static"] = static_response
+
+# --- Worker start: warm the pool in the background ---
+# Runs at import, i.e. once per gunicorn worker (don't use --preload: the
+# connections must be opened after the fork).
+def warm_pool():
+    global pool_ready_ms, _pool_warming
+    try:
+        pool.wait(timeout=30)
+        pool_ready_ms = round((time.perf_counter() - WORKER_START) * 1000, 1)
+        app.logger.info("pid %s: %d pooled connection(s) ready %.0f ms after start",
+                        os.getpid(), POOL_MIN_SIZE, pool_ready_ms)
+    except Exception:
+        app.logger.warning("pool did not reach min_size=%d at startup", POOL_MIN_SIZE, exc_info=True)
+        mark_postgres_down(PoolTimeout())
+    finally:
+        _pool_warming = False
+    load_suggest()
+
+def check_pool():
+    while True:
+        time.sleep(POOL_CHECK_SECONDS)
+        try:
+            pool.check()  # replaces broken idle connections, refilling min_size
+        except Exception:
+            app.logger.warning("pool check failed", exc_info=True)
+
+if pool is not None:
+    app.logger.setLevel(os.getenv("LOG_LEVEL", "INFO"))
+    refresh_snapshot()
+    pool.open(wait=False)
+    threading.Thread(target=warm_pool, name="pool-warm", daemon=True).start()
+    if POOL_CHECK_SECONDS > 0:
+        threading.Thread(target=check_pool, name="pool-check", daemon=True).start()
+elif phrase_index is not None:
+    threading.Thread(target=load_suggest, name="suggest-load", daemon=True).start()
 
 # --- Local dev entrypoint (Render uses gunicorn CMD from Dockerfile) ---
 if __name__ == "__main__":
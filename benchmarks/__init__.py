@@ -0,0 +1,7 @@
+"""
+Benchmarks for the phrase-search pipeline. Run modules with `python -m benchmarks.<name>`.
+
+generate writes a deterministic corpus (auto-sub .vtt files, parsed_captions.txt);
+bench_ingest and bench_search_load measure ingest and /search under load; every
+bench_* takes --out to save its results as JSON, and compare diffs two saved runs.
+"""
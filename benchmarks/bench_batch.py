@@ -0,0 +1,79 @@
+"""
+Throughput of POST /search/batch versus the same phrases as sequential GET /search calls.
+
+    SEARCH_CACHE_ENTRIES=0 gunicorn app:app -b :8000 &
+    python -m benchmarks.bench_batch --url http://localhost:8000 --phrases 500 --batch-size 100
+
+Run the server with the result cache disabled (or pass --fresh, which makes
+every phrase unique per round), otherwise the sequential side measures cache hits.
+"""
+import argparse
+import json
+import time
+import urllib.parse
+import urllib.request
+
+from benchmarks.common import add_output_arg, report, summarize, time_call
+from benchmarks.corpus import sample_phrases
+
+def get_json(url):
+    with urllib.request.urlopen(url, timeout=60) as resp:
+        return json.load(resp)
+
+def post_json(url, body):
+    req = urllib.request.Request(url, data=json.dumps(body).encode(),
+                                 headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=60) as resp:
+        return json.load(resp)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--phrases", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--fresh", action="store_true",
+                        help="append a per-round suffix word so no phrase repeats across rounds")
+    add_output_arg(parser)
+    args = parser.parse_args()
+
+    base = args.url.rstrip("/")
+    phrases = sample_phrases(args.phrases)
+    get_json(f"{base}/search?q=warmup")  # open the pool connection first
+
+    seq_s, batch_s, seq_calls, batch_calls = [], [], [], []
+    for rnd in range(args.rounds):
+        round_phrases = [f"{p} r{rnd}" if args.fresh else p for p in phrases]
+
+        start = time.perf_counter()
+        for p in round_phrases:
+            query = urllib.parse.urlencode({"q": p, "limit": args.limit})
+            _, ms = time_call(get_json, f"{base}/search?{query}")
+            seq_calls.append(ms)
+        seq_s.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for i in range(0, len(round_phrases), args.batch_size):
+            chunk = round_phrases[i:i + args.batch_size]
+            _, ms = time_call(post_json, f"{base}/search/batch",
+                              {"queries": chunk, "limit": args.limit})
+            batch_calls.append(ms)
+        batch_s.append(time.perf_counter() - start)
+
+    seq_best, batch_best = min(seq_s), min(batch_s)
+    results = {
+        "phrases": args.phrases,
+        "batch_size": args.batch_size,
+        "sequential": {"best_s": round(seq_best, 3),
+                       "phrases_per_sec": round(args.phrases / seq_best, 1),
+                       "per_call": summarize(seq_calls)},
+        "batch": {"best_s": round(batch_best, 3),
+                  "phrases_per_sec": round(args.phrases / batch_best, 1),
+                  "per_call": summarize(batch_calls)},
+        "speedup": round(seq_best / batch_best, 2),
+    }
+    report("batch", results, args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Serial vs concurrent caption downloading against the stub yt-dlp.
+
+    python -m benchmarks.bench_download --videos 200 --workers 8 --rate 20
+
+Nothing touches the network: YTDLP_BIN is pointed at benchmarks/stub_yt_dlp.py,
+whose per-call latency is STUB_DELAY (default 0.2s).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import download_captions
+from benchmarks.common import add_output_arg, report
+from benchmarks.corpus import video_ids
+
+STUB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_yt_dlp.py")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--videos", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=20.0)
+    parser.add_argument("--skip-serial", action="store_true")
+    add_output_arg(parser)
+    args = parser.parse_args()
+
+    download_captions.YTDLP_BIN = f"{sys.executable} {STUB}"
+    os.environ.setdefault("STUB_FAIL_CLIENTS", "android")  # forces a client fallback
+    urls = [f"https://www.youtube.com/watch?v={vid}" for vid in video_ids(args.videos)]
+    results = {"videos": args.videos}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if not args.skip_serial:
+            url_file = os.path.join(tmp, "video_urls.txt")
+            with open(url_file, "w") as f:
+                f.write("\n".join(urls) + "\n")
+            start = time.perf_counter()
+            download_captions.download_vtt_files(url_file, os.path.join(tmp, "serial"), delay=0.1)
+            results["serial_seconds"] = round(time.perf_counter() - start, 2)
+
+        summary = download_captions.download_concurrent(
+            urls, os.path.join(tmp, "concurrent"), workers=args.workers, rate=args.rate,
+            burst=args.workers, backoff=0.1)
+        results["concurrent"] = summary
+
+    report("download", results, args)
+
+if __name__ == "__main__":
+    main()
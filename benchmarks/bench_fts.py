@@ -0,0 +1,114 @@
+"""
+Before/after latency of /search's FTS query: re-tokenizing caption_text per row
+versus matching on the stored, GIN-indexed caption_tsv column.
+
+    python -m benchmarks.bench_fts --rows 3000000 --phrases 50
+
+Works in a scratch schema so the real captions table is never touched.
+"""
+import argparse
+import time
+
+from benchmarks.common import add_output_arg, connect, report, summarize, time_call
+from benchmarks.corpus import caption_rows, sample_phrases
+
+LEGACY_SQL = """
+SELECT c.video_id, c."timestamp", c.caption_text
+FROM captions c
+WHERE to_tsvector('english'::regconfig, c.caption_text)
+      @@ phraseto_tsquery('english'::regconfig, %(q)s)
+ORDER BY ts_rank(
+         to_tsvector('english'::regconfig, c.caption_text),
+         phraseto_tsquery('english'::regconfig, %(q)s)
+       ) DESC
+LIMIT 20;
+"""
+
+STORED_SQL = """
+SELECT c.video_id, c."timestamp", c.caption_text
+FROM captions c,
+     phraseto_tsquery('english'::regconfig, %(q)s) AS query
+WHERE c.caption_tsv @@ query
+ORDER BY ts_rank(c.caption_tsv, query) DESC
+LIMIT 20;
+"""
+
+def load_corpus(conn, schema, rows):
+    with conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        cur.execute(f"CREATE SCHEMA {schema}")
+        cur.execute(f"SET search_path = {schema}")
+        cur.execute("""
+        CREATE TABLE captions (
+          id BIGSERIAL PRIMARY KEY,
+          video_id TEXT NOT NULL,
+          timestamp INTEGER NOT NULL,
+          caption_text TEXT NOT NULL
+        )""")
+        start = time.perf_counter()
+        with cur.copy("COPY captions (video_id, timestamp, caption_text) FROM STDIN") as copy:
+            for row in caption_rows(rows):
+                copy.write_row(row)
+        cur.execute("ANALYZE captions")
+        return time.perf_counter() - start
+
+def migrate(conn):
+    with conn.cursor() as cur:
+        start = time.perf_counter()
+        cur.execute("""
+        ALTER TABLE captions ADD COLUMN caption_tsv tsvector
+          GENERATED ALWAYS AS (to_tsvector('english'::regconfig, caption_text)) STORED
+        """)
+        cur.execute("CREATE INDEX captions_caption_tsv_idx ON captions USING gin (caption_tsv)")
+        cur.execute("ANALYZE captions")
+        return time.perf_counter() - start
+
+def run_queries(conn, sql, phrases, repeat, timeout_ms):
+    latencies, timeouts = [], 0
+    with conn.cursor() as cur:
+        cur.execute(f"SET statement_timeout = {int(timeout_ms)}")
+        for _ in range(repeat):
+            for q in phrases:
+                try:
+                    _, ms = time_call(lambda: cur.execute(sql, {"q": q}).fetchall())
+                    latencies.append(ms)
+                except Exception:
+                    timeouts += 1
+        cur.execute("SET statement_timeout = 0")
+    result = summarize(latencies)
+    result["timeouts"] = timeouts
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=3_000_000)
+    parser.add_argument("--phrases", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--timeout-ms", type=int, default=0, help="per-query statement_timeout; 0 = none")
+    parser.add_argument("--schema", default="bench_fts")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema afterwards")
+    add_output_arg(parser)
+    args = parser.parse_args()
+
+    phrases = sample_phrases(args.phrases)
+    with connect() as conn:
+        load_s = load_corpus(conn, args.schema, args.rows)
+        print(f"Loaded {args.rows} rows in {load_s:.1f}s")
+
+        before = run_queries(conn, LEGACY_SQL, phrases, args.repeat, args.timeout_ms)
+        print(f"before (to_tsvector per row): {before}")
+
+        migrate_s = migrate(conn)
+        print(f"Added caption_tsv + GIN index in {migrate_s:.1f}s")
+
+        after = run_queries(conn, STORED_SQL, phrases, args.repeat, args.timeout_ms)
+        print(f"after  (stored caption_tsv):  {after}")
+
+        if not args.keep:
+            conn.execute(f"DROP SCHEMA {args.schema} CASCADE")
+
+    report("fts", {"rows": args.rows, "before": before, "after": after,
+                   "migrate_seconds": round(migrate_s, 2)}, args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+"Which videos mention X?": /search?group=video vs grouping /search pages client-side.
+
+    python -m benchmarks.bench_group --url http://localhost:8000 --phrases 100
+
+For each phrase, one client (one kept-alive HTTP connection) answers the
+question both ways:
+
+    grouped  GET /search?q=...&group=video&limit=N, one request: the top N
+             videos by hit count with exact counts and totals
+    client   GET /search?q=...&limit=50 followed through next_cursor until the
+             results run out (or --max-pages), grouped by video_id here
+
+and reports latency, requests and response bytes per phrase for each, plus
+how often the client-side top N agrees with the server's. Phrases come from
+the synthetic corpus, so load it first (see bench_search_load). Run the server
+with SEARCH_CACHE_ENTRIES=0, or every grouped request after the first is a
+cache hit.
+"""
+import argparse
+import collections
+import json
+import time
+
+from benchmarks.bench_search_load import Client
+from benchmarks.common import add_output_arg, report, summarize
+from benchmarks.corpus import sample_phrases
+
+PAGE_LIMIT = 50
+
+def fetch(client, params):
+    status, _, body = client.search(params)
+    if status != 200:
+        raise RuntimeError(f"/search {params} -> HTTP {status}")
+    return json.loads(body), len(body)
+
+def grouped(client, phrase, limit):
+    data, size = fetch(client, {"q": phrase, "group": "video", "limit": limit})
+    return [(v["video_id"], v["hits"]) for v in data["videos"]], 1, size, True
+
+def client_side(client, phrase, limit, max_pages):
+    counts = collections.Counter()
+    params = {"q": phrase, "limit": PAGE_LIMIT}
+    requests = size = 0
+    while True:
+        data, n = fetch(client, params)
+        requests += 1
+        size += n
+        counts.update(r["video_id"] for r in data["results"])
+        if not data["next_cursor"]:
+            complete = True
+            break
+        if requests >= max_pages:
+            complete = False
+            break
+        params = {**params, "cursor": data["next_cursor"]}
+    top = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
+    return top, requests, size, complete
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--phrases", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=20, help="videos wanted per phrase")
+    parser.add_argument("--max-pages", type=int, default=100,
+                        help="client-side paging gives up after this many pages")
+    parser.add_argument("--seed", type=int, default=0)
+    add_output_arg(parser)
+    args = parser.parse_args()
+
+    client = Client(args.url.rstrip("/"))
+    phrases = sample_phrases(args.phrases, seed=args.seed)
+    runs = {"grouped": [], "client": []}
+    agree = incomplete = 0
+    for phrase in phrases:
+        out = {}
+        for name, fn, extra in (("grouped", grouped, ()), ("client", client_side, (args.max_pages,))):
+            start = time.perf_counter()
+            top, requests, size, complete = fn(client, phrase, args.limit, *extra)
+            runs[name].append(((time.perf_counter() - start) * 1000.0, requests, size))
+            out[name] = (top, complete)
+        if out["client"][1]:
+            agree += out["grouped"][0] == out["client"][0]
+        else:
+            incomplete += 1
+
+    results = {"phrases": len(phrases), "limit": args.limit, "page_limit": PAGE_LIMIT,
+               "client_incomplete": incomplete,
+               "top_agree": agree, "top_compared": len(phrases) - incomplete}
+    for name, rows in runs.items():
+        results[name] = {**summarize([r[0] for r in rows]),
+                         "requests_per_phrase": round(sum(r[1] for r in rows) / len(rows), 2),
+                         "bytes_per_phrase": round(sum(r[2] for r in rows) / len(rows))}
+    results["speedup_p50"] = (round(results["client"]["p50_ms"] / results["grouped"]["p50_ms"], 2)
+                              if results["grouped"]["p50_ms"] else None)
+    report("group", results, args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Embedded inverted index vs the Postgres FTS path on the same synthetic corpus.
+
+    python -m benchmarks.bench_index --rows 1000000 --phrases 200
+    python -m benchmarks.bench_index --rows 1000000 --postgres   # needs DATABASE_URL
+
+Reports build time, index size, open time and per-query p50/p99 for each backend.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.common import add_output_arg, report, summarize, time_call
+from benchmarks.corpus import caption_rows, sample_phrases
+from inverted_index import PhraseIndex, build_index
+
+def write_parsed(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        for video_id, ts, text in caption_rows(rows):
+            f.write(f"{video_id}\t{ts}\t{text}\n")
+
+def bench_index(parsed_file, phrases, repeat):
+    index_file = parsed_file + ".idx"
+    start = time.perf_counter()
+    n_docs, n_terms = build_index(parsed_file, index_file)
+    build_s = time.perf_counter() - start
+
+    index, open_ms = time_call(PhraseIndex, index_file)
+    latencies = []
+    for _ in range(repeat):
+        for q in phrases:
+            _, ms = time_call(index.search, q, 20)
+            latencies.append(ms)
+    index.close()
+    result = summarize(latencies)
+    result.update(build_seconds=round(build_s, 2), open_ms=round(open_ms, 3),
+                  docs=n_docs, terms=n_terms, bytes=os.path.getsize(index_file))
+    return result
+
+def bench_postgres(rows, phrases, repeat, schema):
+    from benchmarks.bench_fts import STORED_SQL, load_corpus, migrate
+    from benchmarks.common import connect
+
+    with connect() as conn:
+        load_corpus(conn, schema, rows)
+        migrate(conn)
+        latencies = []
+        with conn.cursor() as cur:
+            for _ in range(repeat):
+                for q in phrases:
+                    _, ms = time_call(lambda: cur.execute(STORED_SQL, {"q": q}).fetchall())
+                    latencies.append(ms)
+        size = conn.execute(
+            "SELECT pg_total_relation_size('captions')").fetchone()[0]
+        conn.execute(f"DROP SCHEMA {schema} CASCADE")
+    result = summarize(latencies)
+    result["bytes"] = size
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--phrases", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--parsed-file", help="use an existing parsed_captions.txt instead of synthetic rows")
+    parser.add_argument("--postgres", action="store_true", help="also time the Postgres FTS path")
+    parser.add_argument("--schema", default="bench_index")
+    add_output_arg(parser)
+    args = parser.parse_args()
+    if args.parsed_file and args.postgres:
+        parser.error("--postgres loads the synthetic corpus; drop --parsed-file to compare like for like")
+
+    phrases = sample_phrases(args.phrases)
+    results = {"rows": args.rows}
+    with tempfile.TemporaryDirectory() as tmp:
+        parsed_file = args.parsed_file
+        if not parsed_file:
+            parsed_file = os.path.join(tmp, "parsed_captions.txt")
+            write_parsed(parsed_file, args.rows)
+        results["index"] = bench_index(parsed_file, phrases, args.repeat)
+        print(f"index:    {results['index']}")
+
+    if args.postgres:
+        results["postgres"] = bench_postgres(args.rows, phrases, args.repeat, args.schema)
+        print(f"postgres: {results['postgres']}")
+
+    report("index", results, args)
+
+if __name__ == "__main__":
+    main()
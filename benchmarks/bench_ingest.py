@@ -0,0 +1,86 @@
+"""
+End-to-end ingest throughput on a generated corpus: parse files/sec, load rows/sec.
+
+    python -m benchmarks.bench_ingest --videos 300 --lines 800 --workers 1,2,4
+
+Generates auto-sub .vtt files (benchmarks.generate), runs file_parser.parse_files
+once per --workers value, then loads the parsed output into a scratch Postgres
+schema with data_insert_pg (COPY bulk load, then the per-video insert_rows path
+the pipeline uses). Use --skip-load without a database.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import file_parser
+from benchmarks.common import add_output_arg, connect, report
+from benchmarks.generate import write_vtt_files
+
+def bench_parse(paths, output_path, workers_list):
+    results = {}
+    for workers in workers_list:
+        stats = file_parser.parse_files(paths, output_path, workers=workers)
+        stats.pop("rows_per_video")
+        results[str(workers)] = stats
+        print(f"parse workers={workers}: {stats['files_per_sec']} files/s, {stats['rows_per_sec']} rows/s")
+    return results
+
+def bench_load(parsed_file, schema):
+    from psycopg.conninfo import make_conninfo
+
+    with connect() as conn:
+        conn.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        conn.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        conn.execute(f"CREATE SCHEMA {schema}")
+    os.environ["DATABASE_URL"] = make_conninfo(
+        os.environ["DATABASE_URL"], options=f"-csearch_path={schema},public")
+    import data_insert_pg as loader
+
+    results = {}
+    try:
+        loader.ensure_schema()
+        results["bulk"] = loader.bulk_insert_data(parsed_file)
+        print(f"bulk load: {results['bulk']['rows_per_sec']} rows/s")
+
+        with open(parsed_file, "r", encoding="utf-8") as f:
+            rows = [(vid, int(ts), text) for vid, ts, text in
+                    (line.rstrip("\n").split("\t", 2) for line in f)]
+        start = time.perf_counter()
+        loader.insert_rows(rows, replace_videos={vid for vid, _, _ in rows})
+        seconds = time.perf_counter() - start
+        results["insert_rows"] = {"rows": len(rows), "seconds": round(seconds, 2),
+                                  "rows_per_sec": round(len(rows) / seconds)}
+        print(f"insert_rows (replace): {results['insert_rows']['rows_per_sec']} rows/s")
+    finally:
+        loader.pool.close()
+        with connect() as conn:
+            conn.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--videos", type=int, default=300)
+    parser.add_argument("--lines", type=int, default=800, help="spoken lines per .vtt file")
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated parser worker counts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--schema", default="bench_ingest")
+    parser.add_argument("--skip-load", action="store_true", help="parse only; no database needed")
+    add_output_arg(parser)
+    args = parser.parse_args()
+
+    workers_list = [int(w) for w in args.workers.split(",") if w.strip()]
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        paths = write_vtt_files(os.path.join(tmp, "vtt_files"), args.videos, args.lines, args.seed)
+        results = {"videos": args.videos, "lines_per_video": args.lines,
+                   "vtt_bytes": sum(os.path.getsize(p) for p in paths),
+                   "generate_seconds": round(time.perf_counter() - start, 2)}
+        parsed_file = os.path.join(tmp, "parsed_captions.txt")
+        results["parse"] = bench_parse(paths, parsed_file, workers_list)
+        if not args.skip_load:
+            results["load"] = bench_load(parsed_file, args.schema)
+    report("ingest", results, args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Caption boundary joins (CAPTION_JOINS=1): index size and FTS latency vs rows only.
+
+    python -m benchmarks.bench_joins --rows 1000000
+    python -m benchmarks.bench_joins --rows 1000000 --layout compact
+
+Loads a synthetic corpus with data_insert_pg.bulk_insert_data (full reload,
+joins on) into a scratch schema and reports the bytes of the caption table
+and of the join table, with their indexes. Then it runs /search page one
+(top 20 by rank) two ways for two sets of phrases:
+
+    rows    the caption relation alone (what CAPTION_JOINS=0 runs)
+    joined  captions UNION ALL the boundary view, as app.py builds it
+
+    content   2-4 word phrases cut from inside one caption
+    straddle  the last two words of a caption + the first two of the next
+
+and reports latency plus how many phrases each way finds at all. For the
+straddle set it also counts how many are located, i.e. match at the start
+timestamp of the caption they begin in.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from psycopg.conninfo import make_conninfo
+
+from benchmarks.bench_storage import print_layout, table_sizes
+from benchmarks.common import add_output_arg, connect, report, summarize
+from benchmarks.corpus import sample_phrases
+from benchmarks.generate import write_parsed_file
+
+LAYOUTS = {
+    # caption relation, boundary view, tables to size
+    "rows": ("captions", "caption_boundaries", ("captions", "caption_joins")),
+    "compact": ("caption_search", "caption_search_boundaries",
+                ("caption_segments", "caption_segment_joins")),
+}
+
+SEARCH_SQL = """
+SELECT c.video_id, c."timestamp", c.caption_text
+FROM phraseto_tsquery('english'::regconfig, %s) AS query, {rel} c
+WHERE c.caption_tsv @@ query
+ORDER BY ts_rank(c.caption_tsv, query) DESC, c."timestamp", c.id
+LIMIT 20
+"""
+
+def joined_relation(captions, boundaries):
+    return f"""LATERAL (
+        SELECT video_id, "timestamp", caption_text, caption_tsv, id FROM {captions}
+        UNION ALL
+        SELECT video_id, "timestamp", caption_text, boundary_tsv, id FROM {boundaries}
+        WHERE numnode(query) > 1 AND NOT (caption_tsv @@ query OR next_tsv @@ query)
+    )"""
+
+LOCATE_SQL = """
+SELECT count(*)
+FROM phraseto_tsquery('english'::regconfig, %s) AS query, {rel} c
+WHERE c.caption_tsv @@ query AND c.video_id = %s AND c."timestamp" = %s
+"""
+
+def straddle_phrases(conn, captions, k, seed):
+    """
+    Phrases spanning two consecutive captions of one video.
+    Returns:
+        list: (phrase, video_id, timestamp of the first caption) tuples.
+    """
+    rows = conn.execute(f"""
+    SELECT video_id, "timestamp", caption_text, next_text FROM (
+      SELECT video_id, "timestamp", caption_text, id,
+             lead(caption_text) OVER (PARTITION BY video_id ORDER BY "timestamp", id) AS next_text
+      FROM {captions}
+    ) pairs
+    WHERE next_text IS NOT NULL
+    ORDER BY md5(id::text || %s)
+    LIMIT %s
+    """, (str(seed), k)).fetchall()
+    return [(" ".join(a.split()[-2:] + b.split()[:2]), video_id, ts)
+            for video_id, ts, a, b in rows]
+
+def time_queries(conn, sql, phrases):
+    latencies, found = [], 0
+    for phrase in phrases:
+        start = time.perf_counter()
+        rows = conn.execute(sql, (phrase,)).fetchall()
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        found += bool(rows)
+    return {**summarize(latencies), "phrases_found": found}
+
+def count_located(conn, sql, straddles):
+    return sum(conn.execute(sql, (phrase, video_id, ts)).fetchone()[0] > 0
+               for phrase, video_id, ts in straddles)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--layout", choices=sorted(LAYOUTS), default="rows")
+    parser.add_argument("--join-words", type=int, default=8, help="CAPTION_JOIN_WORDS")
+    parser.add_argument("--phrases", type=int, default=200, help="phrases per set")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--schema", default="bench_joins")
+    add_output_arg(parser)
+    args = parser.parse_args()
+
+    with connect() as conn:
+        conn.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        conn.execute(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE")
+        conn.execute(f"CREATE SCHEMA {args.schema}")
+    os.environ["DATABASE_URL"] = make_conninfo(
+        os.environ["DATABASE_URL"], options=f"-csearch_path={args.schema},public")
+    import data_insert_pg as loader
+
+    captions, boundaries, tables = LAYOUTS[args.layout]
+    results = {"rows": args.rows, "layout": args.layout, "join_words": args.join_words}
+    try:
+        loader.STORAGE_LAYOUT = args.layout
+        loader.CAPTION_JOINS = True
+        loader.CAPTION_JOIN_WORDS = args.join_words
+        loader.ensure_schema()
+        with tempfile.TemporaryDirectory() as tmp:
+            parsed_file = write_parsed_file(os.path.join(tmp, "parsed_captions.txt"), args.rows, args.seed)
+            results["load"] = loader.bulk_insert_data(parsed_file, full_reload=True)
+        print(f"loaded {results['load']['copied']} rows; joins built in "
+              f"{results['load']['joins_seconds']}s")
+
+        with connect() as conn:
+            conn.execute(f"SET search_path = {args.schema}, public")
+            for table in tables:
+                conn.execute(f"VACUUM ANALYZE {table}")
+            sizes = table_sizes(conn, tables)
+            print_layout(args.layout, sizes, args.rows)
+            base, joins = (sizes[t]["total"] for t in tables)
+            results["sizes"] = sizes
+            results["join_overhead"] = round(joins / base, 3)
+
+            straddles = straddle_phrases(conn, captions, args.phrases, args.seed)
+            phrases = {"content": sample_phrases(args.phrases, seed=args.seed),
+                       "straddle": [phrase for phrase, _, _ in straddles]}
+            relations = {"rows": captions, "joined": joined_relation(captions, boundaries)}
+            queries = {name: SEARCH_SQL.format(rel=rel) for name, rel in relations.items()}
+            for sql in queries.values():  # warm the caches once
+                time_queries(conn, sql, phrases["content"][:20])
+            results["latency"] = {}
+            for kind, items in phrases.items():
+                for name, sql in queries.items():
+                    r = time_queries(conn, sql, items)
+                    results["latency"][f"{kind}_{name}"] = r
+                    print(f"{kind:<9} {name:<7} p50 {r['p50_ms']:8.2f} ms  p95 {r['p95_ms']:8.2f} ms  "
+                          f"found {r['phrases_found']}/{len(items)}")
+            results["straddle_located"] = {
+                name: count_located(conn, LOCATE_SQL.format(rel=rel), straddles)
+                for name, rel in relations.items()}
+            print(f"straddle phrases located at their start: {results['straddle_located']} "
+                  f"of {len(straddles)}")
+    finally:
+        loader.pool.close()
+        with connect() as conn:
+            conn.execute(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE")
+
+    report("joins", results, args)
+
+if __name__ == "__main__":
+    main()
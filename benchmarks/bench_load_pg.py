@@ -0,0 +1,74 @@
+"""
+Postgres load throughput: executemany insert_data vs COPY bulk_insert_data.
+
+    python -m benchmarks.bench_load_pg --rows 500000
+
+Runs data_insert_pg against a scratch schema (search_path is redirected via the
+connection options), so the real tables are untouched. Reports rows/s for the
+row-by-row loader, an incremental bulk load into an empty table, a bulk re-load
+of the same rows (all conflicts), and a full reload with deferred GIN indexes.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from psycopg.conninfo import make_conninfo
+
+from benchmarks.common import add_output_arg, connect, report
+from benchmarks.corpus import caption_rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--schema", default="bench_load")
+    parser.add_argument("--skip-executemany", action="store_true",
+                        help="skip the slow row-by-row baseline")
+    add_output_arg(parser)
+    args = parser.parse_args()
+
+    with connect() as conn:
+        conn.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        conn.execute(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE")
+        conn.execute(f"CREATE SCHEMA {args.schema}")
+    os.environ["DATABASE_URL"] = make_conninfo(
+        os.environ["DATABASE_URL"], options=f"-csearch_path={args.schema},public")
+    import data_insert_pg as loader
+
+    results = {"rows": args.rows}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            parsed_file = os.path.join(tmp, "parsed_captions.txt")
+            with open(parsed_file, "w", encoding="utf-8") as f:
+                for video_id, ts, text in caption_rows(args.rows):
+                    f.write(f"{video_id}\t{ts}\t{text}\n")
+            loader.ensure_schema()
+
+            def reset():
+                with loader.pool.connection() as conn:
+                    conn.execute("TRUNCATE captions, videos")
+
+            if not args.skip_executemany:
+                start = time.perf_counter()
+                loader.insert_data(parsed_file)
+                seconds = time.perf_counter() - start
+                results["executemany"] = {"seconds": round(seconds, 2),
+                                          "rows_per_sec": round(args.rows / seconds)}
+                print(f"executemany: {results['executemany']}")
+                reset()
+
+            results["bulk_empty"] = loader.bulk_insert_data(parsed_file)
+            print(f"bulk (empty table): {results['bulk_empty']}")
+            results["bulk_existing"] = loader.bulk_insert_data(parsed_file)
+            print(f"bulk (rows exist):  {results['bulk_existing']}")
+            results["full_reload"] = loader.bulk_insert_data(parsed_file, full_reload=True)
+            print(f"full reload:        {results['full_reload']}")
+    finally:
+        loader.pool.close()
+        with connect() as conn:
+            conn.execute(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE")
+
+    report("load_pg", results, args)
+
+if __name__ == "__main__":
+    main()
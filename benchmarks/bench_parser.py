@@ -0,0 +1,82 @@
+"""
+Micro-benchmarks for the file_parser stages on large auto-generated VTT files.
+
+    python -m benchmarks.bench_parser --lines 50000 --repeat 5
+
+Each stage runs twice on identical input: the list-based helper
+(remove_duplicates, remove_redundant_captions, merge_captions,
+split_long_captions) and its streaming counterpart in the generator pipeline.
+The end-to-end row compares the old readlines + list chain with
+parse_vtt_file, and the outputs are checked to be identical.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import file_parser as fp
+from benchmarks.common import add_output_arg, report
+from benchmarks.corpus import autosub_vtt
+
+def best_of(repeat, fn, *args):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000.0
+
+def list_pipeline(path):
+    with open(path, "r", encoding="utf-8") as f:
+        captions = list(fp.iter_cues(f.readlines()[3:]))
+    captions = fp.remove_duplicates(captions)
+    captions = fp.remove_redundant_captions(captions)
+    captions = fp.merge_captions(captions, time_threshold=5)
+    return fp.split_long_captions(captions, max_length=150, interval=1.0)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=50_000, help="spoken lines per generated file")
+    parser.add_argument("--repeat", type=int, default=5)
+    add_output_arg(parser)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "autosub.en.vtt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(autosub_vtt(args.lines))
+        size = os.path.getsize(path)
+
+        with open(path, "r", encoding="utf-8") as f:
+            cues, cues_ms = best_of(1, lambda: list(fp.iter_cues(f.readlines()[3:])))
+        unique = fp.remove_duplicates(cues)
+        filtered = fp.remove_redundant_captions(unique)
+        merged = fp.merge_captions(filtered)
+
+        stages = {
+            "dedupe": (fp.remove_duplicates, fp.iter_unique, cues),
+            "redundant": (fp.remove_redundant_captions, fp.iter_non_redundant, unique),
+            "merge": (fp.merge_captions, fp.iter_merged, filtered),
+            "split": (fp.split_long_captions, fp.iter_split, merged),
+        }
+        results = {"lines": args.lines, "file_bytes": size, "cues": len(cues),
+                   "cues_ms": round(cues_ms, 2), "stages": {}}
+        for name, (list_fn, gen_fn, data) in stages.items():
+            expected, list_ms = best_of(args.repeat, list_fn, data)
+            got, gen_ms = best_of(args.repeat, lambda d: list(gen_fn(d)), data)
+            assert got == expected, f"{name}: streaming output differs"
+            results["stages"][name] = {"list_ms": round(list_ms, 2), "stream_ms": round(gen_ms, 2)}
+            print(f"{name:<10} list {list_ms:8.2f} ms   stream {gen_ms:8.2f} ms")
+
+        expected, list_ms = best_of(args.repeat, list_pipeline, path)
+        got, gen_ms = best_of(args.repeat, fp.parse_vtt_file, path)
+        assert got == expected, "end-to-end output differs"
+        results["end_to_end"] = {"list_ms": round(list_ms, 2), "stream_ms": round(gen_ms, 2),
+                                 "rows": len(got)}
+        print(f"{'total':<10} list {list_ms:8.2f} ms   stream {gen_ms:8.2f} ms   ({len(got)} rows)")
+
+    report("parser", results, args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Concurrent load generator for a running app: QPS and p50/p95/p99 per query class.
+
+    python -m benchmarks.bench_search_load --url http://localhost:8000 --concurrency 16 --duration 30
+
+Each client thread keeps one HTTP connection open and issues GET /search
+back-to-back for --duration seconds, choosing a query class by weight:
+
+    content   2-4 word phrases cut from the synthetic corpus (mostly hits)
+    stopword  stopword-only phrases ("to be", "it was that"), the trigram plan
+    short     one- or two-character queries, the ilike plan
+    miss      words that never occur
+    page2     a content phrase, then the next page via its cursor
+
+Load the corpus first (e.g. benchmarks.generate --rows N, then
+data_insert_pg.py --bulk --parsed-file ...). Hits from the app's result cache
+are counted separately; run the server with SEARCH_CACHE_ENTRIES=0 to measure
+the database alone.
+"""
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+import urllib.parse
+
+from benchmarks.common import add_output_arg, report, summarize
+from benchmarks.corpus import WORDS, sample_phrases
+from query_plan import STOPWORDS
+
+DEFAULT_MIX = "content=6,stopword=2,short=1,miss=1,page2=1"
+
+def build_queries(n, seed):
+    rng = random.Random(seed)
+    stop = [w for w in WORDS if w in STOPWORDS]
+    return {
+        "content": sample_phrases(n, seed=seed),
+        "stopword": [" ".join(rng.choices(stop, k=rng.randint(2, 4))) for _ in range(n)],
+        "short": [rng.choice("abcdefghijklmnopqrstuvwxyz") * rng.randint(1, 2) for _ in range(n)],
+        "miss": [f"zq{rng.randrange(10**6)}x" for _ in range(n)],
+    }
+
+class Client:
+    def __init__(self, url):
+        parsed = urllib.parse.urlsplit(url)
+        conn_cls = http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+        self.conn = conn_cls(parsed.netloc, timeout=60)
+
+    def search(self, params):
+        path = "/search?" + urllib.parse.urlencode(params)
+        try:
+            self.conn.request("GET", path)
+            resp = self.conn.getresponse()
+            body = resp.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()  # reconnects on the next request
+            raise
+        return resp.status, resp.getheader("X-Cache"), body
+
+def run_worker(url, deadline, queries, mix, seed, records, lock):
+    rng = random.Random(seed)
+    classes, weights = zip(*mix)
+    client = Client(url)
+    local = []
+    while time.perf_counter() < deadline:
+        kind = rng.choices(classes, weights)[0]
+        phrase = rng.choice(queries["content" if kind == "page2" else kind])
+        params = {"q": phrase, "limit": 20}
+        start = time.perf_counter()
+        try:
+            status, cache, body = client.search(params)
+            if kind == "page2" and status == 200:
+                cursor = json.loads(body).get("next_cursor")
+                if cursor:
+                    status, cache, body = client.search({**params, "cursor": cursor})
+        except Exception:
+            status, cache = "error", None
+        local.append((kind, (time.perf_counter() - start) * 1000.0, status, cache == "HIT"))
+    with lock:
+        records.extend(local)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of measured load")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds of unmeasured load first")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="class=weight,... (see module docstring)")
+    parser.add_argument("--phrases", type=int, default=500, help="distinct phrases per class")
+    parser.add_argument("--seed", type=int, default=0)
+    add_output_arg(parser)
+    args = parser.parse_args()
+
+    mix = [(k, float(v)) for k, v in (item.split("=") for item in args.mix.split(","))]
+    queries = build_queries(args.phrases, args.seed)
+    url = args.url.rstrip("/")
+
+    def run(seconds, seed_base):
+        records, lock = [], threading.Lock()
+        deadline = time.perf_counter() + seconds
+        threads = [threading.Thread(target=run_worker,
+                                    args=(url, deadline, queries, mix, seed_base + i, records, lock))
+                   for i in range(args.concurrency)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return records, time.perf_counter() - start
+
+    if args.warmup > 0:
+        run(args.warmup, 10_000)
+    records, elapsed = run(args.duration, args.seed * 1000)
+
+    ok = [r for r in records if r[2] == 200]
+    results = {
+        "concurrency": args.concurrency,
+        "seconds": round(elapsed, 2),
+        "requests": len(records),
+        "errors": len(records) - len(ok),
+        "qps": round(len(ok) / elapsed, 1) if elapsed else 0.0,
+        "cache_hit_ratio": round(sum(r[3] for r in ok) / len(ok), 3) if ok else 0.0,
+        "all": summarize([r[1] for r in ok]),
+        "by_class": {},
+    }
+    for kind, _ in mix:
+        rows = [r for r in records if r[0] == kind]
+        latencies = [r[1] for r in rows if r[2] == 200]
+        results["by_class"][kind] = {**summarize(latencies), "errors": len(rows) - len(latencies),
+                                     "qps": round(len(latencies) / elapsed, 1) if elapsed else 0.0}
+    report("search_load", results, args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Load throughput from parsed_captions.txt vs binary caption shards.
+
+    python -m benchmarks.bench_shards --rows 1000000
+    python -m benchmarks.bench_shards --rows 1000000 --skip-load   # no database needed
+
+Writes the same synthetic corpus as TSV and as shards (caption_shards.convert),
+then times a plain read of every row from each (split + int() vs mmap), and a
+COPY into Postgres through data_insert_pg.bulk_insert_data in a scratch schema
+(text COPY with write_row vs binary COPY straight from the mmap). Reports
+rows/s and on-disk bytes for both formats.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from psycopg.conninfo import make_conninfo
+
+import caption_shards
+from benchmarks.common import add_output_arg, connect, report
+from benchmarks.generate import write_parsed_file
+
+def read_tsv(path):
+    rows = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            video_id, ts_str, text = line.rstrip("\n").split("\t", 2)
+            int(ts_str)
+            rows += 1
+    return rows
+
+def read_shards(path):
+    return sum(1 for _ in caption_shards.iter_rows(path))
+
+def read_shards_raw(path):
+    rows = 0
+    for shard_path in caption_shards.shard_paths(path):
+        with caption_shards.CaptionShard(shard_path) as shard:
+            for _ in shard.raw_rows():
+                rows += 1
+    return rows
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    rows = fn(*args)
+    seconds = time.perf_counter() - start
+    return {"rows": rows, "seconds": round(seconds, 3),
+            "rows_per_sec": round(rows / seconds) if seconds else 0}
+
+def bench_load(tsv, shards, schema, full_reload):
+    with connect() as conn:
+        conn.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        conn.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        conn.execute(f"CREATE SCHEMA {schema}")
+    os.environ["DATABASE_URL"] = make_conninfo(
+        os.environ["DATABASE_URL"], options=f"-csearch_path={schema},public")
+    import data_insert_pg as loader
+
+    results = {}
+    try:
+        loader.ensure_schema()
+        for name, path in (("tsv", tsv), ("shards", shards)):
+            stats = loader.bulk_insert_data(path, full_reload=full_reload)
+            stats["copy_rows_per_sec"] = (round(stats["copied"] / stats["copy_seconds"])
+                                          if stats["copy_seconds"] else 0)
+            results[name] = stats
+            print(f"bulk load from {name}: COPY {stats['copy_rows_per_sec']} rows/s, "
+                  f"total {stats['rows_per_sec']} rows/s")
+    finally:
+        loader.pool.close()
+        with connect() as conn:
+            conn.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--shard-mb", type=float, default=caption_shards.SHARD_MB)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--schema", default="bench_shards")
+    parser.add_argument("--incremental", action="store_true",
+                        help="load without full_reload (keeps GIN indexes live)")
+    parser.add_argument("--skip-load", action="store_true", help="read only; no database needed")
+    add_output_arg(parser)
+    args = parser.parse_args()
+
+    results = {"rows": args.rows}
+    with tempfile.TemporaryDirectory() as tmp:
+        tsv = write_parsed_file(os.path.join(tmp, "parsed_captions.txt"), args.rows, args.seed)
+        shards = os.path.join(tmp, "parsed_captions.shards")
+        start = time.perf_counter()
+        _, n_shards = caption_shards.convert(tsv, shards, args.shard_mb)
+        results["convert_seconds"] = round(time.perf_counter() - start, 2)
+        results["bytes"] = {"tsv": os.path.getsize(tsv),
+                            "shards": sum(os.path.getsize(p) for p in caption_shards.shard_paths(shards)),
+                            "n_shards": n_shards}
+        print(f"TSV {results['bytes']['tsv'] / 1e6:.1f} MB, {n_shards} shards "
+              f"{results['bytes']['shards'] / 1e6:.1f} MB (converted in {results['convert_seconds']}s)")
+
+        results["read"] = {"tsv": timed(read_tsv, tsv), "shards": timed(read_shards, shards),
+                           "shards_raw": timed(read_shards_raw, shards)}
+        for name, r in results["read"].items():
+            print(f"read {name:<10} {r['rows_per_sec']:>10} rows/s")
+        if not args.skip_load:
+            results["load"] = bench_load(tsv, shards, args.schema, not args.incremental)
+            results["load"]["copy_speedup"] = round(
+                results["load"]["tsv"]["copy_seconds"] / results["load"]["shards"]["copy_seconds"], 2)
+    report("shards", results, args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+LIKE scan vs FTS5 phrase query for the local SQLite CLI path.
+
+    python -m benchmarks.bench_sqlite_fts --rows 1000000 --phrases 50
+
+Loads a synthetic corpus with data_insert (timing the batched load), then
+times the old `caption_text LIKE '%phrase%'` query against search_phrase's
+FTS5 query on the same database.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import data_insert
+import phrase_search
+from benchmarks.common import add_output_arg, report, summarize, time_call
+from benchmarks.corpus import caption_rows, sample_phrases
+
+LIKE_SQL = """
+SELECT videos.url, captions.timestamp
+FROM captions
+JOIN videos ON captions.video_id = videos.video_id
+WHERE caption_text LIKE ?
+"""
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--phrases", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=1)
+    add_output_arg(parser)
+    args = parser.parse_args()
+
+    phrases = sample_phrases(args.phrases)
+    with tempfile.TemporaryDirectory() as tmp:
+        parsed_file = os.path.join(tmp, "parsed_captions.txt")
+        db_path = os.path.join(tmp, "phrase_search.db")
+        with open(parsed_file, "w", encoding="utf-8") as f:
+            for video_id, ts, text in caption_rows(args.rows):
+                f.write(f"{video_id}\t{ts}\t{text}\n")
+
+        start = time.perf_counter()
+        data_insert.create_tables(db_path)
+        data_insert.insert_data(db_path, parsed_file)
+        load_s = time.perf_counter() - start
+        print(f"Loaded {args.rows} rows in {load_s:.1f}s ({args.rows / load_s:,.0f} rows/s)")
+
+        conn = sqlite3.connect(db_path)
+        like, fts = [], []
+        phrase_search.DB_PATH = db_path
+        for _ in range(args.repeat):
+            for q in phrases:
+                _, ms = time_call(lambda: conn.execute(LIKE_SQL, ("%" + q + "%",)).fetchall())
+                like.append(ms)
+                _, ms = time_call(phrase_search.search_phrase, q)
+                fts.append(ms)
+        conn.close()
+        phrase_search.get_connection().close()
+
+    results = {"rows": args.rows, "load_rows_per_sec": round(args.rows / load_s),
+               "like": summarize(like), "fts5": summarize(fts)}
+    report("sqlite_fts", results, args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Storage footprint of the rows layout vs the compact layout, per million captions.
+
+    python -m benchmarks.bench_storage --rows 1000000
+    python -m benchmarks.bench_storage --live          # sizes of the current database only
+
+Loads the same synthetic corpus through data_insert_pg.bulk_insert_data
+(full reload, so every index is built once) under both STORAGE_LAYOUT values,
+in a scratch schema. Reports heap, TOAST and per-index bytes, and checks that
+FTS and ILIKE matches are identical through captions and caption_search.
+"""
+import argparse
+import os
+import tempfile
+
+from psycopg.conninfo import make_conninfo
+
+from benchmarks.common import add_output_arg, connect, report
+from benchmarks.corpus import sample_phrases
+from benchmarks.generate import write_parsed_file
+
+LAYOUT_TABLES = {
+    "rows": ("captions", "videos"),
+    "compact": ("caption_segments", "video_keys"),
+}
+
+SIZE_SQL = """
+SELECT c.relname,
+       pg_relation_size(c.oid),
+       pg_total_relation_size(c.oid) - pg_relation_size(c.oid) - pg_indexes_size(c.oid),
+       c.reltuples::bigint
+FROM pg_class c
+WHERE c.oid = to_regclass(%s)
+"""
+
+INDEX_SQL = """
+SELECT i.relname, pg_relation_size(i.oid)
+FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+WHERE x.indrelid = to_regclass(%s)
+ORDER BY i.relname
+"""
+
+def table_sizes(conn, tables):
+    """
+    Returns:
+        dict: {table: {heap, toast, indexes: {name: bytes}, total}} for tables that exist.
+    """
+    out = {}
+    for table in tables:
+        row = conn.execute(SIZE_SQL, (table,)).fetchone()
+        if row is None:
+            continue
+        _, heap, toast, tuples = row
+        indexes = dict(conn.execute(INDEX_SQL, (table,)).fetchall())
+        out[table] = {"heap": heap, "toast": toast, "indexes": indexes,
+                      "total": heap + toast + sum(indexes.values()), "est_rows": tuples}
+    return out
+
+def per_million(total, captions):
+    return round(total * 1_000_000 / captions) if captions else 0
+
+def print_layout(name, sizes, captions):
+    total = sum(t["total"] for t in sizes.values())
+    print(f"{name}: {total / 2**20:,.1f} MiB total, {per_million(total, captions) / 2**20:,.1f} MiB per million captions")
+    for table, t in sizes.items():
+        print(f"  {table:<22} heap {t['heap'] / 2**20:9,.1f} MiB   toast {t['toast'] / 2**20:7,.1f} MiB")
+        for index, size in t["indexes"].items():
+            print(f"    {index:<36} {size / 2**20:9,.1f} MiB")
+
+MATCH_SQL = {
+    "fts": """SELECT c.video_id, c."timestamp", c.caption_text
+              FROM {rel} c, phraseto_tsquery('english'::regconfig, %s) AS query
+              WHERE c.caption_tsv @@ query""",
+    "ilike": """SELECT c.video_id, c."timestamp", c.caption_text
+                FROM {rel} c WHERE c.caption_text ILIKE %s""",
+}
+
+def check_same_matches(conn, phrases):
+    """
+    Runs every phrase against both relations; returns the phrases whose match sets differ.
+    """
+    differ = []
+    for phrase in phrases:
+        for mode, sql in MATCH_SQL.items():
+            arg = phrase if mode == "fts" else f"%{phrase}%"
+            a = sorted(conn.execute(sql.format(rel="captions"), (arg,)).fetchall())
+            b = sorted(conn.execute(sql.format(rel="caption_search"), (arg,)).fetchall())
+            if a != b:
+                differ.append((mode, phrase))
+    return differ
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--phrases", type=int, default=20, help="phrases for the match check")
+    parser.add_argument("--schema", default="bench_storage")
+    parser.add_argument("--live", action="store_true", help="only report the current database")
+    add_output_arg(parser)
+    args = parser.parse_args()
+
+    if args.live:
+        results = {}
+        with connect() as conn:
+            for layout, tables in LAYOUT_TABLES.items():
+                sizes = table_sizes(conn, tables)
+                if sizes:
+                    captions = sizes[tables[0]]["est_rows"]
+                    print_layout(layout, sizes, captions)
+                    results[layout] = {"captions": captions, "tables": sizes,
+                                       "bytes_per_million": per_million(
+                                           sum(t["total"] for t in sizes.values()), captions)}
+        report("storage_live", results, args)
+        return
+
+    with connect() as conn:
+        conn.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        conn.execute(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE")
+        conn.execute(f"CREATE SCHEMA {args.schema}")
+    os.environ["DATABASE_URL"] = make_conninfo(
+        os.environ["DATABASE_URL"], options=f"-csearch_path={args.schema},public")
+    import data_insert_pg as loader
+
+    results = {"rows": args.rows}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            parsed_file = write_parsed_file(os.path.join(tmp, "parsed_captions.txt"), args.rows)
+            for layout in LAYOUT_TABLES:
+                loader.STORAGE_LAYOUT = layout
+                loader.ensure_schema()
+                results[f"load_{layout}"] = loader.bulk_insert_data(parsed_file, full_reload=True)
+
+        with connect() as conn:
+            conn.execute(f"SET search_path = {args.schema}, public")
+            for layout, tables in LAYOUT_TABLES.items():
+                for table in tables:
+                    conn.execute(f"VACUUM ANALYZE {table}")
+                sizes = table_sizes(conn, tables)
+                total = sum(t["total"] for t in sizes.values())
+                results[layout] = {"tables": sizes, "total_bytes": total,
+                                   "bytes_per_million": per_million(total, args.rows)}
+                print_layout(layout, sizes, args.rows)
+            results["compact_vs_rows"] = round(
+                results["compact"]["total_bytes"] / results["rows"]["total_bytes"], 3)
+            differ = check_same_matches(conn, sample_phrases(args.phrases) + ["to be", "the"])
+            results["match_check"] = {"phrases": args.phrases + 2, "differ": differ}
+            print(f"compact/rows size ratio {results['compact_vs_rows']}; "
+                  f"match sets {'identical' if not differ else f'DIFFER for {differ}'}")
+    finally:
+        loader.pool.close()
+        with connect() as conn:
+            conn.execute(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE")
+
+    report("storage", results, args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import datetime
+import json
+import os
+import platform
+import subprocess
+import time
+import psycopg
+from dotenv import load_dotenv
+
+def connect(autocommit=True):
+    """
+    Opens a direct connection to DATABASE_URL (benchmarks bypass the app pool).
+    """
+    load_dotenv()
+    dsn = os.getenv("DATABASE_URL")
+    if not dsn:
+        raise SystemExit("DATABASE_URL is not set")
+    return psycopg.connect(dsn, autocommit=autocommit)
+
+def percentile(values, p):
+    """
+    Nearest-rank percentile of a list of numbers (p in 0..100).
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(p / 100.0 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+def summarize(latencies_ms):
+    """
+    Returns count, mean and tail latencies for a list of millisecond timings.
+    """
+    n = len(latencies_ms)
+    return {
+        "n": n,
+        "mean_ms": round(sum(latencies_ms) / n, 3) if n else 0.0,
+        "p50_ms": round(percentile(latencies_ms, 50), 3),
+        "p95_ms": round(percentile(latencies_ms, 95), 3),
+        "p99_ms": round(percentile(latencies_ms, 99), 3),
+    }
+
+def time_call(fn, *args, **kwargs):
+    """
+    Runs fn once and returns (result, elapsed milliseconds).
+    """
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000.0
+
+def add_output_arg(parser):
+    """
+    Adds --out: where to save the run as JSON for benchmarks.compare.
+    """
+    parser.add_argument("--out", help="save results JSON to this file, or into this directory")
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def report(name, results, args):
+    """
+    Prints results and, with --out, saves them together with the arguments,
+    commit and host so two runs can be diffed with benchmarks.compare.
+    Returns:
+        str | None: Path written.
+    """
+    print(json.dumps(results, indent=2))
+    if not getattr(args, "out", None):
+        return None
+    record = {
+        "benchmark": name,
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "host": platform.node(),
+        "cpus": os.cpu_count(),
+        "args": {k: v for k, v in vars(args).items() if k != "out"},
+        "results": results,
+    }
+    path = args.out
+    if os.path.isdir(path) or path.endswith(os.sep):
+        os.makedirs(path, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(path, f"{name}_{stamp}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(record, f, indent=2)
+    print(f"Saved {path}")
+    return path
@@ -0,0 +1,68 @@
+"""
+Side-by-side diff of two saved benchmark runs (see --out on every benchmark).
+
+    python -m benchmarks.compare results/search_load_before.json results/search_load_after.json
+
+Every numeric leaf of the two "results" trees is printed with its relative
+change. Lower is better for latencies and durations (*_ms, *_s, seconds), and
+higher is better for throughput (*_per_sec, qps); those rows are marked
+better or worse when they move by more than --threshold percent.
+"""
+import argparse
+import json
+
+LOWER_IS_BETTER = ("_ms", "_s", "seconds")
+HIGHER_IS_BETTER = ("per_sec", "per_s", "qps", "speedup")
+
+def flatten(tree, prefix=""):
+    """
+    Yields (dotted.path, number) for every numeric leaf.
+    """
+    if isinstance(tree, dict):
+        for key, value in tree.items():
+            yield from flatten(value, f"{prefix}{key}.")
+    elif isinstance(tree, (int, float)) and not isinstance(tree, bool):
+        yield prefix.rstrip("."), tree
+
+def verdict(path, old, new, threshold):
+    leaf = path.rsplit(".", 1)[-1]
+    if old == 0 or abs(new - old) / abs(old) * 100 < threshold:
+        return ""
+    if leaf.endswith(HIGHER_IS_BETTER):
+        return "better" if new > old else "worse"
+    if leaf.endswith(LOWER_IS_BETTER):
+        return "better" if new < old else "worse"
+    return ""
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=5.0, help="percent change worth flagging")
+    args = parser.parse_args()
+
+    with open(args.old, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    if old.get("benchmark") != new.get("benchmark"):
+        print(f"warning: comparing {old.get('benchmark')} with {new.get('benchmark')}")
+    print(f"old: {old.get('git_commit')} {old.get('created_at')}  new: {new.get('git_commit')} {new.get('created_at')}")
+    for key in sorted(set(old.get("args", {})) | set(new.get("args", {}))):
+        a, b = old.get("args", {}).get(key), new.get("args", {}).get(key)
+        if a != b:
+            print(f"  arg {key}: {a} -> {b}")
+
+    old_values = dict(flatten(old.get("results", {})))
+    new_values = dict(flatten(new.get("results", {})))
+    width = max((len(p) for p in old_values), default=10)
+    print(f"{'metric':<{width}}  {'old':>12}  {'new':>12}  {'change':>8}")
+    for path, a in old_values.items():
+        if path not in new_values:
+            continue
+        b = new_values[path]
+        change = f"{(b - a) / abs(a) * 100:+.1f}%" if a else "n/a"
+        print(f"{path:<{width}}  {a:>12g}  {b:>12g}  {change:>8}  {verdict(path, a, b, args.threshold)}")
+
+if __name__ == "__main__":
+    main()
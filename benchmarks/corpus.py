@@ -0,0 +1,102 @@
+"""Deterministic synthetic caption corpus for benchmarks."""
+import random
+import string
+from itertools import accumulate
+
+# Conversational vocabulary: stopwords first so the Zipf weighting makes them
+# the most frequent tokens, the way they are in real auto-generated subs.
+WORDS = (
+    "the i you to and a it that of is in like was so but just what we this "
+    "know not they he be on for have yeah do with me my are all no one if "
+    "there about at get can oh go think right out up really that's it's "
+    "don't i'm people thing time gonna good how would when or because "
+    "then want got see guys actually okay mean said some well back even "
+    "video game food anime japan trip chicken ramen tokyo episode podcast "
+    "camera friend story question money house car week night morning "
+    "weird funny crazy amazing honestly literally basically definitely "
+    "remember imagine understand happened started wanted watching playing "
+    "eating drinking talking laughing hospital airport restaurant kitchen "
+    "manga studio editor sponsor channel comment subscribe content stream"
+).split()
+
+_CUM_WEIGHTS = list(accumulate(1.0 / (rank + 1) for rank in range(len(WORDS))))
+
+def video_ids(n_videos, seed=0):
+    """
+    Returns n deterministic 11-character YouTube-style video ids.
+    """
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + string.digits + "-_"
+    return ["".join(rng.choice(alphabet) for _ in range(11)) for _ in range(n_videos)]
+
+def caption_text(rng, min_words=8, max_words=30):
+    """
+    Generates one caption row of Zipf-distributed words.
+    """
+    n = rng.randint(min_words, max_words)
+    return " ".join(rng.choices(WORDS, cum_weights=_CUM_WEIGHTS, k=n))
+
+def caption_rows(n_rows, n_videos=None, seed=0):
+    """
+    Yields (video_id, timestamp, caption_text) rows shaped like parsed_captions.txt.
+    Rows are grouped per video with increasing timestamps.
+    """
+    rng = random.Random(seed)
+    n_videos = n_videos or max(1, n_rows // 1500)
+    vids = video_ids(n_videos, seed)
+    per_video = -(-n_rows // n_videos)
+    emitted = 0
+    for vid in vids:
+        ts = 0
+        for _ in range(per_video):
+            if emitted >= n_rows:
+                return
+            ts += rng.randint(6, 12)
+            yield vid, ts, caption_text(rng)
+            emitted += 1
+
+def sample_phrases(k, seed=1, min_words=2, max_words=4):
+    """
+    Returns k phrases cut from generated captions, so most of them have hits.
+    """
+    rng = random.Random(seed)
+    phrases = []
+    while len(phrases) < k:
+        words = caption_text(rng).split()
+        n = rng.randint(min_words, max_words)
+        start = rng.randint(0, len(words) - n)
+        phrases.append(" ".join(words[start:start + n]))
+    return phrases
+
+def _vtt_time(seconds):
+    hours, rem = divmod(seconds, 3600)
+    minutes, secs = divmod(rem, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{secs:06.3f}"
+
+def autosub_vtt(n_lines, seed=0, words_per_line=(5, 10)):
+    """
+    Returns the text of a YouTube auto-generated style .vtt file with n_lines
+    spoken lines: every line appears twice with inline <c> word timings, rolls
+    up into the next cue, and is repeated in a 10ms "settle" cue - the rolling
+    duplication the parser has to undo.
+    """
+    rng = random.Random(seed)
+    out = ["WEBVTT", "Kind: captions", "Language: en", ""]
+    t = 0.0
+    prev = ""
+    for i in range(n_lines):
+        words = caption_text(rng, *words_per_line).split()
+        start, end = t, t + rng.uniform(1.5, 4.0)
+        step = (end - start) / len(words)
+        timed = words[0] + "".join(
+            f"<{_vtt_time(start + k * step)}><c> {w}</c>" for k, w in enumerate(words[1:], 1))
+        if rng.random() < 0.03:
+            timed = "[Music]"
+        out += [f"{_vtt_time(start)} --> {_vtt_time(end)} align:start position:0%",
+                prev or " ", timed, ""]
+        plain = " ".join(words) if timed != "[Music]" else ""
+        out += [f"{_vtt_time(end)} --> {_vtt_time(end + 0.01)} align:start position:0%",
+                plain or " ", " ", ""]
+        prev = plain
+        t = end + 0.01
+    return "\n".join(out) + "\n"
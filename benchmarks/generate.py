@@ -0,0 +1,63 @@
+"""
+Writes a deterministic synthetic corpus to disk at a chosen scale.
+
+    python -m benchmarks.generate --out-dir bench_data --videos 500 --lines 800 --rows 2000000
+
+Produces bench_data/vtt_files/<video_id>.en.vtt (auto-sub style, see
+corpus.autosub_vtt) and bench_data/parsed_captions.txt (corpus.caption_rows).
+The same --seed always yields byte-identical files, so runs on different
+commits or machines measure the same input.
+"""
+import argparse
+import json
+import os
+
+from benchmarks.corpus import autosub_vtt, caption_rows, video_ids
+
+def write_vtt_files(folder, n_videos, lines_per_video, seed=0):
+    """
+    Returns:
+        list: Paths of the generated .vtt files, in video order.
+    """
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for i, vid in enumerate(video_ids(n_videos, seed)):
+        path = os.path.join(folder, f"{vid}.en.vtt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(autosub_vtt(lines_per_video, seed=seed * 1_000_003 + i))
+        paths.append(path)
+    return paths
+
+def write_parsed_file(path, n_rows, seed=0):
+    """
+    Writes n_rows in parsed_captions.txt format.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        for video_id, ts, text in caption_rows(n_rows, seed=seed):
+            f.write(f"{video_id}\t{ts}\t{text}\n")
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--out-dir", default="bench_data")
+    parser.add_argument("--videos", type=int, default=200, help=".vtt files to write; 0 = none")
+    parser.add_argument("--lines", type=int, default=800, help="spoken lines per .vtt file")
+    parser.add_argument("--rows", type=int, default=0, help="parsed_captions.txt rows; 0 = none")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    summary = {"out_dir": args.out_dir, "seed": args.seed}
+    if args.videos:
+        folder = os.path.join(args.out_dir, "vtt_files")
+        paths = write_vtt_files(folder, args.videos, args.lines, args.seed)
+        summary["vtt_files"] = len(paths)
+        summary["vtt_bytes"] = sum(os.path.getsize(p) for p in paths)
+    if args.rows:
+        os.makedirs(args.out_dir, exist_ok=True)
+        path = write_parsed_file(os.path.join(args.out_dir, "parsed_captions.txt"), args.rows, args.seed)
+        summary["parsed_rows"] = args.rows
+        summary["parsed_bytes"] = os.path.getsize(path)
+    print(json.dumps(summary, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+"""
+Stand-in for yt-dlp when exercising download_captions without the network:
+
+    YTDLP_BIN="python benchmarks/stub_yt_dlp.py" python download_captions.py --workers 8
+
+Writes <output>/<id>.en.vtt for the requested URL after STUB_DELAY seconds.
+STUB_FAIL_CLIENTS (comma-separated) makes those player clients exit 1, and
+STUB_NO_SUBS_EVERY=n makes every n-th video id (by hash) have no subtitles.
+"""
+import os
+import sys
+import time
+import zlib
+
+VTT = """WEBVTT
+Kind: captions
+Language: en
+
+00:00:01.000 --> 00:00:03.000
+stub caption for {vid}
+"""
+
+def main(argv):
+    template = argv[argv.index("-o") + 1]
+    url = argv[-1]
+    client = None
+    if "--extractor-args" in argv:
+        client = argv[argv.index("--extractor-args") + 1].split("player_client=")[-1]
+    vid = url.rsplit("v=", 1)[-1]
+
+    time.sleep(float(os.getenv("STUB_DELAY", "0.2")))
+    if client in os.getenv("STUB_FAIL_CLIENTS", "").split(","):
+        print(f"ERROR: [stub] client {client} refused", file=sys.stderr)
+        return 1
+    every = int(os.getenv("STUB_NO_SUBS_EVERY", "0"))
+    if every and zlib.crc32(vid.encode()) % every == 0:
+        return 0
+    path = template.replace("%(id)s", vid).replace("%(ext)s", "en.vtt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(VTT.format(vid=vid))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
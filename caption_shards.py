@@ -0,0 +1,266 @@
+# caption_shards.py
+"""
+Binary alternative to parsed_captions.txt: a directory of shard files that
+loaders read through mmap instead of splitting text lines.
+
+A shard holds whole videos (a video is never split across shards) and is cut
+once its caption text passes the size limit; a limit of 0 gives one shard per
+video. Shards are named 00000.cap, 00001.cap, ... and read in name order, so
+a directory yields the same rows in the same order as the TSV it replaces.
+Each shard stands alone, so shards can be loaded in parallel or one at a time.
+
+Shard layout (native little-endian, every section 8-byte aligned):
+
+    header    magic, version, n_rows, n_videos, section offsets
+    vid_off   u64[n_videos + 1]  -> video ids in vid_blob
+    vid_rows  u64[n_videos + 1]  -> first row of each video (rows are grouped by video)
+    ts        u32[n_rows]        timestamp in whole seconds
+    text_off  u64[n_rows + 1]    -> UTF-8 caption text in text_blob
+    vid_blob
+    text_blob per row: UTF-8 text, "\n"
+
+text_off gives each row's start, so one row's text is a zero-copy slice;
+the newline terminators let a whole video's text decode in one call.
+
+Usage:
+    python caption_shards.py convert [parsed_captions.txt] [parsed_captions.shards] [--shard-mb 64]
+    python caption_shards.py cat [parsed_captions.shards]
+"""
+import argparse
+import glob
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+MAGIC = b"PSCS"
+VERSION = 1
+HEADER = struct.Struct("<4sHHQQ6Q")  # magic, version, reserved, n_rows, n_videos, 6 offsets
+SHARD_MB = 64
+SUFFIX = ".cap"
+
+def _align(f, n=8):
+    pad = -f.tell() % n
+    if pad:
+        f.write(b"\0" * pad)
+
+def is_shards(path):
+    """
+    True if path is a shard directory or a single shard file rather than TSV.
+    """
+    return os.path.isdir(path) or path.endswith(SUFFIX)
+
+def shard_paths(path):
+    """
+    Returns:
+        list: Shard files under a directory in read order, or [path] for one shard.
+    """
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, "*" + SUFFIX)))
+    return [path]
+
+class ShardWriter:
+    """
+    Writes videos into a shard directory, starting a new shard once the
+    current one holds shard_mb of caption text. Existing shards in the
+    directory are removed first, the way opening a TSV output truncates it.
+    Each shard is written to a temp file and renamed into place.
+    """
+
+    def __init__(self, out_dir, shard_mb=SHARD_MB):
+        if sys.byteorder != "little":
+            raise RuntimeError("caption shard files are little-endian only")
+        self.out_dir = out_dir
+        self.shard_bytes = int(shard_mb * 1024 * 1024)
+        self.shards = 0
+        self.rows = 0
+        os.makedirs(out_dir, exist_ok=True)
+        for old in shard_paths(out_dir):
+            os.remove(old)
+        self._reset()
+
+    def _reset(self):
+        self._vid_off = array("Q", [0])
+        self._vid_rows = array("Q", [0])
+        self._vid_blob = bytearray()
+        self._ts = array("I")
+        self._text_off = array("Q", [0])
+        self._text_blob = bytearray()
+
+    def write_video(self, video_id, captions):
+        """
+        Appends one video's (timestamp, caption_text) rows (a list or an iterator).
+        Returns:
+            int: Number of rows written.
+        """
+        rows = 0
+        for timestamp, text in captions:
+            if "\n" in text:
+                raise ValueError(f"caption text of {video_id} contains a newline")
+            self._ts.append(int(timestamp))
+            self._text_blob += text.encode("utf-8")
+            self._text_blob += b"\n"
+            self._text_off.append(len(self._text_blob))
+            rows += 1
+        if rows:
+            self._vid_blob += video_id.encode("utf-8")
+            self._vid_off.append(len(self._vid_blob))
+            self._vid_rows.append(len(self._ts))
+            self.rows += rows
+            if len(self._text_blob) >= self.shard_bytes:
+                self._flush()
+        return rows
+
+    def _flush(self):
+        n_rows, n_videos = len(self._ts), len(self._vid_off) - 1
+        if not n_videos:
+            return
+        path = os.path.join(self.out_dir, f"{self.shards:05d}{SUFFIX}")
+        with open(path + ".tmp", "wb") as out:
+            out.write(b"\0" * HEADER.size)
+            _align(out)
+            offsets = []
+            for section in (self._vid_off, self._vid_rows, self._ts, self._text_off,
+                            self._vid_blob, self._text_blob):
+                _align(out)
+                offsets.append(out.tell())
+                out.write(section)
+            out.seek(0)
+            out.write(HEADER.pack(MAGIC, VERSION, 0, n_rows, n_videos, *offsets))
+        os.replace(path + ".tmp", path)
+        self.shards += 1
+        self._reset()
+
+    def close(self):
+        self._flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class CaptionShard:
+    """
+    Read-only, memory-mapped view of one shard. Caption text comes back as
+    memoryview slices of the mapping (raw_rows) or decoded (rows).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mm)
+        (magic, version, _, self.n_rows, self.n_videos, vid_off_at, vid_rows_at,
+         ts_at, text_off_at, self._vid_blob_at, self._text_blob_at) = HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a caption shard (v{VERSION})")
+        self._buf = buf
+        self._vid_off = buf[vid_off_at:vid_off_at + 8 * (self.n_videos + 1)].cast("Q")
+        self._vid_rows = buf[vid_rows_at:vid_rows_at + 8 * (self.n_videos + 1)].cast("Q")
+        self.timestamps = buf[ts_at:ts_at + 4 * self.n_rows].cast("I")
+        self._text_off = buf[text_off_at:text_off_at + 8 * (self.n_rows + 1)].cast("Q")
+
+    def close(self):
+        for view in (self._vid_off, self._vid_rows, self.timestamps, self._text_off, self._buf):
+            view.release()
+        try:
+            self._mm.close()
+        except BufferError:
+            pass  # a text() view is still alive; the mapping goes away with it
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def videos(self):
+        """
+        Yields (video_id, first_row, end_row) for each video in the shard.
+        """
+        base = self._vid_blob_at
+        for i in range(self.n_videos):
+            video_id = str(self._buf[base + self._vid_off[i]:base + self._vid_off[i + 1]], "utf-8")
+            yield video_id, self._vid_rows[i], self._vid_rows[i + 1]
+
+    def text(self, row):
+        """
+        Returns the UTF-8 caption text of a row as a zero-copy memoryview.
+        """
+        base = self._text_blob_at
+        return self._buf[base + self._text_off[row]:base + self._text_off[row + 1] - 1]
+
+    def raw_rows(self):
+        """
+        Yields (video_id, timestamp, text memoryview) without decoding the text.
+        """
+        for video_id, start, end in self.videos():
+            for row in range(start, end):
+                yield video_id, self.timestamps[row], self.text(row)
+
+    def rows(self):
+        """
+        Yields (video_id, timestamp, caption_text) like a parsed_captions.txt line.
+        """
+        base, ts = self._text_blob_at, self.timestamps
+        for video_id, start, end in self.videos():
+            blob = self._buf[base + self._text_off[start]:base + self._text_off[end] - 1]
+            texts = str(blob, "utf-8").split("\n")
+            blob.release()
+            for row, text in zip(range(start, end), texts):
+                yield video_id, ts[row], text
+
+def iter_rows(path):
+    """
+    Yields (video_id, timestamp, caption_text) for every row of a shard
+    directory (or single shard), in order.
+    """
+    for shard_path in shard_paths(path):
+        with CaptionShard(shard_path) as shard:
+            yield from shard.rows()
+
+def convert(parsed_file="parsed_captions.txt", out_dir="parsed_captions.shards", shard_mb=SHARD_MB):
+    """
+    Converts a parsed_captions.txt file into a shard directory. Consecutive
+    rows of the same video are written as one video.
+    Returns:
+        tuple: (rows, shards) written.
+    """
+    with open(parsed_file, "r", encoding="utf-8") as src, ShardWriter(out_dir, shard_mb) as writer:
+        video_id, captions = None, []
+        for line in src:
+            vid, ts_str, text = line.rstrip("\n").split("\t", 2)
+            if vid != video_id:
+                if captions:
+                    writer.write_video(video_id, captions)
+                video_id, captions = vid, []
+            captions.append((int(ts_str), text))
+        if captions:
+            writer.write_video(video_id, captions)
+    return writer.rows, writer.shards
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert parsed_captions.txt to caption shards and back.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    conv = sub.add_parser("convert", help="TSV -> shard directory")
+    conv.add_argument("parsed_file", nargs="?", default="parsed_captions.txt")
+    conv.add_argument("out_dir", nargs="?", default="parsed_captions.shards")
+    conv.add_argument("--shard-mb", type=float, default=SHARD_MB,
+                      help="caption text per shard; 0 = one shard per video")
+    cat = sub.add_parser("cat", help="print shards as parsed_captions.txt rows")
+    cat.add_argument("path", nargs="?", default="parsed_captions.shards")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        rows, shards = convert(args.parsed_file, args.out_dir, args.shard_mb)
+        size = sum(os.path.getsize(p) for p in shard_paths(args.out_dir))
+        print(f"Wrote {rows} rows in {shards} shards -> {args.out_dir} ({size / 1e6:.1f} MB)")
+    else:
+        out = sys.stdout
+        for video_id, ts, text in iter_rows(args.path):
+            out.write(f"{video_id}\t{ts}\t{text}\n")
+
+if __name__ == "__main__":
+    main()
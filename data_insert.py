@@ -1,7 +1,11 @@
 import sqlite3
 
-def create_tables():
-    conn = sqlite3.connect('phrase_search.db')
+import caption_shards
+
+BATCH = 5000
+
+def create_tables(db_path='phrase_search.db'):
+    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
 
     cursor.execute("""
@@ -19,22 +23,76 @@ def create_tables():
             FOREIGN KEY (video_id) REFERENCES videos(video_id)
         )
     """)
+
+    # Full-text index over captions.caption_text (external content: the text is
+    # stored once, in captions). Triggers keep it in sync with every write.
+    has_fts = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'captions_fts'").fetchone()
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS captions_fts USING fts5(
+            caption_text, content='captions', content_rowid='id'
+        )
+    """)
+    cursor.executescript("""
+        CREATE TRIGGER IF NOT EXISTS captions_fts_ai AFTER INSERT ON captions BEGIN
+            INSERT INTO captions_fts(rowid, caption_text) VALUES (new.id, new.caption_text);
+        END;
+        CREATE TRIGGER IF NOT EXISTS captions_fts_ad AFTER DELETE ON captions BEGIN
+            INSERT INTO captions_fts(captions_fts, rowid, caption_text)
+            VALUES ('delete', old.id, old.caption_text);
+        END;
+        CREATE TRIGGER IF NOT EXISTS captions_fts_au AFTER UPDATE ON captions BEGIN
+            INSERT INTO captions_fts(captions_fts, rowid, caption_text)
+            VALUES ('delete', old.id, old.caption_text);
+            INSERT INTO captions_fts(rowid, caption_text) VALUES (new.id, new.caption_text);
+        END;
+    """)
+    if not has_fts:
+        # database predates the FTS table: index the captions already there
+        cursor.execute("INSERT INTO captions_fts(captions_fts) VALUES ('rebuild')")
     conn.commit()
     conn.close()
 
-def insert_data():
-    conn = sqlite3.connect('phrase_search.db')
+def iter_parsed(parsed_file):
+    """
+    Yields (video_id, timestamp, caption_text) from parsed_captions.txt or
+    from a caption shard directory (file_parser.py --format shards).
+    """
+    if caption_shards.is_shards(parsed_file):
+        yield from caption_shards.iter_rows(parsed_file)
+        return
+    with open(parsed_file, "r", encoding="utf-8") as file:
+        for line in file:
+            yield line.strip().split("\t")
+
+def insert_data(db_path='phrase_search.db', parsed_file='parsed_captions.txt'):
+    """
+    Loads parsed_captions.txt (or a caption shard directory) in batched
+    transactions of BATCH rows, one executemany per table per batch.
+    """
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
     cursor = conn.cursor()
 
-    with open("parsed_captions.txt", "r", encoding="utf-8") as file:
-        for line in file:
-            video_id, timestamp, caption_text = line.strip().split("\t")
-            cursor.execute("INSERT OR IGNORE INTO videos (video_id, url) VALUES (?, ?)", 
-                           (video_id, f"https://www.youtube.com/watch?v={video_id}"))
-            cursor.execute("INSERT INTO captions (video_id, timestamp, caption_text) VALUES (?, ?, ?)", 
-                           (video_id, timestamp, caption_text))
-    
-    conn.commit()
+    videos, captions = {}, []
+
+    def flush():
+        with conn:
+            cursor.executemany("INSERT OR IGNORE INTO videos (video_id, url) VALUES (?, ?)",
+                               videos.items())
+            cursor.executemany("INSERT INTO captions (video_id, timestamp, caption_text) VALUES (?, ?, ?)",
+                               captions)
+        videos.clear()
+        captions.clear()
+
+    for video_id, timestamp, caption_text in iter_parsed(parsed_file):
+        videos[video_id] = f"https://www.youtube.com/watch?v={video_id}"
+        captions.append((video_id, timestamp, caption_text))
+        if len(captions) >= BATCH:
+            flush()
+    flush()
+
     conn.close()
 
 def main():
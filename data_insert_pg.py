@@ -1,8 +1,15 @@
 # data_insert_pg.py
 import os
+import time
+import struct
+import sqlite3
+import argparse
 from dotenv import load_dotenv
 from psycopg_pool import ConnectionPool
 
+import caption_shards
+import data_insert
+
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
@@ -10,7 +17,34 @@ if not DATABASE_URL:
 
 pool = ConnectionPool(conninfo=DATABASE_URL, min_size=0, max_size=2, open=True)
 
+# "rows" (default): one captions row per caption, keyed by a BIGSERIAL id, with a
+# stored tsvector and trigram + tsvector GIN indexes.
+# "compact": caption_segments keyed by (integer video key, position in the
+# video), one expression GIN index and nothing stored twice; app.py reads it
+# through the caption_search view (set CAPTIONS_TABLE=caption_search there).
+STORAGE_LAYOUT = os.getenv("STORAGE_LAYOUT", "rows")
+if STORAGE_LAYOUT not in ("rows", "compact"):
+    raise SystemExit(f"STORAGE_LAYOUT must be 'rows' or 'compact', not {STORAGE_LAYOUT!r}")
+
 def ensure_schema():
+    with pool.connection() as conn, conn.cursor() as cur:
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_state (
+          id INTEGER PRIMARY KEY CHECK (id = 1),
+          generation BIGINT NOT NULL DEFAULT 0,
+          updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+        INSERT INTO ingest_state (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
+        CREATE TABLE IF NOT EXISTS suggest_terms (
+          term TEXT PRIMARY KEY,
+          freq BIGINT NOT NULL
+        );
+        """)
+    if STORAGE_LAYOUT == "compact":
+        ensure_compact_schema()
+        if CAPTION_JOINS:
+            ensure_caption_joins()
+        return
     with pool.connection() as conn, conn.cursor() as cur:
         cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
         cur.execute("""
@@ -18,32 +52,452 @@ def ensure_schema():
           video_id TEXT PRIMARY KEY,
           url TEXT NOT NULL
         );
-        CREATE TABLE IF NOT EXISTS captions (
-          id BIGSERIAL PRIMARY KEY,
-          video_id TEXT NOT NULL REFERENCES videos(video_id) ON DELETE CASCADE,
-          timestamp INTEGER NOT NULL,
-          caption_text TEXT NOT NULL
+        """)
+        create_captions_table(cur)
+    migrate_schema()
+    with pool.connection() as conn, conn.cursor() as cur:
+        create_captions_indexes(cur)
+    if CAPTION_JOINS:
+        ensure_caption_joins()
+
+def create_captions_table(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS captions (
+      id BIGSERIAL PRIMARY KEY,
+      video_id TEXT NOT NULL REFERENCES videos(video_id) ON DELETE CASCADE,
+      timestamp INTEGER NOT NULL,
+      caption_text TEXT NOT NULL,
+      caption_tsv tsvector GENERATED ALWAYS AS
+        (to_tsvector('english'::regconfig, caption_text)) STORED
+    )
+    """)
+
+def create_captions_indexes(cur):
+    """
+    The rows layout's secondary indexes. A full reload builds them once,
+    after loading, on the new table.
+    """
+    cur.execute("""
+    CREATE UNIQUE INDEX IF NOT EXISTS captions_uniq
+      ON captions (video_id, timestamp, caption_text);
+    CREATE INDEX IF NOT EXISTS captions_caption_text_trgm_idx
+      ON captions USING gin (caption_text gin_trgm_ops);
+    CREATE INDEX IF NOT EXISTS captions_video_time_idx
+      ON captions (video_id, timestamp);
+    CREATE INDEX IF NOT EXISTS captions_caption_tsv_idx
+      ON captions USING gin (caption_tsv);
+    """)
+
+def ensure_compact_schema():
+    """
+    Compact layout. Per caption this drops the 8-byte id and its index, the
+    unique index that repeated every caption's text, the stored tsvector and
+    the trigram index; the 11-character video id is stored once per video.
+    The view gives app.py the columns of the rows layout: caption_tsv is the
+    indexed expression (so @@ uses the GIN index) and id packs (vkey, seq)
+    into one bigint for keyset cursors.
+    """
+    with pool.connection() as conn, conn.cursor() as cur:
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS video_keys (
+          vkey INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+          video_id TEXT NOT NULL UNIQUE
+        )
+        """)
+        create_compact_tables(cur)
+        ensure_compact_index(cur)
+
+def create_compact_tables(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS caption_segments (
+      vkey INTEGER NOT NULL REFERENCES video_keys(vkey) ON DELETE CASCADE,
+      seq INTEGER NOT NULL,
+      timestamp INTEGER NOT NULL,
+      caption_text TEXT NOT NULL,
+      PRIMARY KEY (vkey, seq)
+    );
+    CREATE OR REPLACE VIEW caption_search AS
+    SELECT (s.vkey::bigint << 32) | s.seq AS id,
+           v.video_id,
+           s."timestamp",
+           s.caption_text,
+           to_tsvector('english'::regconfig, s.caption_text) AS caption_tsv
+    FROM caption_segments s
+    JOIN video_keys v ON v.vkey = s.vkey;
+    """)
+
+def ensure_compact_index(cur):
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS caption_segments_tsv_idx
+      ON caption_segments USING gin (to_tsvector('english'::regconfig, caption_text))
+    """)
+
+def migrate_schema():
+    """
+    Brings a database created before the stored tsvector column up to date.
+    Adding a STORED generated column rewrites the table once; after that every
+    caption is tokenized at insert time instead of on every /search.
+    ensure_schema then creates its GIN index.
+    """
+    with pool.connection() as conn, conn.cursor() as cur:
+        cur.execute("""
+        ALTER TABLE captions ADD COLUMN IF NOT EXISTS caption_tsv tsvector
+          GENERATED ALWAYS AS (to_tsvector('english'::regconfig, caption_text)) STORED
+        """)
+
+def bump_generation(cur):
+    """
+    Marks that the captions changed. app.py compares this number to the one its
+    query cache was filled under and drops stale entries.
+    """
+    cur.execute("""
+    UPDATE ingest_state SET generation = generation + 1, updated_at = now()
+    WHERE id = 1
+    """)
+
+# --- Suggest dictionary (app.py /suggest) ---
+# suggest_terms counts every word and two-word phrase in the captions,
+# lower-cased and split the way inverted_index.tokenize splits. Loads keep it
+# exact: each video a load touches is counted out before its rows change and
+# counted back in afterwards, in the same transaction. Terms whose count
+# drops to 0 are only removed by --rebuild-suggest.
+#
+# The counts go to a per-transaction temp table first, and reach suggest_terms
+# in one upsert, in term order, right before the load commits
+# (apply_suggest_counts). Concurrent loaders (pipeline.py --load-workers)
+# update overlapping hot terms ("the", "of the"); taking those row locks in one
+# statement and one order means they wait for each other instead of
+# deadlocking, and only for the end of each other's transaction.
+SUGGEST_TERMS = os.getenv("SUGGEST_TERMS", "1") != "0"
+WORD_PATTERN = r"\w+(?:'\w+)*"
+
+def suggest_delta(cur):
+    cur.execute("""
+    CREATE TEMP TABLE IF NOT EXISTS suggest_delta (
+      term TEXT NOT NULL,
+      freq BIGINT NOT NULL
+    ) ON COMMIT DROP
+    """)
+
+def count_suggest_terms(cur, sign, video_ids=None):
+    """
+    Adds (sign=1) or subtracts (sign=-1) the word and bigram counts of the
+    given videos' captions to the pending counts; video_ids=None counts every
+    caption. apply_suggest_counts writes them to suggest_terms.
+    """
+    if not SUGGEST_TERMS or (video_ids is not None and not video_ids):
+        return
+    suggest_delta(cur)
+    relation = "caption_search" if STORAGE_LAYOUT == "compact" else "captions"
+    where = "" if video_ids is None else "WHERE c.video_id = ANY(%(videos)s)"
+    cur.execute(f"""
+    WITH words AS (
+      SELECT c.id, w.ord, w.word[1] AS word
+      FROM {relation} c,
+           regexp_matches(lower(c.caption_text), %(pattern)s, 'g') WITH ORDINALITY AS w(word, ord)
+      {where}
+    ), terms AS (
+      SELECT word AS term FROM words
+      UNION ALL
+      SELECT term FROM (
+        SELECT word || ' ' || lead(word) OVER (PARTITION BY id ORDER BY ord) AS term FROM words
+      ) bigrams
+      WHERE term IS NOT NULL
+    )
+    INSERT INTO suggest_delta (term, freq)
+    SELECT term, %(sign)s * count(*) FROM terms GROUP BY term
+    """, {"pattern": WORD_PATTERN, "sign": sign, "videos": list(video_ids or ())})
+
+def apply_suggest_counts(cur):
+    """
+    Adds the pending counts to suggest_terms in one upsert, locking rows in
+    term order; terms whose net change is 0 (a re-parsed video with the same
+    words) aren't touched at all.
+    """
+    if not SUGGEST_TERMS:
+        return
+    suggest_delta(cur)
+    cur.execute("""
+    INSERT INTO suggest_terms AS s (term, freq)
+    SELECT term, sum(freq) FROM suggest_delta
+    GROUP BY term
+    HAVING sum(freq) <> 0
+    ORDER BY term
+    ON CONFLICT (term) DO UPDATE SET freq = s.freq + EXCLUDED.freq
+    """)
+    cur.execute("TRUNCATE suggest_delta")
+
+def uncount_staged_videos(cur, staging, full_reload, extra=()):
+    """
+    Bulk-load half of the suggest bookkeeping: takes the counts of every
+    video in the staging table, and of the extra video ids, out (a full
+    reload takes out every count).
+    Returns:
+        list | None: Video ids to count back in (and rebuild caption joins
+            for) after the merge; None = all.
+    """
+    if full_reload:
+        if SUGGEST_TERMS:
+            # not TRUNCATE: its lock would stall concurrent loaders and
+            # app.py's dictionary reload for the whole load
+            suggest_delta(cur)
+            cur.execute("INSERT INTO suggest_delta SELECT term, -freq FROM suggest_terms WHERE freq <> 0")
+        return None
+    if not SUGGEST_TERMS and not CAPTION_JOINS:
+        return []
+    cur.execute(f"SELECT DISTINCT video_id FROM {staging}")
+    videos = sorted({row[0] for row in cur.fetchall()} | set(extra))
+    count_suggest_terms(cur, -1, videos)
+    return videos
+
+def rebuild_suggest_terms():
+    """
+    Recounts suggest_terms from scratch (dropping zero counts).
+    Returns:
+        int: Distinct terms.
+    """
+    with pool.connection() as conn, conn.cursor() as cur:
+        cur.execute("TRUNCATE suggest_terms")
+        count_suggest_terms(cur, 1)
+        apply_suggest_counts(cur)
+        bump_generation(cur)
+        cur.execute("SELECT count(*) FROM suggest_terms")
+        return cur.fetchone()[0]
+
+# --- Caption boundary joins (app.py CAPTION_JOINS=1) ---
+# Captions are cut at arbitrary points, so a phrase can start in one row and
+# end in the next. For each pair of consecutive captions in a video, a join row
+# holds the last CAPTION_JOIN_WORDS words of the first and the first
+# CAPTION_JOIN_WORDS of the second, with its own GIN index; any phrase of up to
+# CAPTION_JOIN_WORDS + 1 words that straddles the cut is inside it. A join hit
+# resolves to the first caption, where the phrase starts. Joins are rebuilt per
+# video after every load that touches it, in the same transaction.
+CAPTION_JOINS = os.getenv("CAPTION_JOINS", "0") == "1"
+CAPTION_JOIN_WORDS = int(os.getenv("CAPTION_JOIN_WORDS", 8))
+
+def ensure_caption_joins():
+    """
+    Creates the join table for the current layout, its GIN index and the view
+    app.py searches: caption_boundaries (rows) or caption_search_boundaries
+    (compact). The view exposes the first caption's id, video_id and
+    timestamp, both captions' text, boundary_tsv (the join row) and the two
+    captions' own tsvectors, which app.py uses to skip joins whose hit a
+    row-level match already reports.
+    """
+    with pool.connection() as conn, conn.cursor() as cur:
+        create_caption_joins(cur)
+        ensure_caption_joins_index(cur)
+
+def create_caption_joins(cur):
+    if STORAGE_LAYOUT == "compact":
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS caption_segment_joins (
+          vkey INTEGER NOT NULL,
+          seq INTEGER NOT NULL,
+          join_text TEXT NOT NULL,
+          PRIMARY KEY (vkey, seq),
+          FOREIGN KEY (vkey, seq) REFERENCES caption_segments (vkey, seq) ON DELETE CASCADE
+        );
+        CREATE OR REPLACE VIEW caption_search_boundaries AS
+        SELECT (s.vkey::bigint << 32) | s.seq AS id,
+               v.video_id,
+               s."timestamp",
+               s.caption_text || ' ' || n.caption_text AS caption_text,
+               to_tsvector('english'::regconfig, j.join_text) AS boundary_tsv,
+               to_tsvector('english'::regconfig, s.caption_text) AS caption_tsv,
+               to_tsvector('english'::regconfig, n.caption_text) AS next_tsv
+        FROM caption_segment_joins j
+        JOIN caption_segments s ON s.vkey = j.vkey AND s.seq = j.seq
+        JOIN caption_segments n ON n.vkey = j.vkey AND n.seq = j.seq + 1
+        JOIN video_keys v ON v.vkey = j.vkey;
+        """)
+    else:
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS caption_joins (
+          caption_id BIGINT PRIMARY KEY REFERENCES captions(id) ON DELETE CASCADE,
+          next_id BIGINT NOT NULL REFERENCES captions(id) ON DELETE CASCADE,
+          join_text TEXT NOT NULL,
+          join_tsv tsvector GENERATED ALWAYS AS
+            (to_tsvector('english'::regconfig, join_text)) STORED
         );
-        CREATE UNIQUE INDEX IF NOT EXISTS captions_uniq
-          ON captions (video_id, timestamp, caption_text);
-        CREATE INDEX IF NOT EXISTS captions_caption_text_trgm_idx
-          ON captions USING gin (caption_text gin_trgm_ops);
-        CREATE INDEX IF NOT EXISTS captions_video_time_idx
-          ON captions (video_id, timestamp);
+        CREATE INDEX IF NOT EXISTS caption_joins_next_idx ON caption_joins (next_id);
+        CREATE OR REPLACE VIEW caption_boundaries AS
+        SELECT c.id,
+               c.video_id,
+               c."timestamp",
+               c.caption_text || ' ' || n.caption_text AS caption_text,
+               j.join_tsv AS boundary_tsv,
+               c.caption_tsv,
+               n.caption_tsv AS next_tsv
+        FROM caption_joins j
+        JOIN captions c ON c.id = j.caption_id
+        JOIN captions n ON n.id = j.next_id;
+        """)
+
+def ensure_caption_joins_index(cur):
+    if STORAGE_LAYOUT == "compact":
+        cur.execute("""
+        CREATE INDEX IF NOT EXISTS caption_segment_joins_tsv_idx
+          ON caption_segment_joins USING gin (to_tsvector('english'::regconfig, join_text))
         """)
+    else:
+        cur.execute("CREATE INDEX IF NOT EXISTS caption_joins_tsv_idx ON caption_joins USING gin (join_tsv)")
+
+def rebuild_caption_joins(cur, video_ids=None):
+    """
+    Replaces the join rows of the given videos (video_ids=None: all videos)
+    from their current captions.
+    Returns:
+        int: Join rows written.
+    """
+    if not CAPTION_JOINS or (video_ids is not None and not video_ids):
+        return 0
+    params = {"words": CAPTION_JOIN_WORDS, "space": r"\s+", "videos": list(video_ids or ())}
+    # last N words of the first caption + first N words of the next one
+    join_text = """
+      array_to_string(words[greatest(cardinality(words) - %(words)s::int + 1, 1):], ' ')
+      || ' ' || array_to_string(next_words[1:%(words)s::int], ' ')"""
+    if STORAGE_LAYOUT == "compact":
+        if video_ids is None:
+            cur.execute("TRUNCATE caption_segment_joins")
+            where = ""
+        else:
+            cur.execute("""
+            DELETE FROM caption_segment_joins j USING video_keys v
+            WHERE j.vkey = v.vkey AND v.video_id = ANY(%(videos)s)
+            """, params)
+            where = "WHERE s.vkey IN (SELECT vkey FROM video_keys WHERE video_id = ANY(%(videos)s))"
+        cur.execute(f"""
+        INSERT INTO caption_segment_joins (vkey, seq, join_text)
+        SELECT vkey, seq, {join_text}
+        FROM (
+          SELECT s.vkey, s.seq, regexp_split_to_array(btrim(s.caption_text), %(space)s) AS words,
+                 regexp_split_to_array(btrim(n.caption_text), %(space)s) AS next_words
+          FROM caption_segments s
+          JOIN caption_segments n ON n.vkey = s.vkey AND n.seq = s.seq + 1
+          {where}
+        ) pairs
+        """, params)
+    else:
+        if video_ids is None:
+            cur.execute("TRUNCATE caption_joins")
+            where = ""
+        else:
+            cur.execute("""
+            DELETE FROM caption_joins j USING captions c
+            WHERE j.caption_id = c.id AND c.video_id = ANY(%(videos)s)
+            """, params)
+            where = "WHERE c.video_id = ANY(%(videos)s)"
+        cur.execute(f"""
+        INSERT INTO caption_joins (caption_id, next_id, join_text)
+        SELECT id, next_id, {join_text}
+        FROM (
+          SELECT c.id, regexp_split_to_array(btrim(c.caption_text), %(space)s) AS words,
+                 lead(c.id) OVER w AS next_id,
+                 lead(regexp_split_to_array(btrim(c.caption_text), %(space)s)) OVER w AS next_words
+          FROM captions c
+          {where}
+          WINDOW w AS (PARTITION BY c.video_id ORDER BY c."timestamp", c.id)
+        ) pairs
+        WHERE next_id IS NOT NULL
+        """, params)
+    return cur.rowcount
+
+def rebuild_all_caption_joins():
+    """
+    Rebuilds every join row, e.g. after turning CAPTION_JOINS on for a
+    database that was loaded without it.
+    Returns:
+        int: Join rows written.
+    """
+    ensure_caption_joins()
+    with pool.connection() as conn, conn.cursor() as cur:
+        count = rebuild_caption_joins(cur)
+        bump_generation(cur)
+    return count
 
 def insert_data(parsed_file="parsed_captions.txt"):
     if not os.path.exists(parsed_file):
         raise SystemExit(f"{parsed_file} not found. Run file_parser.py first.")
 
-    batch_vid, batch_cap = [], []
+    if caption_shards.is_shards(parsed_file):
+        insert_rows(caption_shards.iter_rows(parsed_file))
+        return
+    with open(parsed_file, "r", encoding="utf-8") as f:
+        rows = (line.rstrip("\n").split("\t", 2) for line in f)
+        insert_rows((video_id, int(ts_str), text) for video_id, ts_str, text in rows)
+
+# COPY ... (FORMAT BINARY) framing: signature, flags, header extension length;
+# the trailer is a field count of -1.
+COPY_BINARY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+COPY_BINARY_TRAILER = struct.pack(">h", -1)
+_ROW_TAIL = struct.Struct(">iii")        # int4 size, timestamp, text size
+_SEQ_ROW_TAIL = struct.Struct(">iiiii")  # int4 size, seq, int4 size, timestamp, text size
+
+def copy_shards(copy, path, seqs=None):
+    """
+    Streams a caption shard directory into a binary COPY of (video_id,
+    timestamp, caption_text), or (video_id, seq, timestamp, caption_text)
+    when seqs (video_id -> next seq) is given. Caption text goes from the
+    mmap into the COPY buffer as raw UTF-8; nothing is split, decoded or
+    escaped in Python. One write per video.
+    Returns:
+        int: Rows copied.
+    """
+    copy.write(COPY_BINARY_HEADER)
+    copied = 0
+    for shard_path in caption_shards.shard_paths(path):
+        with caption_shards.CaptionShard(shard_path) as shard:
+            ts = shard.timestamps
+            for video_id, start, end in shard.videos():
+                vid = video_id.encode("utf-8")
+                buf = bytearray()
+                if seqs is None:
+                    head = struct.pack(">hi", 3, len(vid)) + vid
+                    for row in range(start, end):
+                        text = shard.text(row)
+                        buf += head
+                        buf += _ROW_TAIL.pack(4, ts[row], len(text))
+                        buf += text
+                else:
+                    head = struct.pack(">hi", 4, len(vid)) + vid
+                    seq = seqs.get(video_id, 0)
+                    for row in range(start, end):
+                        text = shard.text(row)
+                        buf += head
+                        buf += _SEQ_ROW_TAIL.pack(4, seq, 4, ts[row], len(text))
+                        buf += text
+                        seq += 1
+                    seqs[video_id] = seq
+                text = None
+                copy.write(buf)
+                copied += end - start
+    copy.write(COPY_BINARY_TRAILER)
+    return copied
+
+def insert_rows(rows, replace_videos=()):
+    """
+    Inserts (video_id, timestamp, caption_text) rows in batches of 2000 and
+    bumps the ingest generation, all in one transaction.
+    Args:
+        rows (iterable): Caption rows.
+        replace_videos (iterable): Video ids whose existing captions are deleted
+            first, so re-parsed videos replace their old rows.
+    """
+    if STORAGE_LAYOUT == "compact":
+        return insert_rows_compact(rows, replace_videos)
+    batch_vid, batch_cap = {}, []
+    counted = set()  # videos whose old suggest counts were already taken out
     BATCH = 2000
 
     def flush(cur):
+        new_videos = batch_vid.keys() - counted
+        count_suggest_terms(cur, -1, new_videos)
+        counted.update(new_videos)
         if batch_vid:
             cur.executemany(
                 "INSERT INTO videos (video_id, url) VALUES (%s, %s) ON CONFLICT (video_id) DO NOTHING",
-                batch_vid
+                batch_vid.items()
             ); batch_vid.clear()
         if batch_cap:
             cur.executemany(
@@ -51,18 +505,513 @@ def insert_data(parsed_file="parsed_captions.txt"):
                 batch_cap
             ); batch_cap.clear()
 
-    with pool.connection() as conn, conn.cursor() as cur, open(parsed_file, "r", encoding="utf-8") as f:
-        for line in f:
-            video_id, ts_str, text = line.rstrip("\n").split("\t", 2)
-            batch_vid.append((video_id, f"https://www.youtube.com/watch?v={video_id}"))
-            batch_cap.append((video_id, int(ts_str), text))
+    with pool.connection() as conn, conn.cursor() as cur:
+        replace_videos = list(replace_videos)
+        if replace_videos:
+            count_suggest_terms(cur, -1, replace_videos)
+            counted.update(replace_videos)
+            cur.execute("DELETE FROM captions WHERE video_id = ANY(%s)", (replace_videos,))
+        for video_id, ts, text in rows:
+            batch_vid[video_id] = f"https://www.youtube.com/watch?v={video_id}"
+            batch_cap.append((video_id, ts, text))
             if len(batch_cap) >= BATCH:
                 flush(cur)
         flush(cur)
+        count_suggest_terms(cur, 1, counted)
+        rebuild_caption_joins(cur, counted)
+        apply_suggest_counts(cur)
+        bump_generation(cur)
+
+def video_keys_for(cur, video_ids):
+    """
+    Returns {video_id: vkey}, creating keys for new videos.
+    """
+    video_ids = sorted(set(video_ids))
+    cur.execute("""
+    INSERT INTO video_keys (video_id) SELECT unnest(%s::text[])
+    ON CONFLICT (video_id) DO NOTHING
+    """, (video_ids,))
+    cur.execute("SELECT video_id, vkey FROM video_keys WHERE video_id = ANY(%s)", (video_ids,))
+    return dict(cur.fetchall())
+
+def delete_segments(cur, video_ids):
+    cur.execute("""
+    DELETE FROM caption_segments s USING video_keys v
+    WHERE s.vkey = v.vkey AND v.video_id = ANY(%s)
+    """, (list(video_ids),))
+    return cur.rowcount
+
+def insert_rows_compact(rows, replace_videos=()):
+    """
+    insert_rows for the compact layout. seq is the row's position within its
+    video in the input, so the input must hold each video's complete captions:
+    unlike the rows layout, which merges new (video_id, timestamp,
+    caption_text) rows into the old ones, every video in the input replaces
+    its stored captions, whether or not it is in replace_videos. Re-loading
+    the same parsed output therefore leaves the same rows.
+    """
+    with pool.connection() as conn, conn.cursor() as cur:
+        replace_videos = list(replace_videos)
+        if replace_videos:
+            count_suggest_terms(cur, -1, replace_videos)
+            delete_segments(cur, replace_videos)
+        keys, seqs, batch = {}, {}, []
+        BATCH = 2000
+
+        def flush():
+            missing = {vid for vid, _, _ in batch if vid not in keys}
+            if missing:
+                # first rows of these videos: drop what an earlier load stored
+                old = missing - set(replace_videos)
+                count_suggest_terms(cur, -1, old)
+                if old:
+                    delete_segments(cur, old)
+                keys.update(video_keys_for(cur, missing))
+            rows_ = []
+            for vid, ts, text in batch:
+                seq = seqs.get(vid, 0)
+                seqs[vid] = seq + 1
+                rows_.append((keys[vid], seq, ts, text))
+            cur.executemany(
+                "INSERT INTO caption_segments (vkey, seq, timestamp, caption_text) "
+                "VALUES (%s, %s, %s, %s)", rows_)
+            batch.clear()
+
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= BATCH:
+                flush()
+        if batch:
+            flush()
+        touched = set(keys) | set(replace_videos)
+        count_suggest_terms(cur, 1, touched)
+        rebuild_caption_joins(cur, touched)
+        apply_suggest_counts(cur)
+        bump_generation(cur)
+
+# --- Full reload ---
+# A full reload loads into new, index-free caption tables (with their joins
+# and views) in a shadow schema, <schema>_reload, while /search keeps reading
+# the old ones; the indexes are built once on the loaded tables and the new
+# relations are moved over the old ones just before commit. So the ACCESS
+# EXCLUSIVE locks that block readers are held for a few catalog updates, not
+# for the whole load. Anything else built on the old tables (a user view, a
+# foreign key) is dropped with them.
+def begin_full_reload(cur):
+    """
+    Creates the shadow schema and empty caption relations in it, and puts it
+    first on the search_path, so the rest of the load (inserts, suggest
+    counts, joins) writes the new tables through the usual unqualified names.
+    Returns:
+        tuple: (schema, shadow schema, original search_path, tables, views).
+    """
+    cur.execute("SELECT current_schema(), current_setting('search_path')")
+    schema, search_path = cur.fetchone()
+    shadow = f"{schema}_reload"
+    if STORAGE_LAYOUT == "compact":
+        tables, views = ["caption_segments"], ["caption_search"]
+        joins_table, joins_view = "caption_segment_joins", "caption_search_boundaries"
+    else:
+        tables, views = ["captions"], []
+        joins_table, joins_view = "caption_joins", "caption_boundaries"
+    # joins left over from an earlier CAPTION_JOINS=1 are replaced (empty) too
+    cur.execute("SELECT to_regclass(%s)", (f"{schema}.{joins_table}",))
+    joins = CAPTION_JOINS or cur.fetchone()[0] is not None
+    if joins:
+        tables.append(joins_table)
+        views.append(joins_view)
+
+    cur.execute(f"DROP SCHEMA IF EXISTS {shadow} CASCADE")
+    cur.execute(f"CREATE SCHEMA {shadow}")
+    cur.execute(f"SET LOCAL search_path = {shadow}, {search_path}")
+    if STORAGE_LAYOUT == "compact":
+        create_compact_tables(cur)
+    else:
+        create_captions_table(cur)
+        # keep ids growing across reloads, as they did with TRUNCATE
+        cur.execute(f"""
+        SELECT setval(pg_get_serial_sequence('{shadow}.captions', 'id'),
+                      (SELECT coalesce(max(id), 0) + 1 FROM {schema}.captions), false)
+        """)
+    if joins:
+        create_caption_joins(cur)
+    return schema, shadow, search_path, tables, views
+
+def finish_full_reload(cur, reload):
+    """
+    Builds the indexes of the loaded shadow relations, then replaces the
+    live ones with them. Only the final swap blocks readers.
+    """
+    schema, shadow, search_path, tables, views = reload
+    if STORAGE_LAYOUT == "compact":
+        ensure_compact_index(cur)
+    else:
+        create_captions_indexes(cur)
+    if len(tables) > 1:
+        ensure_caption_joins_index(cur)
+    cur.execute(f"SET LOCAL search_path = {search_path}")
+    for view in views:
+        cur.execute(f"DROP VIEW IF EXISTS {schema}.{view}")
+    for table in reversed(tables):
+        cur.execute(f"DROP TABLE IF EXISTS {schema}.{table} CASCADE")
+    for table in tables:  # indexes and owned sequences move with them
+        cur.execute(f"ALTER TABLE {shadow}.{table} SET SCHEMA {schema}")
+    for view in views:
+        cur.execute(f"ALTER VIEW {shadow}.{view} SET SCHEMA {schema}")
+    cur.execute(f"DROP SCHEMA {shadow}")
+
+def list_replaced(replace_videos):
+    """
+    The explicit video ids in a bulk load's replace_videos (True/False name none).
+    """
+    return [] if isinstance(replace_videos, bool) else list(replace_videos)
+
+def bulk_insert_data(parsed_file="parsed_captions.txt", full_reload=False, replace_videos=False):
+    """
+    Bulk loader: streams parsed_file through COPY into the unlogged
+    captions_staging table, then merges it with set-based SQL and drops it. A caption
+    shard directory is sent as binary COPY straight from the mmap. Each video is
+    inserted once, and captions are merged in a single INSERT ... SELECT.
+
+    With replace_videos, every video present in the file first loses its
+    existing captions, so a re-downloaded (changed) VTT replaces the old rows.
+    replace_videos may also be a list of video ids, which lose theirs too
+    even if the file has no rows for them (a new VTT that parsed to nothing).
+    With full_reload the captions table is replaced by the file's contents:
+    the file is loaded into a new table whose indexes are built once
+    afterwards, which is far cheaper than maintaining them row by row, and
+    which is swapped in at the end (see begin_full_reload); /search keeps
+    answering from the old table meanwhile. Everything runs in one
+    transaction, so a failed load leaves the old data in place.
+    Returns:
+        dict: rows copied/inserted and timings.
+    """
+    if not os.path.exists(parsed_file):
+        raise SystemExit(f"{parsed_file} not found. Run file_parser.py first.")
+    if STORAGE_LAYOUT == "compact":
+        return bulk_insert_compact(parsed_file, full_reload, replace_videos)
+
+    stats = {"copied": 0}
+    start = time.perf_counter()
+    with pool.connection() as conn, conn.cursor() as cur:
+        cur.execute("""
+        CREATE UNLOGGED TABLE IF NOT EXISTS captions_staging (
+          video_id TEXT NOT NULL,
+          timestamp INTEGER NOT NULL,
+          caption_text TEXT NOT NULL
+        )
+        """)
+        cur.execute("TRUNCATE captions_staging")
+        if caption_shards.is_shards(parsed_file):
+            with cur.copy("COPY captions_staging (video_id, timestamp, caption_text) "
+                          "FROM STDIN (FORMAT BINARY)") as copy:
+                stats["copied"] = copy_shards(copy, parsed_file)
+        else:
+            with cur.copy("COPY captions_staging (video_id, timestamp, caption_text) FROM STDIN") as copy, \
+                    open(parsed_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    video_id, ts_str, text = line.rstrip("\n").split("\t", 2)
+                    copy.write_row((video_id, int(ts_str), text))
+                    stats["copied"] += 1
+        stats["copy_seconds"] = round(time.perf_counter() - start, 2)
+
+        cur.execute("""
+        INSERT INTO videos (video_id, url)
+        SELECT DISTINCT s.video_id, 'https://www.youtube.com/watch?v=' || s.video_id
+        FROM captions_staging s
+        ON CONFLICT (video_id) DO NOTHING
+        """)
+        stats["videos_inserted"] = cur.rowcount
+
+        merge_start = time.perf_counter()
+        extra = list_replaced(replace_videos)
+        touched = uncount_staged_videos(cur, "captions_staging", full_reload, extra)
+        if full_reload:
+            cur.execute("SET LOCAL maintenance_work_mem = '256MB'")
+            reload = begin_full_reload(cur)
+            cur.execute("""
+            INSERT INTO captions (video_id, timestamp, caption_text)
+            SELECT DISTINCT s.video_id, s.timestamp, s.caption_text
+            FROM captions_staging s
+            """)
+        else:
+            if replace_videos:
+                cur.execute("""
+                DELETE FROM captions c
+                USING (SELECT DISTINCT video_id FROM captions_staging) s
+                WHERE c.video_id = s.video_id
+                """)
+                stats["captions_deleted"] = cur.rowcount
+                if extra:
+                    cur.execute("DELETE FROM captions WHERE video_id = ANY(%s)", (extra,))
+                    stats["captions_deleted"] += cur.rowcount
+            cur.execute("""
+            INSERT INTO captions (video_id, timestamp, caption_text)
+            SELECT DISTINCT s.video_id, s.timestamp, s.caption_text
+            FROM captions_staging s
+            ON CONFLICT DO NOTHING
+            """)
+        stats["captions_inserted"] = cur.rowcount
+        stats["merge_seconds"] = round(time.perf_counter() - merge_start, 2)
+
+        suggest_start = time.perf_counter()
+        count_suggest_terms(cur, 1, touched)
+        stats["suggest_seconds"] = round(time.perf_counter() - suggest_start, 2)
+
+        joins_start = time.perf_counter()
+        stats["joins_inserted"] = rebuild_caption_joins(cur, touched)
+        stats["joins_seconds"] = round(time.perf_counter() - joins_start, 2)
+
+        # late, so the suggest_terms row locks are held briefly (a full reload's
+        # swap still has to come after it)
+        apply_start = time.perf_counter()
+        apply_suggest_counts(cur)
+        stats["suggest_seconds"] = round(stats["suggest_seconds"] + time.perf_counter() - apply_start, 2)
+
+        if full_reload:
+            index_start = time.perf_counter()
+            finish_full_reload(cur, reload)
+            stats["index_seconds"] = round(time.perf_counter() - index_start, 2)
+
+        cur.execute("DROP TABLE captions_staging")
+        bump_generation(cur)
+
+    stats["seconds"] = round(time.perf_counter() - start, 2)
+    stats["rows_per_sec"] = round(stats["copied"] / stats["seconds"]) if stats["seconds"] else 0
+    return stats
+
+def bulk_insert_compact(parsed_file, full_reload=False, replace_videos=False):
+    """
+    bulk_insert_data for the compact layout: same staging/merge flow, with
+    seq numbered per video while copying. As in insert_rows_compact, every
+    video in the file replaces its stored captions (replace_videos is
+    implied), since positions from two different parses can't be merged.
+    A list of video ids in replace_videos is deleted as well.
+    """
+    stats = {"copied": 0}
+    start = time.perf_counter()
+    with pool.connection() as conn, conn.cursor() as cur:
+        cur.execute("""
+        CREATE UNLOGGED TABLE IF NOT EXISTS caption_segments_staging (
+          video_id TEXT NOT NULL,
+          seq INTEGER NOT NULL,
+          timestamp INTEGER NOT NULL,
+          caption_text TEXT NOT NULL
+        )
+        """)
+        cur.execute("TRUNCATE caption_segments_staging")
+        seqs = {}
+        if caption_shards.is_shards(parsed_file):
+            with cur.copy("COPY caption_segments_staging (video_id, seq, timestamp, caption_text) "
+                          "FROM STDIN (FORMAT BINARY)") as copy:
+                stats["copied"] = copy_shards(copy, parsed_file, seqs)
+        else:
+            with cur.copy("COPY caption_segments_staging (video_id, seq, timestamp, caption_text) "
+                          "FROM STDIN") as copy, \
+                    open(parsed_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    video_id, ts_str, text = line.rstrip("\n").split("\t", 2)
+                    seq = seqs.get(video_id, 0)
+                    seqs[video_id] = seq + 1
+                    copy.write_row((video_id, seq, int(ts_str), text))
+                    stats["copied"] += 1
+        stats["copy_seconds"] = round(time.perf_counter() - start, 2)
+
+        cur.execute("""
+        INSERT INTO video_keys (video_id)
+        SELECT DISTINCT video_id FROM caption_segments_staging
+        ON CONFLICT (video_id) DO NOTHING
+        """)
+        stats["videos_inserted"] = cur.rowcount
+
+        merge_start = time.perf_counter()
+        extra = list_replaced(replace_videos)
+        touched = uncount_staged_videos(cur, "caption_segments_staging", full_reload, extra)
+        if full_reload:
+            cur.execute("SET LOCAL maintenance_work_mem = '256MB'")
+            reload = begin_full_reload(cur)
+        else:
+            cur.execute("""
+            DELETE FROM caption_segments s
+            USING video_keys v, (SELECT DISTINCT video_id FROM caption_segments_staging) st
+            WHERE s.vkey = v.vkey AND v.video_id = st.video_id
+            """)
+            stats["captions_deleted"] = cur.rowcount
+            if extra:
+                stats["captions_deleted"] += delete_segments(cur, extra)
+        cur.execute("""
+        INSERT INTO caption_segments (vkey, seq, timestamp, caption_text)
+        SELECT v.vkey, st.seq, st.timestamp, st.caption_text
+        FROM caption_segments_staging st
+        JOIN video_keys v ON v.video_id = st.video_id
+        ORDER BY v.vkey, st.seq
+        """)
+        stats["captions_inserted"] = cur.rowcount
+        stats["merge_seconds"] = round(time.perf_counter() - merge_start, 2)
+
+        suggest_start = time.perf_counter()
+        count_suggest_terms(cur, 1, touched)
+        stats["suggest_seconds"] = round(time.perf_counter() - suggest_start, 2)
+
+        joins_start = time.perf_counter()
+        stats["joins_inserted"] = rebuild_caption_joins(cur, touched)
+        stats["joins_seconds"] = round(time.perf_counter() - joins_start, 2)
+
+        # late, so the suggest_terms row locks are held briefly (a full reload's
+        # swap still has to come after it)
+        apply_start = time.perf_counter()
+        apply_suggest_counts(cur)
+        stats["suggest_seconds"] = round(stats["suggest_seconds"] + time.perf_counter() - apply_start, 2)
+
+        if full_reload:
+            index_start = time.perf_counter()
+            finish_full_reload(cur, reload)
+            stats["index_seconds"] = round(time.perf_counter() - index_start, 2)
+
+        cur.execute("DROP TABLE caption_segments_staging")
+        bump_generation(cur)
+
+    stats["seconds"] = round(time.perf_counter() - start, 2)
+    stats["rows_per_sec"] = round(stats["copied"] / stats["seconds"]) if stats["seconds"] else 0
+    return stats
+
+def migrate_to_compact():
+    """
+    Copies the rows-layout captions table into the compact tables (seq follows
+    timestamp order within each video). The old tables are left in place; drop
+    them once the app runs with CAPTIONS_TABLE=caption_search.
+    Returns:
+        int: Captions copied.
+    """
+    ensure_compact_schema()
+    with pool.connection() as conn, conn.cursor() as cur:
+        cur.execute("SET LOCAL maintenance_work_mem = '256MB'")
+        cur.execute("DROP INDEX IF EXISTS caption_segments_tsv_idx")
+        cur.execute("TRUNCATE caption_segments CASCADE")  # joins: rerun with --rebuild-joins
+        cur.execute("""
+        INSERT INTO video_keys (video_id)
+        SELECT DISTINCT video_id FROM captions ORDER BY video_id
+        ON CONFLICT (video_id) DO NOTHING
+        """)
+        cur.execute("""
+        INSERT INTO caption_segments (vkey, seq, timestamp, caption_text)
+        SELECT v.vkey,
+               (row_number() OVER (PARTITION BY c.video_id ORDER BY c.timestamp, c.id) - 1)::int,
+               c.timestamp, c.caption_text
+        FROM captions c
+        JOIN video_keys v ON v.video_id = c.video_id
+        """)
+        copied = cur.rowcount
+        ensure_compact_index(cur)
+        bump_generation(cur)
+    return copied
+
+# --- Local search snapshot (app.py SEARCH_SNAPSHOT_PATH, see snapshot.py) ---
+SNAPSHOT_BATCH = 5000
+
+def export_snapshot(path="captions_snapshot.db"):
+    """
+    Writes every caption to a read-only SQLite FTS5 snapshot in the
+    data_insert.py schema, read through a server-side cursor in one
+    REPEATABLE READ transaction, so the rows match the generation recorded
+    with them. The full-text index is built once at the end, and the file
+    is renamed into place only when complete.
+    Returns:
+        dict: rows, generation, bytes and seconds.
+    """
+    start = time.perf_counter()
+    tmp = path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    data_insert.create_tables(tmp)
+    out = sqlite3.connect(tmp)
+    out.execute("PRAGMA journal_mode = OFF")
+    out.execute("PRAGMA synchronous = OFF")
+    out.execute("DROP TRIGGER captions_fts_ai")  # indexed in one pass below
+    if STORAGE_LAYOUT == "compact":
+        relation, order = "caption_search", "id"  # id packs (video key, position)
+    else:
+        relation, order = "captions", "video_id, timestamp, id"
+
+    rows = 0
+    with pool.connection() as conn:
+        conn.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        generation = conn.execute("SELECT generation FROM ingest_state WHERE id = 1").fetchone()[0]
+        with conn.cursor(name="snapshot") as cur:
+            cur.itersize = SNAPSHOT_BATCH
+            cur.execute(f'SELECT video_id, "timestamp", caption_text FROM {relation} ORDER BY {order}')
+            while True:
+                batch = cur.fetchmany(SNAPSHOT_BATCH)
+                if not batch:
+                    break
+                with out:
+                    out.executemany("INSERT OR IGNORE INTO videos (video_id, url) VALUES (?, ?)",
+                                    {(vid, f"https://www.youtube.com/watch?v={vid}") for vid, _, _ in batch})
+                    out.executemany("INSERT INTO captions (video_id, timestamp, caption_text) "
+                                    "VALUES (?, ?, ?)", batch)
+                rows += len(batch)
+
+    with out:
+        out.execute("INSERT INTO captions_fts(captions_fts) VALUES ('rebuild')")
+        out.execute("INSERT INTO captions_fts(captions_fts) VALUES ('optimize')")
+        out.execute("""
+            CREATE TRIGGER captions_fts_ai AFTER INSERT ON captions BEGIN
+                INSERT INTO captions_fts(rowid, caption_text) VALUES (new.id, new.caption_text);
+            END
+        """)
+        out.execute("CREATE TABLE snapshot_meta (generation INTEGER, created_at TEXT, rows INTEGER)")
+        out.execute("INSERT INTO snapshot_meta VALUES (?, datetime('now'), ?)", (generation, rows))
+    out.execute("VACUUM")
+    out.close()
+    os.replace(tmp, path)
+    return {"rows": rows, "generation": generation, "bytes": os.path.getsize(path),
+            "seconds": round(time.perf_counter() - start, 2)}
 
 def main():
+    parser = argparse.ArgumentParser(description="Load parsed_captions.txt into Postgres.")
+    parser.add_argument("--parsed-file", default="parsed_captions.txt",
+                        help="parsed_captions.txt or a caption shard directory")
+    parser.add_argument("--migrate-only", action="store_true", help="only create/upgrade the schema")
+    parser.add_argument("--bulk", action="store_true", help="COPY through a staging table")
+    parser.add_argument("--full-reload", action="store_true",
+                        help="replace all captions (implies --bulk): loads a new table, builds its "
+                             "indexes once and swaps it in, so /search keeps serving the old data")
+    parser.add_argument("--rebuild-suggest", action="store_true",
+                        help="recount the /suggest dictionary (suggest_terms) from all captions")
+    parser.add_argument("--rebuild-joins", action="store_true",
+                        help="rebuild the caption boundary joins (CAPTION_JOINS=1) from all captions")
+    parser.add_argument("--export-snapshot", metavar="PATH",
+                        help="write all captions to a SQLite FTS5 snapshot for app.py's fallback")
+    parser.add_argument("--migrate-to-compact", action="store_true",
+                        help="copy the captions table into the compact layout (caption_segments)")
+    args = parser.parse_args()
+
+    if args.migrate_to_compact:
+        copied = migrate_to_compact()
+        print(f"Copied {copied} captions into caption_segments. "
+              "Set STORAGE_LAYOUT=compact for loads and CAPTIONS_TABLE=caption_search for app.py.")
+        return
+    if args.export_snapshot:
+        stats = export_snapshot(args.export_snapshot)
+        print(f"Snapshot {args.export_snapshot}: {stats['rows']} captions at generation "
+              f"{stats['generation']}, {stats['bytes'] / 1e6:.1f} MB in {stats['seconds']}s.")
+        return
     ensure_schema()
-    insert_data()
+    if args.rebuild_suggest:
+        print(f"suggest_terms rebuilt: {rebuild_suggest_terms()} terms.")
+        return
+    if args.rebuild_joins:
+        print(f"Caption joins rebuilt: {rebuild_all_caption_joins()} rows.")
+        return
+    if args.migrate_only:
+        print("Schema migration completed.")
+        return
+    if args.bulk or args.full_reload:
+        stats = bulk_insert_data(args.parsed_file, full_reload=args.full_reload)
+        print(f"Loaded {stats['copied']} rows ({stats['captions_inserted']} new) "
+              f"in {stats['seconds']}s, {stats['rows_per_sec']} rows/s: {stats}")
+    else:
+        insert_data(args.parsed_file)
     print("Data insertion to Neon Postgres completed.")
 
 if __name__ == "__main__":
@@ -2,9 +2,22 @@ import os
 import subprocess
 import time
 import re
+import shlex
+import random
+import argparse
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urlparse, parse_qs
 from glob import glob
 
+# Override to point at a different binary, e.g. a stub in tests:
+#   YTDLP_BIN="python benchmarks/stub_yt_dlp.py"
+YTDLP_BIN = os.getenv("YTDLP_BIN", "yt-dlp")
+
+# Player clients tried in order; the concurrent downloader reorders them by success.
+CLIENTS = ["android", "ios", "tv_embedded"]
+
 def video_id_from_url(url: str) -> str | None:
     # Works for watch?v=, youtu.be/, shorts/
     u = urlparse(url)
@@ -22,9 +35,23 @@ def video_id_from_url(url: str) -> str | None:
 def vtt_exists(output_folder, vid):
     return bool(glob(os.path.join(output_folder, f"{vid}*.vtt")))
 
+def vtt_files(output_folder, vid=None):
+    """
+    Maps each video id to its canonical VTT in output_folder: the first by
+    name when yt-dlp left several (e.g. <id>.en.vtt and <id>.en-US.vtt), so
+    every caller hashes and parses the same file.
+    Args:
+        vid (str): Only look at this video's files.
+    Returns:
+        dict: {video_id: path}
+    """
+    paths = {}
+    for path in sorted(glob(os.path.join(output_folder, f"{vid}.*vtt" if vid else "*.vtt"))):
+        paths.setdefault(os.path.basename(path).split(".")[0], path)
+    return paths
+
 def try_one(url, output_folder, client=None, cookies_browser=None, sleep_after=0.2, impersonate=True):
-    args = [
-        "yt-dlp",
+    args = shlex.split(YTDLP_BIN) + [
         "--write-subs",
         "--write-auto-subs",
         "--sub-langs", "en.*,en",
@@ -47,21 +74,27 @@ def try_one(url, output_folder, client=None, cookies_browser=None, sleep_after=0
 
     args += ["-o", f"{output_folder}/%(id)s.%(ext)s", url]
 
+    ok = True
     try:
         subprocess.run(args, check=True)
     except subprocess.CalledProcessError as e:
         print(f"yt-dlp failed for client={client} cookies={cookies_browser}: {e}")
+        ok = False
 
     time.sleep(sleep_after)
+    return ok
 
 
 
 def download_vtt_files(url_file, output_folder, delay=0.2, cookies_browser=None):
-    os.makedirs(output_folder, exist_ok=True)
-
     with open(url_file, 'r', encoding='utf-8') as f:
         urls = [u.strip() for u in f if u.strip()]
 
+    download_urls(urls, output_folder, delay, cookies_browser=cookies_browser)
+
+def download_urls(urls, output_folder, delay=0.2, cookies_browser=None):
+    os.makedirs(output_folder, exist_ok=True)
+
     for i, url in enumerate(urls, 1):
         print(f"[{i}/{len(urls)}] Downloading captions for: {url}")
         vid = video_id_from_url(url)
@@ -92,16 +125,156 @@ def download_vtt_files(url_file, output_folder, delay=0.2, cookies_browser=None)
 
         time.sleep(delay)
 
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by all download workers: at most `rate`
+    yt-dlp launches per second on average, with bursts of up to `burst`.
+    rate <= 0 means no limit.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class ClientStats:
+    """
+    Counts which player client produced subtitles, so the one that works most
+    often for this channel is tried first.
+    """
+
+    def __init__(self, clients=CLIENTS):
+        self.clients = list(clients)
+        self.successes = Counter()
+        self.lock = threading.Lock()
+
+    def order(self):
+        with self.lock:
+            # stable sort keeps the default order between equally good clients
+            return sorted(self.clients, key=lambda c: -self.successes[c])
+
+    def record(self, client):
+        with self.lock:
+            self.successes[client] += 1
+
+def download_one(url, vid, output_folder, limiter, stats, cookies_browser=None,
+                 retries=2, backoff=2.0):
+    """
+    Tries each player client (best first) until a VTT for `vid` appears.
+    yt-dlp errors (throttling, network) are retried with exponential backoff and
+    jitter. If any client ran cleanly yet produced no subtitles, the video has
+    none and is not retried, even when other clients errored.
+    Returns:
+        tuple: (status, client, attempts) where status is "ok", "no_subs" or "failed".
+    """
+    for attempt in range(1, retries + 2):
+        clean_miss = False
+        for client in stats.order():
+            limiter.acquire()
+            ok = try_one(url, output_folder, client=client, cookies_browser=cookies_browser,
+                         sleep_after=0)
+            if vtt_exists(output_folder, vid):
+                stats.record(client)
+                return "ok", client, attempt
+            clean_miss = clean_miss or ok
+        if clean_miss:
+            return "no_subs", None, attempt
+        if attempt <= retries:
+            time.sleep(backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+    return "failed", None, retries + 1
+
+def download_concurrent(urls, output_folder, workers=4, rate=1.0, burst=2,
+                        cookies_browser=None, retries=2, backoff=2.0):
+    """
+    Downloads captions for many videos at once with a bounded worker pool and a
+    global rate limit. Videos whose VTT already exists are skipped up front.
+    Returns:
+        dict: counts per status, elapsed seconds, client success counts and
+            no_subs_urls (videos that have no English subtitles).
+    """
+    os.makedirs(output_folder, exist_ok=True)
+
+    jobs, summary, no_subs = [], Counter(), []
+    for url in urls:
+        vid = video_id_from_url(url)
+        if not vid:
+            print(f"  ! Could not parse video ID; skipping: {url}")
+            summary["bad_url"] += 1
+        elif vtt_exists(output_folder, vid):
+            summary["skipped"] += 1
+        else:
+            jobs.append((url, vid))
+    print(f"{len(jobs)} to download, {summary['skipped']} already have captions.")
+
+    limiter = TokenBucket(rate, burst)
+    stats = ClientStats()
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(download_one, url, vid, output_folder, limiter, stats,
+                            cookies_browser, retries, backoff): url
+            for url, vid in jobs
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            url = futures[future]
+            try:
+                status, client, attempts = future.result()
+            except Exception as e:
+                status, client, attempts = "failed", None, 0
+                print(f"  ! {url}: {e}")
+            summary[status] += 1
+            if status == "no_subs":
+                no_subs.append(url)
+            elapsed = time.monotonic() - start
+            print(f"[{done}/{len(jobs)}] {status:<7} {url} "
+                  f"(client={client}, attempts={attempts}) "
+                  f"{done / elapsed * 60:.1f} videos/min")
+
+    elapsed = time.monotonic() - start
+    result = dict(summary, elapsed_seconds=round(elapsed, 1),
+                  clients=dict(stats.successes))
+    print(f"Done in {elapsed:.1f}s: {result}")
+    result["no_subs_urls"] = no_subs
+    return result
+
 def main():
-    url_file = "video_urls.txt"
-    output_folder = "vtt_files"
+    parser = argparse.ArgumentParser(description="Download English captions as .vtt files.")
+    parser.add_argument("--url-file", default="video_urls.txt")
+    parser.add_argument("--output-folder", default="vtt_files")
+    parser.add_argument("--workers", type=int, default=1, help="parallel downloads; 1 = original serial loop")
+    parser.add_argument("--rate", type=float, default=1.0, help="max yt-dlp launches per second (all workers); 0 = no limit")
+    parser.add_argument("--burst", type=int, default=2)
+    parser.add_argument("--retries", type=int, default=2)
+    args = parser.parse_args()
     delay = 0.1
 
     # If you’re logged into YouTube in a browser, you can pass its cookies to improve subtitle access:
     # cookies_browser = "chrome"  # or "firefox", "chromium"
     cookies_browser = None
 
-    download_vtt_files(url_file, output_folder, delay, cookies_browser=cookies_browser)
+    if args.workers > 1:
+        with open(args.url_file, 'r', encoding='utf-8') as f:
+            urls = [u.strip() for u in f if u.strip()]
+        download_concurrent(urls, args.output_folder, workers=args.workers, rate=args.rate,
+                            burst=args.burst, cookies_browser=cookies_browser, retries=args.retries)
+    else:
+        download_vtt_files(args.url_file, args.output_folder, delay, cookies_browser=cookies_browser)
     print("Caption downloads completed!")
 
 if __name__ == "__main__":
@@ -1,7 +1,21 @@
 import os
 import re
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from datetime import timedelta
 
+from caption_shards import ShardWriter
+
+# Compiled once; clean_caption_text runs for every cue.
+TAG_RE = re.compile(r'<.*?>')
+PLACEHOLDER_RE = re.compile(r'\[\s*(&nbsp;)*__(&nbsp;)*\s*\]')
+# Greedy match up to the LAST sentence end in the window (one right-to-left pass).
+SENTENCE_END_RE = re.compile(r'.*[.!?]', re.DOTALL)
+NON_SPEECH_TAGS = ('[Music]', '[Applause]', '[Laughter]', '[Sound]', '[Noise]')  # Add other tags if needed
+
 def clean_caption_text(text):
     """
     Cleans unwanted metadata and formatting from caption text.
@@ -11,10 +25,13 @@ def clean_caption_text(text):
         str: Cleaned caption text.
     """
     # Remove tags like '<00:00:00.539><c>' and other unwanted metadata
-    text = re.sub(r'<.*?>', '', text).strip()
+    if '<' in text:
+        text = TAG_RE.sub('', text)
+    text = text.strip()
 
     # Remove placeholders like '[&nbsp;__&nbsp;]'
-    text = re.sub(r'\[\s*(&nbsp;)*__(&nbsp;)*\s*\]', '', text)
+    if '__' in text:
+        text = PLACEHOLDER_RE.sub('', text)
 
     # Remove extra spaces
     return text.strip()
@@ -159,81 +176,254 @@ def merge_captions(captions, time_threshold=5):
     merged.append((current_timestamp, current_text))
     return merged
 
-def parse_vtt_file(file_path):
+# --- Streaming pipeline ---
+# parse_vtt_file chains these generators so each cue flows through every stage
+# in one pass, without building an intermediate list per stage. They produce
+# exactly what the list-based helpers above produce for the same input; the
+# merge and redundancy stages rely on iter_cues yielding non-empty, stripped text.
+
+def is_speech(text):
     """
-    Parses a .vtt file to extract captions and timestamps, filtering out non-speech elements.
-    Args:
-        file_path (str): Path to the .vtt file.
-    Returns:
-        list: A list of tuples (timestamp in seconds, cleaned caption text).
+    True unless the text contains a non-speech tag. Every tag starts with '[',
+    so most cues skip the tag scan entirely.
     """
-    captions = []
-    non_speech_tags = ['[Music]', '[Applause]', '[Laughter]', '[Sound]', '[Noise]']  # Add other tags if needed
+    return '[' not in text or not any(tag in text for tag in NON_SPEECH_TAGS)
 
-    with open(file_path, 'r', encoding='utf-8') as file:
-        # Skip the first three lines
-        lines = file.readlines()[3:]
+def iter_cues(lines):
+    """
+    Yields (timestamp in seconds, cleaned caption text) for each speech cue.
+    Args:
+        lines (iterable): VTT lines after the three header lines.
+    """
+    timestamp = None
+    text = []
+
+    for line in lines:
+        line = line.strip()
+
+        # Match timestamp lines
+        if "-->" in line:
+            if timestamp and text:
+                cleaned_text = clean_caption_text(' '.join(text))
+                if cleaned_text and is_speech(cleaned_text):
+                    yield timestamp, cleaned_text
+                text = []
+            # Extract the start time in seconds
+            timestamp = parse_start_time(line)
+
+        elif line:  # Non-empty lines are caption text
+            text.append(line)
+
+    # Handle the last caption
+    if timestamp and text:
+        cleaned_text = clean_caption_text(' '.join(text))
+        if cleaned_text and is_speech(cleaned_text):
+            yield timestamp, cleaned_text
+
+def iter_unique(captions):
+    """
+    Streaming remove_duplicates: drops captions whose text was already seen.
+    """
+    seen_texts = set()
+    for timestamp, text in captions:
+        if text not in seen_texts:
+            seen_texts.add(text)
+            yield timestamp, text
 
-        timestamp = None
-        text = []
+def iter_non_redundant(captions):
+    """
+    Streaming remove_redundant_captions. The previous caption's first four
+    words are kept instead of re-splitting its text on every step.
+    """
+    prev_words = None
+    for timestamp, text in captions:
+        current_words = " ".join(text.split(None, 4)[:4])
+        if current_words != prev_words:
+            prev_words = current_words
+            yield timestamp, text
 
-        for line in lines:
-            line = line.strip()
+def iter_merged(captions, time_threshold=5):
+    """
+    Streaming merge_captions: joins captions within time_threshold seconds of
+    the first caption of their group.
+    """
+    current_timestamp = None
+    parts = []
+    for timestamp, text in captions:
+        if parts and timestamp - current_timestamp <= time_threshold:
+            parts.append(text)
+        else:
+            if parts:
+                yield current_timestamp, " ".join(parts)
+            current_timestamp, parts = timestamp, [text]
+    if parts:
+        yield current_timestamp, " ".join(parts)
 
-            # Match timestamp lines
-            if "-->" in line:
-                if timestamp and text:
-                    # Store the previous caption
-                    cleaned_text = clean_caption_text(' '.join(text))
-                    if cleaned_text and not any(tag in cleaned_text for tag in non_speech_tags):
-                        captions.append((timestamp, cleaned_text))
-                    text = []
-                # Extract the start time in seconds
-                timestamp = parse_start_time(line)
+def iter_split(captions, max_length=150, interval=1.0):
+    """
+    Streaming split_long_captions: cuts captions longer than max_length at the
+    last sentence end, else the last space, else max_length.
+    """
+    for timestamp, text in captions:
+        i = 0
+        while len(text) > max_length:
+            match = SENTENCE_END_RE.match(text, 0, max_length)
+            if match:
+                split_point = match.end() - 1
+            else:
+                split_point = text.rfind(' ', 0, max_length)
+                if split_point == -1:
+                    split_point = max_length
+            yield timestamp + (i * interval), text[:split_point + 1].strip()
+            text = text[split_point + 1:].strip()
+            i += 1
+        yield timestamp + (i * interval), text
 
-            elif line:  # Non-empty lines are caption text
-                text.append(line)
+def iter_vtt_file(file_path):
+    """
+    Yields (timestamp in seconds, caption text) rows for a .vtt file, streaming
+    the file through dedupe -> redundancy filter -> merge -> split.
+    """
+    with open(file_path, 'r', encoding='utf-8') as file:
+        # Skip the first three lines
+        captions = iter_cues(islice(file, 3, None))
+        # Steps 1-4: remove duplicates, remove redundant, merge within 5s, split long
+        captions = iter_unique(captions)
+        captions = iter_non_redundant(captions)
+        captions = iter_merged(captions, time_threshold=5)
+        yield from iter_split(captions, max_length=150, interval=1.0)
 
-        # Handle the last caption
-        if timestamp and text:
-            cleaned_text = clean_caption_text(' '.join(text))
-            if cleaned_text and not any(tag in cleaned_text for tag in non_speech_tags):
-                captions.append((timestamp, cleaned_text))
+def parse_vtt_file(file_path):
+    """
+    Parses a .vtt file to extract captions and timestamps, filtering out non-speech elements.
+    Args:
+        file_path (str): Path to the .vtt file.
+    Returns:
+        list: A list of tuples (timestamp in seconds, cleaned caption text).
+    """
+    return list(iter_vtt_file(file_path))
 
-    # Step 1: Remove duplicates
-    unique_captions = remove_duplicates(captions)
+def parse_video_file(file_path):
+    """
+    Worker entry point: parses one .vtt file.
+    Returns:
+        tuple: (video_id, list of (timestamp, caption_text)).
+    """
+    video_id = os.path.basename(file_path).split(".")[0]  # Extract video ID from file name
+    return video_id, parse_vtt_file(file_path)
 
-    # Step 2: Remove redundant captions
-    filtered_captions = remove_redundant_captions(unique_captions)
+def write_captions(output_file, video_id, captions):
+    """
+    Writes one video's captions (a list or a row iterator) as parsed_captions.txt rows.
+    Returns:
+        int: Number of rows written.
+    """
+    rows = 0
+    for timestamp, text in captions:
+        output_file.write(f"{video_id}\t{int(timestamp)}\t{text}\n")
+        rows += 1
+    return rows
 
-    # Step 3: Merge captions within 5-second periods
-    merged_captions = merge_captions(filtered_captions, time_threshold=5)
+def parse_folder(input_folder="vtt_files", output_path="parsed_captions.txt", workers=1,
+                 output_format="tsv", shard_mb=64):
+    """
+    Parses every .vtt file in input_folder (sorted by name) into output_path.
+    Returns:
+        dict: See parse_files.
+    """
+    file_paths = [os.path.join(input_folder, name)
+                  for name in sorted(os.listdir(input_folder)) if name.endswith(".vtt")]
+    return parse_files(file_paths, output_path, workers=workers,
+                       output_format=output_format, shard_mb=shard_mb)
 
-    # Step 4: Split long captions
-    return split_long_captions(merged_captions, max_length=150, interval=1.0)
+def parse_files(file_paths, output_path="parsed_captions.txt", workers=1,
+                output_format="tsv", shard_mb=64):
+    """
+    Parses the given .vtt files and streams rows to output_path: a
+    parsed_captions.txt file, or with output_format="shards" a directory of
+    binary caption shards (see caption_shards.py) holding shard_mb of text each.
+
+    Each video is written as soon as it (and everything before it) is parsed,
+    in the order given, so output is deterministic. With workers > 1 files are
+    parsed in a process pool; at most 2 * workers files are in flight, which
+    bounds memory by worker count instead of corpus size.
+    Returns:
+        dict: files, rows, seconds, files_per_sec, rows_per_sec and
+            rows_per_video ({video_id: rows written}).
+    """
+    files = rows = 0
+    rows_per_video = {}
+    start = time.perf_counter()
+
+    if output_format == "shards":
+        output_file = ShardWriter(output_path, shard_mb)
+        write = output_file.write_video
+    else:
+        output_file = open(output_path, "w", encoding="utf-8")
+
+        def write(video_id, captions):
+            return write_captions(output_file, video_id, captions)
+
+    with output_file:
+        if workers <= 1:
+            for file_path in file_paths:
+                video_id = os.path.basename(file_path).split(".")[0]
+                written = write(video_id, iter_vtt_file(file_path))
+                rows_per_video[video_id] = written
+                rows += written
+                files += 1
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                remaining = iter(file_paths)
+                pending = deque(executor.submit(parse_video_file, path)
+                                for path in islice(remaining, 2 * workers))
+                while pending:
+                    video_id, captions = pending.popleft().result()
+                    written = write(video_id, captions)
+                    rows_per_video[video_id] = written
+                    rows += written
+                    files += 1
+                    next_path = next(remaining, None)
+                    if next_path is not None:
+                        pending.append(executor.submit(parse_video_file, next_path))
+
+    elapsed = time.perf_counter() - start
+    return {
+        "files": files,
+        "rows": rows,
+        "seconds": round(elapsed, 2),
+        "files_per_sec": round(files / elapsed, 1) if elapsed else 0.0,
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed else 0.0,
+        "rows_per_video": rows_per_video,
+    }
 
 def main():
-    input_folder = "vtt_files"
-    output_data = []
+    parser = argparse.ArgumentParser(description="Parse .vtt caption files into parsed_captions.txt.")
+    parser.add_argument("--input-folder", default="vtt_files")
+    parser.add_argument("--output", default=None,
+                        help="default: parsed_captions.txt, or parsed_captions.shards with --format shards")
+    parser.add_argument("--format", choices=("tsv", "shards"), default="tsv",
+                        help="tab-separated text, or a directory of binary shards (caption_shards.py)")
+    parser.add_argument("--shard-mb", type=float, default=64,
+                        help="caption text per shard; 0 = one shard per video")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="parser processes; 0 = one per CPU")
+    args = parser.parse_args()
+    input_folder = args.input_folder
+    output = args.output or ("parsed_captions.shards" if args.format == "shards"
+                             else "parsed_captions.txt")
 
     if not os.path.exists(input_folder):
         print(f"Folder {input_folder} does not exist.")
         return
 
-    for file_name in os.listdir(input_folder):
-        if file_name.endswith(".vtt"):
-            file_path = os.path.join(input_folder, file_name)
-            video_id = file_name.split(".")[0]  # Extract video ID from file name
-            captions = parse_vtt_file(file_path)
-            output_data.append((video_id, captions))
-
-    # Save data for insertion
-    with open("parsed_captions.txt", "w", encoding="utf-8") as output_file:
-        for video_id, captions in output_data:
-            for timestamp, text in captions:
-                output_file.write(f"{video_id}\t{int(timestamp)}\t{text}\n")
+    workers = args.workers or os.cpu_count() or 1
+    stats = parse_folder(input_folder, output, workers=workers,
+                         output_format=args.format, shard_mb=args.shard_mb)
 
-    print("Parsing completed. Data saved to parsed_captions.txt.")
+    print(f"Parsed {stats['files']} files, {stats['rows']} rows in {stats['seconds']}s "
+          f"({stats['files_per_sec']} files/s, {stats['rows_per_sec']} rows/s).")
+    print(f"Parsing completed. Data saved to {output}.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,75 @@
+# http_cache.py
+"""
+HTTP-level caching and compression helpers for app.py.
+
+Search responses get weak ETags built from the request and the data
+generation, so a repeat query is answered with 304 before any database work.
+Responses are gzip-compressed (brotli too, when the optional `brotli`
+package is installed) in an after_request hook. Static files are read and
+compressed once at startup and then served from memory.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+
+try:
+    import brotli  # optional: pip install brotli
+except ImportError:
+    brotli = None
+
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+def make_etag(*parts):
+    """
+    Returns:
+        str: A short stable hash of parts (their repr), for use as an ETag.
+    """
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:20]
+
+def choose_encoding(request, available=ENCODINGS):
+    """
+    Picks the encoding from `available` the client prefers (its q-values;
+    ties go to the order of `available`), or None for identity.
+    """
+    return request.accept_encodings.best_match(available)
+
+def compress(data, encoding, level=6):
+    if encoding == "br":
+        return brotli.compress(data, quality=min(level, 11))
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+class StaticAsset:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            raw = f.read()
+        self.mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.etag = make_etag(raw)
+        self.bodies = {None: raw}
+        if self.mimetype.startswith("text/") or self.mimetype in ("application/javascript",
+                                                                   "application/json",
+                                                                   "image/svg+xml"):
+            # best ratio: this runs once per worker, not per request
+            for encoding in ENCODINGS:
+                body = compress(raw, encoding, 11 if encoding == "br" else 9)
+                if len(body) < len(raw):
+                    self.bodies[encoding] = body
+
+class StaticAssets:
+    """
+    Every file under `folder`, read and precompressed when constructed.
+    """
+
+    def __init__(self, folder):
+        self.assets = {}
+        for root, _, files in os.walk(folder):
+            for name in files:
+                path = os.path.join(root, name)
+                self.assets[os.path.relpath(path, folder).replace(os.sep, "/")] = StaticAsset(path)
+
+    def get(self, name):
+        return self.assets.get(name)
+
+    def stats(self):
+        return {name: {encoding or "identity": len(body) for encoding, body in asset.bodies.items()}
+                for name, asset in self.assets.items()}
@@ -0,0 +1,276 @@
+# inverted_index.py
+"""
+Embedded positional inverted index over parsed_captions.txt.
+
+Build once, then answer exact phrase queries straight from a memory-mapped
+file: opening an index reads a fixed-size header and nothing else, and lookups
+touch only the postings of the query's terms.
+
+File layout (native little-endian, every section 8-byte aligned):
+
+    header    magic, version, n_docs, n_terms, section offsets
+    doc_off   u64[n_docs + 1]   -> records in doc_blob
+    doc_blob  per doc: u32 timestamp, u8 len(video_id), video_id, caption_text
+    term_off  u64[n_terms + 1]  -> sorted UTF-8 terms in term_blob
+    term_blob
+    post_off  u64[n_terms]      -> postings in post_blob
+    df        u32[n_terms]      documents containing each term
+    post_blob per term: u32 docs[df], u32 pos_off[df + 1], u16 positions[...]
+
+Usage:
+    python inverted_index.py build [parsed_captions.txt] [captions.idx]
+    python inverted_index.py search "phrase" [captions.idx]
+"""
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+MAGIC = b"PSIX"
+VERSION = 1
+HEADER = struct.Struct("<4sHHQQ7Q")  # magic, version, reserved, n_docs, n_terms, 7 offsets
+MAX_POSITION = 0xFFFF
+
+_TOKEN_RE = re.compile(r"\w+(?:'\w+)*")
+
+def tokenize(text):
+    """
+    Lower-cased word tokens; used identically at build and query time so that
+    phrase positions line up.
+    """
+    return _TOKEN_RE.findall(text.lower())
+
+def _align(f, n=8):
+    pad = -f.tell() % n
+    if pad:
+        f.write(b"\0" * pad)
+
+def build_index(parsed_file="parsed_captions.txt", index_file="captions.idx"):
+    """
+    Builds an index file from tab-separated (video_id, timestamp, caption_text)
+    rows. Doc ids follow file order. Writes to a temp file and renames it into
+    place, so readers never see a half-written index.
+    Returns:
+        tuple: (number of docs, number of distinct terms).
+    """
+    if sys.byteorder != "little":
+        raise RuntimeError("inverted_index files are little-endian only")
+
+    postings = {}  # term -> (docs array('I'), pos_off array('I'), positions array('H'))
+    doc_off = array("Q", [0])
+    tmp_file = index_file + ".tmp"
+
+    with open(parsed_file, "r", encoding="utf-8") as src, open(tmp_file, "wb") as out:
+        out.write(b"\0" * HEADER.size)
+        _align(out)
+
+        # Docs are streamed to a side buffer first; their offsets table must precede them.
+        doc_blob = bytearray()
+        n_docs = 0
+        for line in src:
+            video_id, ts_str, text = line.rstrip("\n").split("\t", 2)
+            vid = video_id.encode("utf-8")
+            doc_blob += struct.pack("<IB", int(ts_str), len(vid)) + vid + text.encode("utf-8")
+            doc_off.append(len(doc_blob))
+
+            by_term = {}
+            for pos, token in enumerate(tokenize(text)):
+                if pos > MAX_POSITION:
+                    break
+                by_term.setdefault(token, []).append(pos)
+            for token, positions in by_term.items():
+                entry = postings.get(token)
+                if entry is None:
+                    entry = postings[token] = (array("I"), array("I", [0]), array("H"))
+                docs, pos_off, pos_arr = entry
+                docs.append(n_docs)
+                pos_arr.extend(positions)
+                pos_off.append(len(pos_arr))
+            n_docs += 1
+
+        doc_off_at = out.tell()
+        out.write(doc_off.tobytes())
+        doc_blob_at = out.tell()
+        out.write(doc_blob)
+        del doc_blob
+        _align(out)
+
+        terms = sorted(postings, key=lambda t: t.encode("utf-8"))
+        term_off = array("Q", [0])
+        term_blob = bytearray()
+        for term in terms:
+            term_blob += term.encode("utf-8")
+            term_off.append(len(term_blob))
+        term_off_at = out.tell()
+        out.write(term_off.tobytes())
+        term_blob_at = out.tell()
+        out.write(term_blob)
+        _align(out)
+
+        post_blob = bytearray()
+        post_off = array("Q")
+        df = array("I")
+        for term in terms:
+            docs, pos_off, pos_arr = postings.pop(term)
+            post_off.append(len(post_blob))
+            df.append(len(docs))
+            post_blob += docs.tobytes() + pos_off.tobytes() + pos_arr.tobytes()
+            post_blob += b"\0" * (-len(post_blob) % 8)
+        post_off_at = out.tell()
+        out.write(post_off.tobytes())
+        df_at = out.tell()
+        out.write(df.tobytes())
+        _align(out)
+        post_blob_at = out.tell()
+        out.write(post_blob)
+
+        out.seek(0)
+        out.write(HEADER.pack(MAGIC, VERSION, 0, n_docs, len(terms),
+                              doc_off_at, doc_blob_at, term_off_at, term_blob_at,
+                              post_off_at, df_at, post_blob_at))
+
+    os.replace(tmp_file, index_file)
+    return n_docs, len(terms)
+
+class PhraseIndex:
+    """
+    Read-only, memory-mapped view of an index built by build_index().
+    Safe to share between threads; nothing is decoded until a query needs it.
+    """
+
+    def __init__(self, index_file="captions.idx"):
+        self.path = index_file
+        with open(index_file, "rb") as f:
+            # the mapped file's identity: a rebuild renamed over the path later
+            # doesn't change what this instance serves
+            st = os.fstat(f.fileno())
+            self.mtime_ns, self.size = st.st_mtime_ns, st.st_size
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mm)
+        (magic, version, _, self.n_docs, self.n_terms,
+         doc_off_at, self._doc_blob_at, term_off_at, self._term_blob_at,
+         post_off_at, df_at, self._post_blob_at) = HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{index_file} is not a phrase index (v{VERSION})")
+        self._buf = buf
+        self._doc_off = buf[doc_off_at:doc_off_at + 8 * (self.n_docs + 1)].cast("Q")
+        self._term_off = buf[term_off_at:term_off_at + 8 * (self.n_terms + 1)].cast("Q")
+        self._post_off = buf[post_off_at:post_off_at + 8 * self.n_terms].cast("Q")
+        self._df = buf[df_at:df_at + 4 * self.n_terms].cast("I")
+
+    def close(self):
+        for view in (self._doc_off, self._term_off, self._post_off, self._df, self._buf):
+            view.release()
+        self._mm.close()
+
+    def _term_id(self, term):
+        key = term.encode("utf-8")
+        lo, hi = 0, self.n_terms
+        base = self._term_blob_at
+        while lo < hi:
+            mid = (lo + hi) // 2
+            cand = self._buf[base + self._term_off[mid]:base + self._term_off[mid + 1]]
+            if cand == key:
+                return mid
+            if cand.tobytes() < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def terms(self):
+        """
+        Yields (term, number of docs containing it) in term order.
+        """
+        base = self._term_blob_at
+        for term_id in range(self.n_terms):
+            term = self._buf[base + self._term_off[term_id]:base + self._term_off[term_id + 1]]
+            yield str(term, "utf-8"), self._df[term_id]
+
+    def _postings(self, term_id):
+        """
+        Returns (docs, pos_off, positions) as zero-copy typed views.
+        """
+        df = self._df[term_id]
+        at = self._post_blob_at + self._post_off[term_id]
+        docs = self._buf[at:at + 4 * df].cast("I")
+        at += 4 * df
+        pos_off = self._buf[at:at + 4 * (df + 1)].cast("I")
+        at += 4 * (df + 1)
+        positions = self._buf[at:at + 2 * pos_off[df]].cast("H")
+        return docs, pos_off, positions
+
+    def doc(self, doc_id):
+        """
+        Returns {video_id, timestamp, caption_text} for a doc id.
+        """
+        start = self._doc_blob_at + self._doc_off[doc_id]
+        end = self._doc_blob_at + self._doc_off[doc_id + 1]
+        ts, vid_len = struct.unpack_from("<IB", self._buf, start)
+        start += 5
+        video_id = str(self._buf[start:start + vid_len], "utf-8")
+        text = str(self._buf[start + vid_len:end], "utf-8")
+        return {"video_id": video_id, "timestamp": ts, "caption_text": text}
+
+    def search(self, phrase, limit=20, after_doc=-1):
+        """
+        Finds docs containing the phrase's tokens at consecutive positions.
+        Args:
+            phrase (str): Query text; tokenized like the corpus.
+            limit (int): Max results.
+            after_doc (int): Only return docs with a larger id (keyset paging).
+        Returns:
+            list: (doc_id, result dict) tuples in doc-id order.
+        """
+        tokens = tokenize(phrase)
+        if not tokens:
+            return []
+        lists = []
+        for offset, token in enumerate(tokens):
+            term_id = self._term_id(token)
+            if term_id is None:
+                return []
+            lists.append((self._df[term_id], offset, self._postings(term_id)))
+        lists.sort(key=lambda item: item[0])  # drive from the rarest term
+
+        _, lead_offset, (lead_docs, lead_pos_off, lead_pos) = lists[0]
+        rest = lists[1:]
+        hits = []
+        for i in range(bisect_right(lead_docs, after_doc), len(lead_docs)):
+            doc_id = lead_docs[i]
+            # phrase start positions implied by the lead term
+            starts = {p - lead_offset for p in lead_pos[lead_pos_off[i]:lead_pos_off[i + 1]]}
+            for _, offset, (docs, pos_off, positions) in rest:
+                j = bisect_left(docs, doc_id)
+                if j == len(docs) or docs[j] != doc_id:
+                    starts = None
+                    break
+                starts &= {p - offset for p in positions[pos_off[j]:pos_off[j + 1]]}
+                if not starts:
+                    break
+            if starts:
+                hits.append((doc_id, self.doc(doc_id)))
+                if len(hits) >= limit:
+                    break
+        return hits
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("build", "search"):
+        print(__doc__.strip().split("Usage:")[1])
+        return
+    if sys.argv[1] == "build":
+        parsed_file = sys.argv[2] if len(sys.argv) > 2 else "parsed_captions.txt"
+        index_file = sys.argv[3] if len(sys.argv) > 3 else "captions.idx"
+        n_docs, n_terms = build_index(parsed_file, index_file)
+        print(f"Indexed {n_docs} captions, {n_terms} terms -> {index_file} "
+              f"({os.path.getsize(index_file) / 1e6:.1f} MB)")
+    else:
+        index = PhraseIndex(sys.argv[3] if len(sys.argv) > 3 else "captions.idx")
+        for _, hit in index.search(sys.argv[2], limit=50):
+            print(f"{hit['video_id']}\t{hit['timestamp']}\t{hit['caption_text']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# manifest.py
+"""
+Persistent per-video ingest state, so run.py only works on what changed.
+
+Each video moves through: discovered (url known) -> downloaded (VTT on disk,
+content hash recorded) -> parsed -> loaded (rows in Postgres for that hash).
+A video needs (re)loading whenever its current VTT hash differs from the hash
+that was last loaded, which also makes every stage safe to resume after a crash.
+"""
+import datetime
+import hashlib
+import os
+import sqlite3
+
+from download_captions import video_id_from_url, vtt_files
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def now():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+
+class Manifest:
+    def __init__(self, path="ingest_manifest.db"):
+        # may be shared by pipeline.py's stage threads; callers serialize access
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS videos (
+                video_id TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                discovered_at TEXT NOT NULL,
+                vtt_path TEXT,
+                vtt_size INTEGER,
+                vtt_mtime REAL,
+                vtt_hash TEXT,
+                downloaded_at TEXT,
+                no_subs_at TEXT,
+                parsed_hash TEXT,
+                parsed_rows INTEGER,
+                parsed_at TEXT,
+                loaded_hash TEXT,
+                loaded_at TEXT
+            )
+        """)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def add_urls(self, urls):
+        """
+        Records newly discovered videos; known ones are left untouched.
+        Returns:
+            int: Number of new videos.
+        """
+        rows = []
+        for url in urls:
+            vid = video_id_from_url(url)
+            if vid:
+                rows.append((vid, url, now()))
+        with self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO videos (video_id, url, discovered_at) VALUES (?, ?, ?)", rows)
+            return self.conn.total_changes - before
+
+    def scan_vtt_folder(self, folder):
+        """
+        Matches .vtt files on disk to known videos and re-hashes only files whose
+        size or mtime changed. Picks up downloads from an interrupted run.
+        Returns:
+            int: Number of videos whose VTT is new or changed.
+        """
+        if not os.path.isdir(folder):
+            return 0
+        known = {vid: (size, mtime, vtt_hash)
+                 for vid, size, mtime, vtt_hash in self.conn.execute(
+                     "SELECT video_id, vtt_size, vtt_mtime, vtt_hash FROM videos")}
+        changed = 0
+        with self.conn:
+            for vid, path in vtt_files(folder).items():
+                if vid not in known:
+                    continue
+                st = os.stat(path)
+                size, mtime, old_hash = known[vid]
+                if (size, mtime) == (st.st_size, st.st_mtime):
+                    continue
+                vtt_hash = file_sha256(path)
+                if vtt_hash == old_hash:
+                    # touched but identical content: remember the new stat only
+                    self.conn.execute("UPDATE videos SET vtt_size = ?, vtt_mtime = ? WHERE video_id = ?",
+                                      (st.st_size, st.st_mtime, vid))
+                    continue
+                self.conn.execute("""
+                    UPDATE videos SET vtt_path = ?, vtt_size = ?, vtt_mtime = ?, vtt_hash = ?,
+                                      downloaded_at = ?, no_subs_at = NULL
+                    WHERE video_id = ?
+                """, (path, st.st_size, st.st_mtime, vtt_hash, now(), vid))
+                changed += 1
+        return changed
+
+    def record_download(self, video_id, path):
+        """
+        Records one freshly downloaded VTT (hash, size, mtime).
+        Returns:
+            str: The file's sha256.
+        """
+        st = os.stat(path)
+        vtt_hash = file_sha256(path)
+        with self.conn:
+            self.conn.execute("""
+                UPDATE videos SET vtt_path = ?, vtt_size = ?, vtt_mtime = ?, vtt_hash = ?,
+                                  downloaded_at = ?, no_subs_at = NULL
+                WHERE video_id = ?
+            """, (path, st.st_size, st.st_mtime, vtt_hash, now(), video_id))
+        return vtt_hash
+
+    def pending_downloads(self, retry_no_subs=False):
+        """
+        URLs of videos with no VTT yet. Videos already found to have no English
+        subtitles are skipped unless retry_no_subs is set.
+        """
+        sql = "SELECT url FROM videos WHERE vtt_hash IS NULL"
+        if not retry_no_subs:
+            sql += " AND no_subs_at IS NULL"
+        return [url for (url,) in self.conn.execute(sql + " ORDER BY discovered_at, video_id")]
+
+    def mark_no_subs(self, urls):
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE videos SET no_subs_at = ? WHERE url = ? AND vtt_hash IS NULL",
+                [(now(), url) for url in urls])
+
+    def pending_parse(self):
+        """
+        Videos whose current VTT has not been loaded yet, as (video_id, vtt_path,
+        vtt_hash). Parsing is cheap, so anything not loaded is re-parsed; that
+        keeps a crash between parse and load harmless.
+        """
+        return self.conn.execute("""
+            SELECT video_id, vtt_path, vtt_hash FROM videos
+            WHERE vtt_hash IS NOT NULL AND loaded_hash IS NOT vtt_hash
+            ORDER BY video_id
+        """).fetchall()
+
+    def mark_parsed(self, parsed):
+        """
+        Args:
+            parsed (list): (video_id, vtt_hash, row count) tuples.
+        """
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE videos SET parsed_hash = ?, parsed_rows = ?, parsed_at = ? WHERE video_id = ?",
+                [(vtt_hash, rows, now(), vid) for vid, vtt_hash, rows in parsed])
+
+    def mark_loaded(self, video_ids):
+        """
+        Records that the parsed rows of these videos are now in Postgres.
+        """
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE videos SET loaded_hash = parsed_hash, loaded_at = ? WHERE video_id = ?",
+                [(now(), vid) for vid in video_ids])
+
+    def summary(self):
+        row = self.conn.execute("""
+            SELECT count(*),
+                   count(vtt_hash),
+                   count(no_subs_at),
+                   sum(vtt_hash IS NOT NULL AND parsed_hash IS vtt_hash),
+                   sum(vtt_hash IS NOT NULL AND loaded_hash IS vtt_hash)
+            FROM videos
+        """).fetchone()
+        keys = ("discovered", "downloaded", "no_subs", "parsed", "loaded")
+        return {k: v or 0 for k, v in zip(keys, row)}
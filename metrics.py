@@ -0,0 +1,81 @@
+# metrics.py
+"""
+Minimal Prometheus text-format metrics for app.py (no client library needed).
+
+Values live in the worker process, like search_cache.QueryCache: with several
+gunicorn workers each scrape sees one worker, identified by the `pid` label
+that app.py adds to every series.
+"""
+import bisect
+import threading
+
+# seconds; covers a warm cache hit (<1ms) up to the 5s statement timeout
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Histogram:
+    """
+    Cumulative-bucket histogram, one series per distinct label set.
+    """
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label tuple -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self, extra_labels=()):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        for key, series in sorted(snapshot.items()):
+            labels = tuple(extra_labels) + key
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = _format_labels(labels + (("le", _format_value(bound)),))
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _format_labels(labels + (("le", "+Inf"),))
+            lines.append(f"{self.name}_bucket{le} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {series[-1]}")
+        return lines
+
+def render_samples(name, kind, help_text, samples, extra_labels=()):
+    """
+    Renders gauge or counter samples taken at scrape time.
+    Args:
+        samples (list): (labels dict, value) pairs.
+    """
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        key = tuple(extra_labels) + tuple(sorted(labels.items()))
+        lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+    return lines
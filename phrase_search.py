@@ -1,33 +1,89 @@
+import os
 import sqlite3
 
+# "sqlite" (default) searches phrase_search.db; "index" searches the
+# memory-mapped file built by `python inverted_index.py build`.
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "sqlite")
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", "captions.idx")
+DB_PATH = 'phrase_search.db'
+_phrase_index = None
+_conn = None
+
 def format_timestamp(timestamp):
     """
     Converts a timestamp from HH:MM:SS.sss format to YouTube-compatible 3h6m58s format.
     Args:
-        timestamp (str): Timestamp in HH:MM:SS.sss format.
+        timestamp (str | int): Timestamp in HH:MM:SS.sss format, or whole seconds
+            (what file_parser.py writes).
     Returns:
         str: Timestamp in YouTube-compatible format.
     """
+    if str(timestamp).isdigit():
+        total = int(timestamp)
+        timestamp = f"{total // 3600}:{total // 60 % 60}:{total % 60}"
     hours, minutes, seconds = timestamp.split(":")
     seconds = seconds.split(".")[0]  # Remove milliseconds
     formatted = f"{int(hours)}h{int(minutes)}m{int(seconds)}s" if int(hours) > 0 else f"{int(minutes)}m{int(seconds)}s"
     return formatted
 
+def get_connection():
+    """
+    Returns the module's SQLite connection, opening it on first use so repeated
+    searches don't pay for a new connection each time.
+    """
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    return _conn
+
+def fts_query(phrase):
+    """
+    Quotes a phrase as a single FTS5 phrase query ("" escapes a double quote).
+    """
+    return '"' + phrase.replace('"', '""') + '"'
+
 def search_phrase(phrase):
     """
     Searches for a phrase in the database and retrieves matching video links with timestamps.
+    Uses the captions_fts index (best bm25 matches first) and falls back to a
+    LIKE scan for inputs with no word characters or databases without the index.
     """
-    conn = sqlite3.connect('phrase_search.db')
+    if SEARCH_BACKEND == "index":
+        return search_phrase_index(phrase)
+    conn = get_connection()
     cursor = conn.cursor()
+    if any(ch.isalnum() for ch in phrase):
+        try:
+            cursor.execute("""
+                SELECT videos.url, captions.timestamp
+                FROM captions_fts
+                JOIN captions ON captions.id = captions_fts.rowid
+                JOIN videos ON captions.video_id = videos.video_id
+                WHERE captions_fts MATCH ?
+                ORDER BY bm25(captions_fts)
+            """, (fts_query(phrase),))
+            return cursor.fetchall()
+        except sqlite3.OperationalError as e:
+            if "no such table" not in str(e):
+                raise
     cursor.execute("""
         SELECT videos.url, captions.timestamp 
         FROM captions
         JOIN videos ON captions.video_id = videos.video_id
         WHERE caption_text LIKE ?
     """, ('%' + phrase + '%',))
-    results = cursor.fetchall()
-    conn.close()
-    return results
+    return cursor.fetchall()
+
+def search_phrase_index(phrase, limit=1000):
+    """
+    Same as search_phrase, answered from the inverted index file.
+    """
+    global _phrase_index
+    if _phrase_index is None:
+        from inverted_index import PhraseIndex
+        _phrase_index = PhraseIndex(SEARCH_INDEX_PATH)
+    return [(f"https://www.youtube.com/watch?v={hit['video_id']}", hit["timestamp"])
+            for _, hit in _phrase_index.search(phrase, limit=limit)]
 
 def main():
     print("Welcome to Phrase Search!")
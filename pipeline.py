@@ -0,0 +1,253 @@
+# pipeline.py
+"""
+In-process ingest orchestrator: download -> parse -> load run at the same time,
+connected by bounded queues.
+
+    urls ──> [download x N] ──parse_q──> [parse x M] ──load_q──> [load x K] ──> Postgres
+
+Each stage body is the existing per-video code (download_captions.download_one,
+file_parser.parse_vtt_file, data_insert_pg.insert_rows). A full queue blocks
+its producers, so a slow database throttles parsing, which in turn throttles
+downloads, and memory stays bounded. Manifest state is updated as each video
+moves along, so an interrupted run resumes where it stopped.
+"""
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from download_captions import ClientStats, TokenBucket, download_one, video_id_from_url, vtt_files
+from file_parser import parse_video_file
+
+_DONE = object()  # end-of-stream marker, one per downstream worker
+
+class StageStats:
+    """
+    Per-stage counters: items processed, errors, time spent working, and time
+    spent blocked waiting for input or for room downstream.
+    """
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.starved = 0.0
+        self.blocked = 0.0
+        self.started = None
+        self.finished = None
+        self.lock = threading.Lock()
+
+    def add(self, **deltas):
+        with self.lock:
+            for key, value in deltas.items():
+                setattr(self, key, getattr(self, key) + value)
+
+    def summary(self):
+        wall = (self.finished or time.perf_counter()) - (self.started or time.perf_counter())
+        return {
+            "workers": self.workers,
+            "items": self.items,
+            "errors": self.errors,
+            "wall_s": round(wall, 2),
+            "busy_s": round(self.busy, 2),
+            "starved_s": round(self.starved, 2),
+            "blocked_s": round(self.blocked, 2),
+            "items_per_s": round(self.items / wall, 2) if wall > 0 else 0.0,
+        }
+
+def _get(q, stats):
+    start = time.perf_counter()
+    item = q.get()
+    stats.add(starved=time.perf_counter() - start)
+    return item
+
+def _put(q, item, stats):
+    start = time.perf_counter()
+    q.put(item)
+    stats.add(blocked=time.perf_counter() - start)
+
+class Pipeline:
+    def __init__(self, manifest, output_folder="vtt_files", download_workers=4, rate=1.0,
+                 parse_workers=2, load_workers=1, queue_size=16, load_batch_rows=5000,
+                 cookies_browser=None):
+        self.manifest = manifest
+        self.manifest_lock = threading.Lock()
+        self.output_folder = output_folder
+        self.cookies_browser = cookies_browser
+        self.load_batch_rows = load_batch_rows
+        self.limiter = TokenBucket(rate, burst=max(1, download_workers))
+        self.clients = ClientStats()
+        self.url_q = queue.Queue()
+        self.parse_q = queue.Queue(maxsize=queue_size)
+        self.load_q = queue.Queue(maxsize=queue_size)
+        self.stats = {
+            "download": StageStats("download", download_workers),
+            "parse": StageStats("parse", parse_workers),
+            "load": StageStats("load", load_workers),
+        }
+        # parsing is CPU-bound: stage threads hand files to worker processes.
+        # Plain fork() while download threads are inside subprocess.Popen leaks
+        # Popen's pipes into the parser children and can hang the download, so
+        # workers come from a forkserver instead.
+        self.executor = None
+        if parse_workers > 1:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self.executor = ProcessPoolExecutor(max_workers=parse_workers,
+                                                mp_context=multiprocessing.get_context(method))
+
+    # --- stage bodies ---
+
+    def _download_worker(self):
+        stats = self.stats["download"]
+        while True:
+            url = _get(self.url_q, stats)
+            if url is _DONE:
+                return
+            if isinstance(url, tuple):
+                # already on disk from an earlier run: straight to parsing
+                _put(self.parse_q, url, stats)
+                continue
+            vid = video_id_from_url(url)
+            start = time.perf_counter()
+            try:
+                status, _, _ = download_one(url, vid, self.output_folder, self.limiter, self.clients,
+                                            cookies_browser=self.cookies_browser)
+            except Exception as e:
+                print(f"  ! download {url}: {e}")
+                status = "failed"
+            stats.add(busy=time.perf_counter() - start, items=1, errors=status == "failed")
+            if status == "ok":
+                path = vtt_files(self.output_folder, vid)[vid]
+                with self.manifest_lock:
+                    vtt_hash = self.manifest.record_download(vid, path)
+                _put(self.parse_q, (vid, path, vtt_hash), stats)
+            elif status == "no_subs":
+                with self.manifest_lock:
+                    self.manifest.mark_no_subs([url])
+
+    def _parse_worker(self):
+        stats = self.stats["parse"]
+        while True:
+            item = _get(self.parse_q, stats)
+            if item is _DONE:
+                return
+            vid, path, vtt_hash = item
+            start = time.perf_counter()
+            try:
+                if self.executor:
+                    _, captions = self.executor.submit(parse_video_file, path).result()
+                else:
+                    _, captions = parse_video_file(path)
+            except Exception as e:
+                print(f"  ! parse {path}: {e}")
+                stats.add(busy=time.perf_counter() - start, items=1, errors=1)
+                continue
+            stats.add(busy=time.perf_counter() - start, items=1)
+            rows = [(vid, int(ts), text) for ts, text in captions]
+            with self.manifest_lock:
+                self.manifest.mark_parsed([(vid, vtt_hash, len(rows))])
+            _put(self.load_q, (vid, rows), stats)
+
+    def _load_worker(self):
+        import data_insert_pg
+
+        stats = self.stats["load"]
+        done = False
+        while not done:
+            batch, batch_rows = [], 0
+            item = _get(self.load_q, stats)
+            # coalesce whatever else is already queued, up to load_batch_rows
+            while item is not _DONE:
+                batch.append(item)
+                batch_rows += len(item[1])
+                if batch_rows >= self.load_batch_rows:
+                    break
+                try:
+                    item = self.load_q.get_nowait()
+                except queue.Empty:
+                    break
+            done = item is _DONE
+            if not batch:
+                continue
+            start = time.perf_counter()
+            video_ids = [vid for vid, _ in batch]
+            try:
+                data_insert_pg.insert_rows((row for _, rows in batch for row in rows),
+                                           replace_videos=video_ids)
+                with self.manifest_lock:
+                    self.manifest.mark_loaded(video_ids)
+                stats.add(items=len(batch))
+            except Exception as e:
+                print(f"  ! load of {len(batch)} videos failed: {e}")
+                stats.add(errors=len(batch))
+            stats.add(busy=time.perf_counter() - start)
+
+    # --- orchestration ---
+
+    def _run_stage(self, name, target, n_workers, downstream, n_downstream):
+        stats = self.stats[name]
+        stats.started = time.perf_counter()
+        threads = [threading.Thread(target=target, name=f"{name}-{i}", daemon=True)
+                   for i in range(n_workers)]
+        for t in threads:
+            t.start()
+
+        def finish():
+            for t in threads:
+                t.join()
+            stats.finished = time.perf_counter()
+            if downstream is not None:
+                for _ in range(n_downstream):
+                    downstream.put(_DONE)
+
+        closer = threading.Thread(target=finish, name=f"{name}-closer", daemon=True)
+        closer.start()
+        return closer
+
+    def run(self, urls, already_downloaded=()):
+        """
+        Downloads, parses and loads `urls`. `already_downloaded` ((video_id,
+        vtt_path, vtt_hash) tuples, e.g. manifest.pending_parse()) skip the
+        download and go straight to parsing.
+        Returns:
+            dict: Per-stage summary (see StageStats.summary).
+        """
+        n_dl = self.stats["download"].workers
+        n_parse = self.stats["parse"].workers
+        n_load = self.stats["load"].workers
+        os.makedirs(self.output_folder, exist_ok=True)
+
+        for item in already_downloaded:
+            self.url_q.put(tuple(item))
+        for url in urls:
+            self.url_q.put(url)
+        for _ in range(n_dl):
+            self.url_q.put(_DONE)
+
+        start = time.perf_counter()
+        closers = [
+            self._run_stage("download", self._download_worker, n_dl, self.parse_q, n_parse),
+            self._run_stage("parse", self._parse_worker, n_parse, self.load_q, n_load),
+            self._run_stage("load", self._load_worker, n_load, None, 0),
+        ]
+        for closer in closers:
+            closer.join()
+        if self.executor:
+            self.executor.shutdown()
+
+        summary = {name: stats.summary() for name, stats in self.stats.items()}
+        summary["total_s"] = round(time.perf_counter() - start, 2)
+        return summary
+
+def print_summary(summary):
+    print(f"{'stage':<10}{'workers':>8}{'items':>8}{'errors':>8}{'wall s':>9}"
+          f"{'busy s':>9}{'starved s':>11}{'blocked s':>11}{'items/s':>9}")
+    for name in ("download", "parse", "load"):
+        s = summary[name]
+        print(f"{name:<10}{s['workers']:>8}{s['items']:>8}{s['errors']:>8}{s['wall_s']:>9}"
+              f"{s['busy_s']:>9}{s['starved_s']:>11}{s['blocked_s']:>11}{s['items_per_s']:>9}")
+    print(f"total {summary['total_s']}s")
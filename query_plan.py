@@ -0,0 +1,60 @@
+# query_plan.py
+"""
+Chooses how /search matches a phrase.
+
+    fts      content-word phrases: phraseto_tsquery on the GIN-indexed caption_tsv
+    trigram  stopword- or punctuation-heavy phrases: ILIKE on the escaped phrase,
+             served by captions_caption_text_trgm_idx; Postgres rechecks every
+             candidate row against the exact substring
+    ilike    under 3 letters/digits, which trigrams can't index: a plain scan
+
+The 'english' text search config drops stopwords and punctuation, so
+"to be or not to be" becomes an empty tsquery (no results) and "c++" matches
+any "c"; those phrases need the literal substring match instead.
+"""
+import re
+
+# Postgres' tsearch_data/english.stop, i.e. what to_tsvector('english', ...) drops
+STOPWORDS = frozenset("""
+i me my myself we our ours ourselves you your yours yourself yourselves he him his
+himself she her hers herself it its itself they them their theirs themselves what which
+who whom this that these those am is are was were be been being have has had having do
+does did doing a an the and but if or because as until while of at by for with about
+against between into through during before after above below to from up down in out on
+off over under again further then once here there when where why how all any both each
+few more most other some such no nor not only own same so than too very s t can will
+just don should now
+""".split())
+
+WORD_RE = re.compile(r"[^\W_]+")
+
+MIN_TRIGRAM_CHARS = 3      # pg_trgm needs at least one full trigram to use the index
+MAX_STOPWORD_SHARE = 0.5   # more stopwords than this and FTS loses the phrase
+MAX_PUNCT_SHARE = 0.2      # symbols the tokenizer would silently discard
+
+PLANS = ("fts", "trigram", "ilike")
+
+def plan_query(phrase):
+    """
+    Args:
+        phrase (str): The stripped, non-empty search phrase.
+    Returns:
+        str: One of PLANS.
+    """
+    words = WORD_RE.findall(phrase.lower())
+    if sum(len(w) for w in words) < MIN_TRIGRAM_CHARS:
+        return "ilike"
+    stop = sum(w in STOPWORDS for w in words)
+    punct = sum(not ch.isalnum() and not ch.isspace() for ch in phrase)
+    if stop == len(words) or stop / len(words) > MAX_STOPWORD_SHARE:
+        return "trigram"
+    if punct / len(phrase) > MAX_PUNCT_SHARE:
+        return "trigram"
+    return "fts"
+
+def like_pattern(phrase):
+    """
+    Substring pattern for ILIKE, with the phrase's own % _ and \\ matched literally.
+    """
+    escaped = phrase.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
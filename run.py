@@ -1,5 +1,7 @@
 import os
+import time
 import shutil
+import argparse
 import datetime
 
 def create_timestamped_backup_folder(parent_folder):
@@ -49,8 +51,11 @@ def move_folder_to_backup(folder_path, backup_folder):
     shutil.move(folder_path, destination_path)
     print(f"Moved {folder_name} to {backup_folder}.")
 
-def main():
-
+def run_full():
+    """
+    Original pipeline: re-runs every stage on everything, then moves all inputs
+    and outputs (including vtt_files) into a timestamped backup.
+    """
     print("Starting!")
 
     os.system("python url_maker.py")
@@ -81,5 +86,148 @@ def main():
     print(f"Setup complete! All files moved to {backup_folder}.")
     print("You can now search for phrases using phrase_search.py.")
 
+def discover(manifest, args):
+    """
+    Runs url_maker.py (unless --skip-discovery) and records new URLs in the manifest.
+    """
+    if not args.skip_discovery:
+        os.system("python url_maker.py")
+    if os.path.exists("video_urls.txt"):
+        with open("video_urls.txt", "r", encoding="utf-8") as f:
+            new = manifest.add_urls(u.strip() for u in f if u.strip())
+        print(f"Discovered {new} new videos.")
+
+def run_pipeline(args):
+    """
+    Default mode: download, parse and load overlap in one process, connected by
+    bounded queues (see pipeline.py). Only new or changed videos are processed.
+    """
+    from manifest import Manifest
+    from pipeline import Pipeline, print_summary
+    import data_insert_pg
+
+    manifest = Manifest(args.manifest)
+    print("Starting (pipelined)!")
+    discover(manifest, args)
+
+    ensure_vtt_folder()
+    manifest.scan_vtt_folder("vtt_files")  # picks up files from an interrupted run
+    urls = manifest.pending_downloads(retry_no_subs=args.retry_no_subs)
+    resumed = manifest.pending_parse()
+    if not urls and not resumed:
+        print("Nothing new to download or load.")
+    else:
+        print(f"Processing {len(urls)} new videos and {len(resumed)} downloaded but not loaded...")
+        try:
+            data_insert_pg.ensure_schema()
+            pipeline = Pipeline(manifest, "vtt_files",
+                                download_workers=args.workers, rate=args.rate,
+                                parse_workers=args.parse_workers, load_workers=args.load_workers,
+                                queue_size=args.queue_size, load_batch_rows=args.load_batch_rows)
+            print_summary(pipeline.run(urls, resumed))
+        finally:
+            data_insert_pg.pool.close()
+        if os.path.exists("video_urls.txt"):
+            move_file_to_backup("video_urls.txt", create_timestamped_backup_folder("backups"))
+
+    print("Manifest:", manifest.summary())
+    manifest.close()
+
+def run_incremental(args):
+    """
+    Manifest-driven, stage-by-stage pipeline: only new or changed videos are
+    downloaded, parsed and loaded, but each stage finishes before the next
+    starts. vtt_files stays in place between runs; every stage re-derives its
+    work list from the manifest, so an interrupted run simply resumes.
+    """
+    from manifest import Manifest
+    from download_captions import download_concurrent
+    from file_parser import parse_files
+
+    manifest = Manifest(args.manifest)
+    timings = {}
+    print("Starting (staged)!")
+
+    start = time.perf_counter()
+    discover(manifest, args)
+    timings["discover"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ensure_vtt_folder()
+    manifest.scan_vtt_folder("vtt_files")  # picks up files from an interrupted run
+    pending = manifest.pending_downloads(retry_no_subs=args.retry_no_subs)
+    if pending:
+        print(f"Downloading captions for {len(pending)} videos...")
+        result = download_concurrent(pending, "vtt_files", workers=args.workers, rate=args.rate)
+        manifest.mark_no_subs(result["no_subs_urls"])
+        manifest.scan_vtt_folder("vtt_files")
+    else:
+        print("No new videos to download.")
+    timings["download"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    to_load = manifest.pending_parse()
+    if to_load:
+        print(f"Parsing {len(to_load)} new or changed caption files...")
+        stats = parse_files([path for _, path, _ in to_load], "parsed_captions.txt",
+                            workers=args.parse_workers)
+        manifest.mark_parsed([(vid, vtt_hash, stats["rows_per_video"].get(vid, 0))
+                              for vid, _, vtt_hash in to_load])
+    timings["parse"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if to_load:
+        print("Inserting data into the database (Postgres/Neon)...")
+        import data_insert_pg
+        try:
+            data_insert_pg.ensure_schema()
+            # every re-parsed video, so one that now parses to no rows is emptied
+            stats = data_insert_pg.bulk_insert_data("parsed_captions.txt",
+                                                    replace_videos=[vid for vid, _, _ in to_load])
+            print(f"Loaded {stats['copied']} rows at {stats['rows_per_sec']} rows/s.")
+        finally:
+            data_insert_pg.pool.close()
+        manifest.mark_loaded([vid for vid, _, _ in to_load])
+
+        backup_folder = create_timestamped_backup_folder("backups")
+        move_file_to_backup("video_urls.txt", backup_folder)
+        move_file_to_backup("parsed_captions.txt", backup_folder)
+    else:
+        print("Nothing new to load.")
+    timings["load"] = time.perf_counter() - start
+
+    print("Manifest:", manifest.summary())
+    print("Stage timings:", {k: f"{v:.1f}s" for k, v in timings.items()})
+    manifest.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Discover, download, parse and load captions.")
+    parser.add_argument("--full", action="store_true",
+                        help="original full re-run (no manifest), backing up everything afterwards")
+    parser.add_argument("--staged", action="store_true",
+                        help="incremental, but run download, parse and load one after another")
+    parser.add_argument("--manifest", default="ingest_manifest.db")
+    parser.add_argument("--skip-discovery", action="store_true",
+                        help="don't run url_maker.py; use video_urls.txt / the manifest as-is")
+    parser.add_argument("--retry-no-subs", action="store_true",
+                        help="retry videos that previously had no English subtitles")
+    parser.add_argument("--workers", type=int, default=4, help="parallel downloads")
+    parser.add_argument("--rate", type=float, default=1.0, help="yt-dlp launches per second; 0 = no limit")
+    parser.add_argument("--parse-workers", type=int, default=1,
+                        help="parser processes (pipelined) / parse_files workers (--staged)")
+    parser.add_argument("--load-workers", type=int, default=1, help="concurrent DB loaders (pipelined)")
+    parser.add_argument("--queue-size", type=int, default=16,
+                        help="videos buffered between stages before upstream blocks (pipelined)")
+    parser.add_argument("--load-batch-rows", type=int, default=5000,
+                        help="rows per load transaction (pipelined)")
+    args = parser.parse_args()
+
+    if args.full:
+        run_full()
+    elif args.staged:
+        run_incremental(args)
+    else:
+        run_pipeline(args)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,110 @@
+# search_cache.py
+import json
+import threading
+import time
+from collections import OrderedDict
+
+class QueryCache:
+    """
+    Bounded LRU cache for /search payloads with a TTL and a memory cap.
+
+    Entries are tagged with the ingest generation they were computed under;
+    when the loader bumps the generation (data_insert_pg.insert_data) the whole
+    cache is dropped. Each gunicorn worker holds its own instance, and they stay
+    coherent because every worker checks the same generation row.
+    """
+
+    def __init__(self, max_entries=512, max_bytes=16 * 1024 * 1024, ttl=300.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.generation = None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()  # key -> (expires_at, size, payload)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, size, payload = entry
+            if expires_at < time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, key, payload):
+        if not self.enabled:
+            return
+        size = len(json.dumps(payload, separators=(",", ":")))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, payload)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def set_generation(self, generation):
+        """
+        Records the current ingest generation, clearing the cache if it moved.
+        """
+        with self._lock:
+            if generation == self.generation:
+                return
+            if self.generation is not None:
+                self.invalidations += 1
+            self._entries.clear()
+            self.bytes = 0
+            self.generation = generation
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "generation": self.generation,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+def normalize_query(phrase):
+    """
+    Case-insensitive form of a query. Both search branches (FTS and ILIKE)
+    ignore case, so "Hello" and "hello" share one cache entry. Inner
+    whitespace is kept because ILIKE treats it literally.
+    """
+    return phrase.strip().lower()
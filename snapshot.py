@@ -0,0 +1,108 @@
+# snapshot.py
+"""
+Read-only SQLite FTS5 snapshot of the captions, for app.py to search while
+Postgres is cold or unreachable.
+
+`python data_insert_pg.py --export-snapshot captions_snapshot.db` writes it
+in the data_insert.py schema (captions + the captions_fts external-content
+index), plus a snapshot_meta row recording the ingest generation it was taken
+at. The export writes a temp file and renames it into place, so a reader holding
+the old file keeps a consistent view and the next open sees the new one.
+
+Matching follows phrase_search.py: an FTS5 phrase query, best bm25 first,
+or a LIKE scan for input without word characters. Unlike Postgres FTS it
+has no stemming and no stopwords, so results are close to, not identical with,
+/search's.
+"""
+import os
+import sqlite3
+import threading
+
+from phrase_search import fts_query
+
+SEARCH_SQL = """
+SELECT c.video_id, c.timestamp, c.caption_text, m.score, m.id
+FROM (SELECT rowid AS id, bm25(captions_fts) AS score
+      FROM captions_fts WHERE captions_fts MATCH :q) m
+JOIN captions c ON c.id = m.id
+WHERE :after_id IS NULL OR m.score > :after_score
+      OR (m.score = :after_score AND m.id > :after_id)
+ORDER BY m.score, m.id
+LIMIT :limit OFFSET :offset
+"""
+
+LIKE_SQL = """
+SELECT c.video_id, c.timestamp, c.caption_text, 0.0, c.id
+FROM captions c
+WHERE c.caption_text LIKE :pat ESCAPE '\\' AND (:after_id IS NULL OR c.id > :after_id)
+ORDER BY c.id
+LIMIT :limit OFFSET :offset
+"""
+
+ALL_SQL = """
+SELECT c.video_id, c.timestamp, c.caption_text
+FROM captions_fts f JOIN captions c ON c.id = f.rowid
+WHERE captions_fts MATCH ?
+ORDER BY f.rowid
+"""
+
+def like_escape(phrase):
+    return "%" + phrase.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+class SearchSnapshot:
+    """
+    One snapshot file, opened read-only with one connection per thread.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        st = os.stat(path)
+        self.mtime_ns = st.st_mtime_ns
+        self.size = st.st_size
+        self._local = threading.local()
+        row = self._conn().execute(
+            "SELECT generation, created_at, rows FROM snapshot_meta").fetchone()
+        self.generation, self.created_at, self.rows = row
+        self.searches = 0
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def search(self, phrase, limit=20, offset=0, after=None):
+        """
+        Returns one page of matches.
+        Args:
+            after (tuple): (score, id) of the previous page's last row.
+        Returns:
+            list: (video_id, timestamp, caption_text, score, id) tuples.
+        """
+        self.searches += 1
+        params = {"limit": limit, "offset": offset, "after_score": None, "after_id": None}
+        if after:
+            params["after_score"], params["after_id"] = after
+        if any(ch.isalnum() for ch in phrase):
+            return self._conn().execute(SEARCH_SQL, {**params, "q": fts_query(phrase)}).fetchall()
+        return self._conn().execute(LIKE_SQL, {**params, "pat": like_escape(phrase)}).fetchall()
+
+    def iter_hits(self, phrase):
+        """
+        Yields every match as a result dict, in snapshot (video, time) order.
+        """
+        self.searches += 1
+        if any(ch.isalnum() for ch in phrase):
+            rows = self._conn().execute(ALL_SQL, (fts_query(phrase),))
+        else:
+            rows = self._conn().execute(
+                "SELECT video_id, timestamp, caption_text FROM captions "
+                "WHERE caption_text LIKE ? ESCAPE '\\' ORDER BY id", (like_escape(phrase),))
+        for video_id, ts, text in rows:
+            yield {"video_id": video_id, "timestamp": int(ts), "caption_text": text}
+
+    def stats(self):
+        return {"path": self.path, "bytes": self.size, "rows": self.rows,
+                "generation": self.generation, "created_at": self.created_at,
+                "searches": self.searches}
@@ -0,0 +1,101 @@
+# suggest.py
+"""
+In-memory prefix dictionary behind /suggest.
+
+Holds the most frequent words and two-word phrases (data_insert_pg keeps their
+counts in suggest_terms) as one sorted list, so a prefix is a bisect to the
+start of its range. The top matches for 1- and 2-character prefixes, whose
+ranges span a large part of the dictionary, are computed once at load time;
+longer prefixes pick their top matches from a short range on demand. A reload
+builds new lists and swaps them in with one assignment, so lookups never lock.
+"""
+import heapq
+import re
+import threading
+import time
+from bisect import bisect_left
+from itertools import groupby
+
+NON_WORD_RE = re.compile(r"[^\w' ]+")
+PRECOMPUTED_PREFIX_CHARS = 2
+
+def normalize_prefix(text):
+    """
+    Lower-cases and collapses whitespace, keeping one trailing space (so
+    "the " completes to phrases starting with "the").
+    """
+    text = NON_WORD_RE.sub(" ", text.lower())
+    words = text.split()
+    if not words:
+        return ""
+    return " ".join(words) + (" " if text.endswith(" ") else "")
+
+class SuggestIndex:
+    def __init__(self, max_terms=200_000, min_freq=2, top_k=10):
+        self.max_terms = max_terms
+        self.min_freq = min_freq
+        self.top_k = top_k
+        self.generation = None
+        self.loaded_at = None
+        self.load_ms = None
+        self.lookups = 0
+        self._data = ([], [], {})  # terms (sorted), freqs, short prefix -> top term indexes
+        self._lock = threading.Lock()  # one load at a time
+
+    def __len__(self):
+        return len(self._data[0])
+
+    def load(self, rows, generation=None):
+        """
+        Replaces the dictionary with (term, freq) rows, keeping the max_terms
+        most frequent at or above min_freq.
+        """
+        with self._lock:
+            start = time.perf_counter()
+            rows = [(term, freq) for term, freq in rows if freq >= self.min_freq]
+            if len(rows) > self.max_terms:
+                rows = heapq.nlargest(self.max_terms, rows, key=lambda row: row[1])
+            rows.sort()
+            terms = [term for term, _ in rows]
+            freqs = [freq for _, freq in rows]
+            short = {}
+            for n in range(1, PRECOMPUTED_PREFIX_CHARS + 1):
+                for prefix, group in groupby(range(len(terms)), key=lambda i: terms[i][:n]):
+                    if len(prefix) == n:
+                        short[prefix] = heapq.nlargest(self.top_k, group, key=freqs.__getitem__)
+            self._data = (terms, freqs, short)
+            self.generation = generation
+            self.loaded_at = time.time()
+            self.load_ms = round((time.perf_counter() - start) * 1000, 1)
+
+    def suggest(self, text, limit=8):
+        """
+        Returns up to `limit` completions of the last two words of `text`, most
+        frequent first, each prefixed with the words typed before them.
+        Returns:
+            list: [{"text": completion, "freq": count}, ...]
+        """
+        self.lookups += 1
+        prefix = normalize_prefix(text)
+        if not prefix:
+            return []
+        words = prefix.split(" ")
+        head = " ".join(words[:-2])
+        prefix = " ".join(words[-2:])
+        limit = min(limit, self.top_k)
+
+        terms, freqs, short = self._data
+        if prefix in short:
+            top = short[prefix][:limit]
+        else:
+            lo = bisect_left(terms, prefix)
+            hi = bisect_left(terms, prefix + "\U0010ffff", lo)
+            top = heapq.nlargest(limit, range(lo, hi), key=freqs.__getitem__)
+        return [{"text": f"{head} {terms[i]}" if head else terms[i], "freq": freqs[i]}
+                for i in top]
+
+    def stats(self):
+        terms, _, short = self._data
+        return {"terms": len(terms), "precomputed_prefixes": len(short),
+                "generation": self.generation, "loaded_at": self.loaded_at,
+                "load_ms": self.load_ms, "lookups": self.lookups}
@@ -0,0 +1,98 @@
+import socket
+import threading
+
+import pytest
+
+from admission import AdmissionLane, Overloaded, client_gone
+
+def hold(lane, entered, release):
+    with lane.slot():
+        entered.set()
+        release.wait(5)
+
+def start_holder(lane, release):
+    entered = threading.Event()
+    thread = threading.Thread(target=hold, args=(lane, entered, release))
+    thread.start()
+    assert entered.wait(5)
+    return thread
+
+def test_full_lane_with_no_queue_rejects():
+    lane = AdmissionLane("t", concurrency=1, queue_depth=0, max_wait=1)
+    release = threading.Event()
+    holder = start_holder(lane, release)
+    with pytest.raises(Overloaded) as exc:
+        with lane.slot():
+            pass
+    assert exc.value.lane == "t" and exc.value.retry_after >= 1
+    release.set()
+    holder.join()
+    st = lane.stats()
+    assert (st["admitted"], st["rejected"], st["active"], st["waiting"]) == (1, 1, 0, 0)
+
+def test_waiter_times_out_after_max_wait():
+    lane = AdmissionLane("t", concurrency=1, queue_depth=1, max_wait=0.05)
+    release = threading.Event()
+    holder = start_holder(lane, release)
+    with pytest.raises(Overloaded):
+        with lane.slot():
+            pass
+    release.set()
+    holder.join()
+    assert lane.stats()["timed_out"] == 1
+    assert lane.stats()["waiting"] == 0
+
+def test_waiter_is_admitted_when_a_slot_frees():
+    lane = AdmissionLane("t", concurrency=1, queue_depth=1, max_wait=5)
+    release = threading.Event()
+    holder = start_holder(lane, release)
+    threading.Timer(0.05, release.set).start()
+    with lane.slot():
+        assert lane.stats()["active"] == 1
+    holder.join()
+    assert lane.stats()["admitted"] == 2
+
+def test_slot_is_released_when_the_block_raises():
+    lane = AdmissionLane("t", concurrency=1, queue_depth=0, max_wait=0)
+    with pytest.raises(ValueError):
+        with lane.slot():
+            raise ValueError()
+    with lane.slot():
+        pass
+    assert lane.stats()["active"] == 0
+
+def test_concurrency_is_never_exceeded():
+    lane = AdmissionLane("t", concurrency=2, queue_depth=8, max_wait=5)
+    peak, lock = [0], threading.Lock()
+
+    def work():
+        with lane.slot():
+            with lock:
+                peak[0] = max(peak[0], lane.active)
+            threading.Event().wait(0.01)
+
+    threads = [threading.Thread(target=work) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak[0] == 2
+    assert lane.stats()["admitted"] == 10
+
+def test_retry_after_scales_with_backlog():
+    lane = AdmissionLane("t", concurrency=2, queue_depth=0, max_wait=0)
+    assert lane.retry_after() == 1
+    lane.active, lane.waiting, lane.avg_service = 2, 8, 1.0
+    assert lane.retry_after() == 5
+
+def test_client_gone():
+    a, b = socket.socketpair()
+    try:
+        assert not client_gone(a)
+        b.sendall(b"GET / HTTP/1.1\r\n")  # pipelined request, not a disconnect
+        assert not client_gone(a)
+        b.close()
+        a.recv(100)
+        assert client_gone(a)
+    finally:
+        a.close()
@@ -0,0 +1,147 @@
+"""
+app.py request handling with run_query stubbed out: no database is needed.
+The pool points at a closed port and never opens a connection.
+"""
+import os
+import sqlite3
+
+REAL_DSN = os.environ.get("DATABASE_URL")
+os.environ["DATABASE_URL"] = "postgresql://localhost:1/none?connect_timeout=1"
+os.environ["SEARCH_SNAPSHOT_PATH"] = ""
+os.environ["POOL_CHECK_SECONDS"] = "0"
+
+import psycopg
+import pytest
+
+import app as app_module
+import data_insert
+from inverted_index import PhraseIndex, build_index
+from snapshot import SearchSnapshot
+
+# app.py reads DATABASE_URL at import only; leave the real one to other tests
+if REAL_DSN is None:
+    del os.environ["DATABASE_URL"]
+else:
+    os.environ["DATABASE_URL"] = REAL_DSN
+
+@pytest.fixture
+def client(monkeypatch):
+    # a known generation, so /search computes an ETag
+    monkeypatch.setattr(app_module, "refresh_generation", lambda: None)
+    monkeypatch.setattr(app_module.cache, "generation", 1)
+    monkeypatch.setattr(app_module.cache, "max_entries", 0)  # no cache hits
+    return app_module.app.test_client()
+
+def failing_query(exc):
+    def run_query(*args, **kwargs):
+        raise exc
+    return run_query
+
+@pytest.mark.parametrize("exc, status", [
+    (psycopg.errors.QueryCanceled("canceling statement due to statement timeout"), 504),
+    (app_module.ClientGone(), 499),
+    (RuntimeError("boom"), 500),
+])
+@pytest.mark.parametrize("group", ["", "video"])
+def test_search_errors_are_json(client, monkeypatch, exc, status, group):
+    monkeypatch.setattr(app_module, "run_query", failing_query(exc))
+    resp = client.get("/search", query_string={"q": "hello world", "group": group})
+    assert resp.status_code == status
+    assert "error" in resp.get_json()
+    assert "ETag" not in resp.headers
+
+@pytest.fixture
+def snapshot(tmp_path, monkeypatch):
+    path = str(tmp_path / "snapshot.db")
+    data_insert.create_tables(path)
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("INSERT INTO videos VALUES ('vid1', '')")
+        conn.executemany("INSERT INTO captions (video_id, timestamp, caption_text) VALUES (?, ?, ?)",
+                         [("vid1", 1, "hello world"), ("vid1", 5, "well hello world again")])
+        conn.execute("CREATE TABLE snapshot_meta (generation INTEGER, created_at TEXT, rows INTEGER)")
+        conn.execute("INSERT INTO snapshot_meta VALUES (3, '', 2)")
+    conn.close()
+    snap = SearchSnapshot(path)
+    monkeypatch.setattr(app_module, "snapshot", snap)
+    monkeypatch.setattr(app_module, "refresh_snapshot", lambda: snap)
+    monkeypatch.setattr(app_module, "_pool_warming", False)
+    monkeypatch.setattr(app_module, "_postgres_down_until", 0.0)
+    return snap
+
+@pytest.mark.parametrize("group", ["", "video"])
+def test_snapshot_fallback_has_snapshot_etag(client, monkeypatch, snapshot, group):
+    monkeypatch.setattr(app_module, "run_query",
+                        failing_query(psycopg.OperationalError("connection refused")))
+    resp = client.get("/search", query_string={"q": "hello world", "group": group})
+    assert resp.status_code == 200
+    assert resp.get_json()["backend"] == "snapshot"
+    key = ("hello world", 20, 0, "", group)
+    assert resp.headers["ETag"] == f'W/"{app_module.search_etag(key, "snapshot")}"'
+    assert resp.headers["ETag"] != f'W/"{app_module.search_etag(key)}"'
+    assert resp.headers["Cache-Control"] == "public, max-age=5"
+
+def test_snapshot_cursor_without_snapshot_is_503(client, monkeypatch):
+    monkeypatch.setattr(app_module, "run_query", failing_query(AssertionError("reached Postgres")))
+    cursor = app_module.encode_cursor("snapshot", -3.5, 12, 42)
+    resp = client.get("/search", query_string={"q": "hello world", "cursor": cursor})
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"]
+
+@pytest.mark.parametrize("reachable, down", [(True, False), (False, True)])
+def test_pool_timeout_is_an_outage_only_if_unreachable(monkeypatch, reachable, down):
+    monkeypatch.setattr(app_module, "refresh_snapshot", lambda: object())
+    monkeypatch.setattr(app_module, "postgres_reachable", lambda: reachable)
+    monkeypatch.setattr(app_module, "_postgres_down_until", 0.0)
+    assert app_module.mark_postgres_down(app_module.PoolTimeout()) is down
+    assert (app_module._postgres_down_until > 0) is down
+
+def test_timeouts_and_overload_are_not_outages(monkeypatch):
+    monkeypatch.setattr(app_module, "refresh_snapshot", lambda: object())
+    monkeypatch.setattr(app_module, "postgres_reachable", lambda: False)
+    monkeypatch.setattr(app_module, "_postgres_down_until", 0.0)
+    for e in (psycopg.errors.QueryCanceled(), app_module.Overloaded("cheap", 1)):
+        assert not app_module.mark_postgres_down(e)
+    assert app_module.mark_postgres_down(psycopg.OperationalError("connection refused"))
+
+class FakeConn:
+    def __init__(self, error=None, row=(7,)):
+        self.error, self.row, self.rolled_back = error, row, False
+
+    def execute(self, sql):
+        if self.error:
+            raise self.error
+        return self
+
+    def fetchone(self):
+        return self.row
+
+    def rollback(self):
+        self.rolled_back = True
+
+def test_read_generation():
+    assert app_module.read_generation(FakeConn()) == 7
+    assert app_module.read_generation(FakeConn(row=None)) == 0
+    conn = FakeConn(error=psycopg.errors.UndefinedTable("ingest_state"))
+    assert app_module.read_generation(conn) == 0
+    assert conn.rolled_back
+
+def test_lanes_fit_in_the_pool():
+    # every pool.connection() runs in a lane slot, so the pool never queues
+    assert sum(lane.concurrency for lane in app_module.LANES) <= app_module.pool.max_size
+
+def test_index_etag_follows_the_opened_index(tmp_path, monkeypatch):
+    parsed, path = tmp_path / "parsed.txt", str(tmp_path / "captions.idx")
+    parsed.write_text("vid1\t1\thello world\n", encoding="utf-8")
+    build_index(str(parsed), path)
+    index = PhraseIndex(path)
+    monkeypatch.setattr(app_module, "phrase_index", index)
+    key = ("hello world", 20, 0, "", "")
+    etag = app_module.search_etag(key)
+    # a rebuild renamed over the path: this worker still serves the old index
+    parsed.write_text("vid1\t1\thello world\nvid2\t2\thello again\n", encoding="utf-8")
+    build_index(str(parsed), path)
+    assert app_module.search_etag(key) == etag
+    monkeypatch.setattr(app_module, "phrase_index", PhraseIndex(path))
+    assert app_module.search_etag(key) != etag
+    index.close()
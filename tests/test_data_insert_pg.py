@@ -0,0 +1,115 @@
+"""
+data_insert_pg bulk loads against a real Postgres: DATABASE_URL, skipped
+without it. Each layout loads into a scratch schema of its own.
+"""
+import os
+
+import psycopg
+import pytest
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import ConnectionPool
+
+DSN = os.getenv("DATABASE_URL")
+pytestmark = pytest.mark.skipif(not DSN, reason="DATABASE_URL is not set")
+
+INDEXES = {
+    "rows": {"captions_pkey", "captions_uniq", "captions_caption_text_trgm_idx",
+             "captions_video_time_idx", "captions_caption_tsv_idx",
+             "caption_joins_pkey", "caption_joins_next_idx", "caption_joins_tsv_idx"},
+    "compact": {"caption_segments_pkey", "caption_segments_tsv_idx",
+                "caption_segment_joins_pkey", "caption_segment_joins_tsv_idx"},
+}
+VIEWS = {
+    "rows": {"caption_boundaries"},
+    "compact": {"caption_search", "caption_search_boundaries"},
+}
+
+def has_trgm(conn):
+    return conn.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'").fetchone()
+
+@pytest.fixture(params=["rows", "compact"])
+def loader(request, monkeypatch):
+    layout = request.param
+    schema = f"test_load_{layout}"
+    with psycopg.connect(DSN, autocommit=True) as conn:
+        if layout == "rows" and not has_trgm(conn):
+            pytest.skip("the rows layout needs pg_trgm")
+        conn.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        conn.execute(f"CREATE SCHEMA {schema}")
+    import data_insert_pg
+    pool = ConnectionPool(make_conninfo(DSN, options=f"-csearch_path={schema},public"),
+                          min_size=0, max_size=2, open=True)
+    monkeypatch.setattr(data_insert_pg, "pool", pool)
+    monkeypatch.setattr(data_insert_pg, "STORAGE_LAYOUT", layout)
+    monkeypatch.setattr(data_insert_pg, "CAPTION_JOINS", True)
+    monkeypatch.setattr(data_insert_pg, "SUGGEST_TERMS", True)
+    data_insert_pg.ensure_schema()
+    yield data_insert_pg, layout, schema
+    pool.close()
+    with psycopg.connect(DSN, autocommit=True) as conn:
+        conn.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+
+def write_parsed(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        for video_id, ts, text in rows:
+            f.write(f"{video_id}\t{ts}\t{text}\n")
+    return str(path)
+
+def query(loader, sql, params=()):
+    with loader.pool.connection() as conn:
+        return conn.execute(sql, params).fetchall()
+
+def test_merge_then_full_reload(loader, tmp_path):
+    loader, layout, schema = loader
+    relation = "caption_search" if layout == "compact" else "captions"
+    staging = "caption_segments_staging" if layout == "compact" else "captions_staging"
+
+    first = write_parsed(tmp_path / "first.txt", [
+        ("vid1", 0, "alpha bravo"), ("vid1", 4, "charlie delta"), ("vid1", 9, "echo foxtrot"),
+        ("vid2", 0, "golf hotel"), ("vid2", 3, "india juliet"),
+    ])
+    stats = loader.bulk_insert_data(first)
+    assert stats["copied"] == stats["captions_inserted"] == 5
+
+    # vid2 is re-parsed: one caption kept, one new; vid3 is new
+    second = write_parsed(tmp_path / "second.txt", [
+        ("vid2", 0, "golf hotel"), ("vid2", 6, "kilo lima"), ("vid3", 0, "mike november"),
+    ])
+    loader.bulk_insert_data(second)
+    # the rows layout merges into vid2's old rows, compact replaces them
+    merged = 7 if layout == "rows" else 6
+    assert query(loader, f"SELECT count(*) FROM {relation}")[0][0] == merged
+    assert query(loader, "SELECT to_regclass(%s)", (f"{schema}.{staging}",))[0][0] is None
+
+    # vid3's new VTT parsed to no rows: naming it still empties it
+    shrunk = write_parsed(tmp_path / "shrunk.txt", [("vid1", 0, "alpha bravo")])
+    loader.bulk_insert_data(shrunk, replace_videos=["vid1", "vid3"])
+    assert query(loader, f"SELECT video_id, count(*) FROM {relation} GROUP BY 1 ORDER BY 1") == [
+        ("vid1", 1), ("vid2", merged - 4)]
+
+    third = write_parsed(tmp_path / "third.txt", [
+        ("vid4", 0, "oscar papa quebec"), ("vid4", 5, "romeo sierra"), ("vid5", 0, "tango uniform"),
+    ])
+    stats = loader.bulk_insert_data(third, full_reload=True)
+    assert stats["captions_inserted"] == 3
+    assert query(loader, f"SELECT count(*) FROM {relation}")[0][0] == 3
+    assert query(loader, f"""
+        SELECT count(*) FROM {relation}
+        WHERE caption_tsv @@ phraseto_tsquery('english', 'romeo sierra')""")[0][0] == 1
+
+    # the shadow relations replaced the live ones and left nothing behind
+    assert query(loader, "SELECT to_regclass(%s)", (f"{schema}.{staging}",))[0][0] is None
+    assert query(loader, "SELECT 1 FROM pg_namespace WHERE nspname = %s", (f"{schema}_reload",)) == []
+    indexes = {r[0] for r in query(loader, "SELECT indexname FROM pg_indexes WHERE schemaname = %s",
+                                   (schema,))}
+    assert INDEXES[layout] <= indexes
+    views = {r[0] for r in query(loader, "SELECT viewname FROM pg_views WHERE schemaname = %s",
+                                 (schema,))}
+    assert VIEWS[layout] <= views
+    boundary = "caption_search_boundaries" if layout == "compact" else "caption_boundaries"
+    assert query(loader, f"SELECT count(*) FROM {boundary}")[0][0] == 1  # vid4's one pair
+
+    assert query(loader, "SELECT generation FROM ingest_state WHERE id = 1") == [(4,)]
+    freqs = dict(query(loader, "SELECT term, freq FROM suggest_terms"))
+    assert freqs["romeo sierra"] == 1
+    assert freqs.get("alpha", 0) == 0
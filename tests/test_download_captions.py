@@ -0,0 +1,64 @@
+import os
+import shlex
+import sys
+import time
+
+import pytest
+
+import download_captions
+from download_captions import CLIENTS, ClientStats, TokenBucket, download_one
+
+@pytest.mark.parametrize("rate", [0, -1])
+def test_non_positive_rate_means_no_limit(rate):
+    bucket = TokenBucket(rate, burst=1)
+    start = time.monotonic()
+    for _ in range(100):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.5
+
+def test_rate_limits_after_the_burst():
+    bucket = TokenBucket(rate=50, burst=2)
+    start = time.monotonic()
+    for _ in range(4):  # 2 from the burst, then 2 at 50/s
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.035
+
+STUB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                    "benchmarks", "stub_yt_dlp.py")
+URL = "https://www.youtube.com/watch?v=abcdefghijk"
+
+@pytest.fixture
+def stub(monkeypatch):
+    monkeypatch.setattr(download_captions, "YTDLP_BIN", f"{shlex.quote(sys.executable)} {shlex.quote(STUB)}")
+    monkeypatch.setenv("STUB_DELAY", "0")
+    monkeypatch.delenv("STUB_FAIL_CLIENTS", raising=False)
+    monkeypatch.delenv("STUB_NO_SUBS_EVERY", raising=False)
+    return monkeypatch
+
+def download(tmp_path, stats, retries=0):
+    return download_one(URL, "abcdefghijk", str(tmp_path), TokenBucket(0), stats,
+                        retries=retries, backoff=0)
+
+def test_falls_back_to_the_next_client_and_prefers_it(stub, tmp_path):
+    stub.setenv("STUB_FAIL_CLIENTS", "android")
+    stats = ClientStats()
+    assert download(tmp_path, stats) == ("ok", "ios", 1)
+    assert stats.order() == ["ios", "android", "tv_embedded"]
+
+def test_clean_run_without_subtitles_is_no_subs(stub, tmp_path):
+    stub.setenv("STUB_NO_SUBS_EVERY", "1")
+    stub.setenv("STUB_FAIL_CLIENTS", "android")  # an error elsewhere doesn't matter
+    assert download(tmp_path, ClientStats(), retries=2) == ("no_subs", None, 1)
+
+def test_every_client_erroring_is_failed_after_retries(stub, tmp_path):
+    stub.setenv("STUB_FAIL_CLIENTS", ",".join(CLIENTS))
+    assert download(tmp_path, ClientStats(), retries=1) == ("failed", None, 2)
+
+def test_vtt_files_picks_the_first_file_per_video(tmp_path):
+    for name in ("abcdefghijk.en-US.vtt", "abcdefghijk.en.vtt", "zyxwvutsrqp.en.vtt", "notes.txt"):
+        (tmp_path / name).write_text("WEBVTT\n")
+    canonical = {"abcdefghijk": str(tmp_path / "abcdefghijk.en-US.vtt"),
+                 "zyxwvutsrqp": str(tmp_path / "zyxwvutsrqp.en.vtt")}
+    assert download_captions.vtt_files(str(tmp_path)) == canonical
+    assert download_captions.vtt_files(str(tmp_path), "abcdefghijk") == {
+        "abcdefghijk": canonical["abcdefghijk"]}
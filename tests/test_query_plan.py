@@ -0,0 +1,24 @@
+import pytest
+
+from query_plan import PLANS, like_pattern, plan_query
+
+@pytest.mark.parametrize("phrase, plan", [
+    ("machine learning", "fts"),
+    ("the matrix", "fts"),             # half stopwords is still fine
+    ("to be or not to be", "trigram"),  # all stopwords: empty tsquery
+    ("of the year", "trigram"),
+    ("hello?!?!", "trigram"),           # mostly punctuation
+    ("c++ code", "trigram"),            # FTS would drop the ++
+    ("state-of-the-art models", "fts"),
+    ("c++", "ilike"),                   # one letter: no trigram to index
+    ("ab", "ilike"),
+    ("a b", "ilike"),
+])
+def test_plan_query(phrase, plan):
+    assert plan_query(phrase) == plan
+    assert plan in PLANS
+
+def test_like_pattern_escapes_wildcards():
+    assert like_pattern("100%") == "%100\\%%"
+    assert like_pattern("snake_case") == "%snake\\_case%"
+    assert like_pattern("a\\b") == "%a\\\\b%"
@@ -0,0 +1,78 @@
+import pytest
+
+import search_cache
+from search_cache import QueryCache, normalize_query
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(search_cache.time, "monotonic", lambda: now[0])
+    return now
+
+def test_get_miss_then_hit():
+    cache = QueryCache()
+    assert cache.get("a") is None
+    cache.put("a", {"results": [1]})
+    assert cache.get("a") == {"results": [1]}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_lru_evicts_least_recently_used():
+    cache = QueryCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")  # b is now the oldest
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.evictions == 1
+
+def test_byte_cap_evicts_and_skips_oversized():
+    cache = QueryCache(max_entries=10, max_bytes=20)
+    cache.put("a", "x" * 8)  # 10 bytes as JSON
+    cache.put("b", "y" * 8)
+    cache.put("c", "z" * 8)
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 20
+    cache.put("big", "w" * 30)
+    assert cache.get("big") is None
+    assert cache.get("c") == "z" * 8
+
+def test_put_replaces_and_keeps_byte_count():
+    cache = QueryCache()
+    cache.put("a", "xx")
+    cache.put("a", "xxxx")
+    assert cache.get("a") == "xxxx"
+    assert cache.stats()["bytes"] == 6
+
+def test_ttl_expiry(clock):
+    cache = QueryCache(ttl=10)
+    cache.put("a", 1)
+    clock[0] += 9.9
+    assert cache.get("a") == 1
+    clock[0] += 0.2
+    assert cache.get("a") is None
+    assert cache.expirations == 1
+    assert cache.stats()["entries"] == 0
+
+def test_generation_change_clears_everything():
+    cache = QueryCache()
+    cache.set_generation(1)  # first generation seen: nothing to invalidate
+    cache.put("a", 1)
+    cache.set_generation(1)
+    assert cache.get("a") == 1
+    cache.set_generation(2)
+    assert cache.get("a") is None
+    assert cache.invalidations == 1
+    assert cache.stats()["bytes"] == 0
+
+@pytest.mark.parametrize("kwargs", [{"max_entries": 0}, {"max_bytes": 0}])
+def test_disabled_cache_stores_nothing(kwargs):
+    cache = QueryCache(**kwargs)
+    assert not cache.enabled
+    cache.put("a", 1)
+    assert cache.get("a") is None
+    assert cache.misses == 0
+
+def test_normalize_query_ignores_case_and_outer_space():
+    assert normalize_query("  Hello World ") == "hello world"
+    assert normalize_query("a  b") != normalize_query("a b")